@@ -5,8 +5,10 @@ from .agent_factory import (
     create_synthesizer_agent
 )
 from .specialist_analysis import run_specialist_analysis
-from .review_loop import run_review_loop
+from .review_loop import run_review_loop, run_review_stage
 from .synthesizer import run_synthesis
+from .pipeline import run_analysis, run_request, run_pipelined_analysis, run_phased_analysis
+from .batch import run_batch
 
 __all__ = [
     'create_specialist_agent',
@@ -14,5 +16,11 @@ __all__ = [
     'create_synthesizer_agent',
     'run_specialist_analysis',
     'run_review_loop',
-    'run_synthesis'
+    'run_review_stage',
+    'run_synthesis',
+    'run_analysis',
+    'run_request',
+    'run_pipelined_analysis',
+    'run_phased_analysis',
+    'run_batch'
 ]
@@ -2,9 +2,35 @@
 Agent factory for creating agents using Microsoft Agent Framework.
 Maintains same public interface as original AutoGen implementation.
 """
+import asyncio
+import copy
 import json
-from typing import Optional
-from config.llm_config import get_chat_client, get_model_name, get_model_config, get_provider_name
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Callable, Optional, Set, Tuple, Type
+from pydantic import BaseModel
+from config.llm_config import (
+    get_chat_client,
+    get_configured_providers,
+    get_model_name,
+    get_model_config,
+    get_retry_config,
+    get_hedge_config,
+    get_structured_output_config,
+    get_azure_agent_config
+)
+from config.app_config import get_llm_cache_config
+from utils.cache import create_cache, hash_text
+from utils.json_stream import JSONObjectScanner
+from utils.metrics import metrics
+from utils.response_parser import extract_json_object, json_schema_response_format, loads_json
+from models.schemas import SpecialistReport, ReviewFeedback, SynthesisResult
+from agents.scheduler import ROLE_PRIORITIES, SchedulerTicket, estimate_tokens, get_scheduler
+from agents.retry import DeadlineExceeded, backoff_delay, get_retry_after, is_retryable, remaining_time
+from agents.hedging import latency_tracker, run_hedged
+from agents.router import get_router
+from utils.logger import log_request_event
 from prompts.system_prompts import (
     get_specialist_prompt,
     get_supervisor_prompt,
@@ -13,62 +39,131 @@ from prompts.system_prompts import (
 )
 
 
+# Receives each streamed text chunk (a retried call streams again from the start)
+ProgressCallback = Callable[[str], None]
+
+# Process-wide memoization cache for LLM calls (created on first use)
+_llm_cache = None
+_llm_cache_initialized = False
+
+# (provider, model) pairs that rejected a json_schema response_format
+_schema_unsupported: Set[Tuple[str, str]] = set()
+
+# LLM_HEDGE_PROVIDER values already reported as unusable (warned once)
+_unusable_hedge_providers: Set[str] = set()
+
+# Azure Agent Framework agents reused across calls (LRU):
+# (client id, name, system prompt hash) -> (client, agent)
+_azure_agents: "OrderedDict[Tuple[int, str, str], Tuple[object, object]]" = OrderedDict()
+
+
+def get_llm_cache():
+    """
+    Get the shared LLM call cache.
+    
+    Returns:
+        MemoryCache, SQLiteCache or None if memoization is disabled (LLM_CACHE_BACKEND=none)
+    """
+    global _llm_cache, _llm_cache_initialized
+    if not _llm_cache_initialized:
+        _llm_cache = create_cache(**get_llm_cache_config())
+        _llm_cache_initialized = True
+    return _llm_cache
+
+
+def close_llm_cache():
+    """Close the shared LLM call cache (flushes the SQLite backend)."""
+    global _llm_cache, _llm_cache_initialized
+    if _llm_cache is not None and hasattr(_llm_cache, "close"):
+        _llm_cache.close()
+    _llm_cache = None
+    _llm_cache_initialized = False
+
+
 class AgentWrapper:
     """
     Wrapper for Agent Framework agents to provide unified interface.
     Works with Azure OpenAI, OpenAI, and Groq.
+    
+    The provider/model come from the role's route (LLM_ROUTE_<ROLE>); calls
+    fail over to other configured providers when the route is degraded.
+    
+    When response_model is set, JSON calls send its schema as a structured
+    output response_format to providers that support it.
     """
     
-    def __init__(self, name: str, instructions: str):
+    def __init__(
+        self,
+        name: str,
+        instructions: str,
+        role: str = "specialist",
+        response_model: Optional[Type[BaseModel]] = None
+    ):
         self.name = name
         self.instructions = instructions
-        self.client = get_chat_client()
-        self.model = get_model_name()
-        self.config = get_model_config()
-        self.provider = get_provider_name()
+        self.role = role
+        self.response_model = response_model
+        self.provider, self.model = get_router().route(role)
+        self.client = get_chat_client(self.provider)
+        self.config = get_model_config(role)
     
-    async def run(self, task: str, json_mode: bool = True) -> str:
+    def _cache_key(self, task: str, json_mode: bool) -> str:
+        """Memoization key: (provider, model, system prompt hash, task hash, sampling config)."""
+        return hash_text(json.dumps([
+            self.provider,
+            self.model,
+            hash_text(self.instructions),
+            hash_text(task),
+            self.config["temperature"],
+            self.config["max_tokens"],
+            json_mode,
+            self.response_model.__name__ if self.response_model else None
+        ]))
+    
+    async def run(
+        self,
+        task: str,
+        json_mode: bool = True,
+        use_cache: bool = True,
+        stream: bool = False,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> str:
         """
         Execute agent task and return response.
         
+        Identical calls (same provider, model, system prompt, task,
+        temperature and max_tokens) are served from the LLM call cache when
+        enabled. Only responses that parse (and match response_model, if set)
+        are memoized, so a truncated or prose reply can be retried.
+        
         Args:
             task: Task description/prompt for the agent
             json_mode: Whether to enforce JSON response format
+            use_cache: Set to False to bypass the LLM call cache
+            stream: Stream tokens and stop reading once the JSON object closes
+            on_progress: Called with each streamed text chunk (optional)
             
         Returns:
             str: Agent's response (JSON string if json_mode=True)
         """
-        messages = [
-            {"role": "system", "content": self.instructions},
-            {"role": "user", "content": task}
-        ]
+        cache = get_llm_cache() if use_cache else None
+        cache_key = None
+        
+        if cache is not None:
+            cache_key = self._cache_key(task, json_mode)
+            cached = await cache.aget(cache_key)
+            if cached is not None:
+                metrics.increment("llm_cache_hits", self.name)
+                if on_progress:
+                    on_progress(cached)
+                return cached
+            metrics.increment("llm_cache_misses", self.name)
         
         try:
-            # Handle different provider APIs
-            if self.provider == "azure_openai":
-                # Agent Framework with Azure OpenAI
-                agent = self.client.create_agent(
-                    name=self.name,
-                    instructions=self.instructions,
-                )
-                response = await agent.run(task)
-                return str(response)
-            
-            else:
-                # OpenAI or Groq via AsyncOpenAI client
-                kwargs = {
-                    "model": self.model,
-                    "messages": messages,
-                    "temperature": self.config["temperature"],
-                    "max_tokens": self.config["max_tokens"],
-                }
-                
-                if json_mode:
-                    kwargs["response_format"] = {"type": "json_object"}
-                
-                response = await self.client.chat.completions.create(**kwargs)
-                return response.choices[0].message.content
-                
+            response_text = await self._call_routed(task, json_mode, stream, on_progress)
+        except DeadlineExceeded:
+            # Propagate so the request fails fast instead of fabricating a report
+            raise
         except Exception as e:
             error_msg = f"Error in agent {self.name}: {str(e)}"
             print(f"⚠️ {error_msg}")
@@ -80,15 +175,458 @@ class AgentWrapper:
                     "agent": self.name
                 })
             return error_msg
+        
+        # Only successful, parseable responses are memoized
+        if cache is not None and response_text:
+            if self._is_valid_response(response_text, json_mode):
+                await cache.aset(cache_key, response_text)
+            else:
+                metrics.increment("llm_cache_rejects", self.name)
+        
+        return response_text
+    
+    def _is_valid_response(self, response_text: str, json_mode: bool) -> bool:
+        """Whether a response holds a complete JSON object (valid for response_model, if set)."""
+        if not json_mode:
+            return True
+        json_text = extract_json_object(response_text)
+        if json_text is None:
+            return False
+        try:
+            if self.response_model is not None:
+                self.response_model.model_validate_json(json_text)
+            else:
+                loads_json(json_text)
+        except ValueError:
+            return False
+        return True
+    
+    async def _call_routed(
+        self,
+        task: str,
+        json_mode: bool,
+        stream: bool = False,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> str:
+        """
+        Call the healthiest provider for this role, failing over on error.
+        
+        Args:
+            task: Task description/prompt for the agent
+            json_mode: Whether to enforce JSON response format
+            stream: Whether to stream the response
+            on_progress: Partial response callback (optional)
+            
+        Returns:
+            str: Raw response text
+        """
+        candidates = get_router().candidates(self.role, (self.provider, self.model))
+        last_error = None
+        
+        for index, (provider, model) in enumerate(candidates):
+            try:
+                agent = self._bound_to(provider, model)
+                return await agent._call_hedged(task, json_mode, stream, on_progress)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                last_error = e
+                if index + 1 < len(candidates):
+                    metrics.increment("provider_failovers", provider)
+                    print(f"⚠️ {self.name}: {provider} falhou, tentando {candidates[index + 1][0]}")
+        
+        raise last_error
+    
+    async def _call_hedged(
+        self,
+        task: str,
+        json_mode: bool,
+        stream: bool = False,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> str:
+        """
+        Call the provider, hedging slow calls when enabled.
+        
+        Once this agent has enough latency history, a call still pending at
+        the configured percentile triggers a duplicate (optionally at the
+        secondary provider/model); the first valid JSON wins. Only the
+        primary call reports progress. A secondary provider without
+        credentials disables hedging instead of failing the primary call.
+        
+        Args:
+            task: Task description/prompt for the agent
+            json_mode: Whether to enforce JSON response format
+            stream: Whether to stream the response
+            on_progress: Partial response callback (optional)
+            
+        Returns:
+            str: Raw response text
+        """
+        hedge_config = get_hedge_config()
+        delay = None
+        if hedge_config["enabled"]:
+            delay = latency_tracker.percentile(
+                self.name,
+                hedge_config["percentile"],
+                hedge_config["min_samples"]
+            )
+        
+        if delay is None:
+            return await self._call_with_retry(task, json_mode, stream, on_progress)
+        
+        hedge_provider = hedge_config["provider"] or self.provider
+        if hedge_provider != self.provider and hedge_provider not in get_configured_providers():
+            if hedge_provider not in _unusable_hedge_providers:
+                _unusable_hedge_providers.add(hedge_provider)
+                print(f"⚠️ LLM_HEDGE_PROVIDER={hedge_provider} não está configurado; hedging desativado")
+            return await self._call_with_retry(task, json_mode, stream, on_progress)
+        
+        hedge_model = hedge_config["model"] or (
+            self.model if hedge_provider == self.provider else get_model_name(hedge_provider)
+        )
+        hedge_agent = self._bound_to(hedge_provider, hedge_model)
+        return await run_hedged(
+            lambda: self._call_with_retry(task, json_mode, stream, on_progress),
+            lambda: hedge_agent._call_with_retry(task, json_mode, stream),
+            delay=max(delay, hedge_config["min_delay"]),
+            json_mode=json_mode,
+            metric_key=self.name
+        )
+    
+    def _bound_to(self, provider: str, model: str) -> "AgentWrapper":
+        """Copy of this agent pointed at another provider/model (or itself if unchanged)."""
+        if provider == self.provider and model == self.model:
+            return self
+        
+        agent = copy.copy(self)
+        if provider != self.provider:
+            agent.provider = provider
+            agent.client = get_chat_client(provider)
+        agent.model = model
+        return agent
+    
+    async def _call_with_retry(
+        self,
+        task: str,
+        json_mode: bool,
+        stream: bool = False,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> str:
+        """
+        Call the provider with per-call timeouts and retries.
+        
+        Retries 429/5xx/timeouts with jittered exponential backoff (honoring
+        Retry-After), never past the request deadline. Each attempt is
+        recorded as an llm_call event in the request's audit log.
+        
+        Args:
+            task: Task description/prompt for the agent
+            json_mode: Whether to enforce JSON response format
+            stream: Whether to stream the response
+            on_progress: Partial response callback (optional)
+            
+        Returns:
+            str: Raw response text
+            
+        Raises:
+            DeadlineExceeded: If the request deadline passes
+            Exception: The last provider error if retries are exhausted
+        """
+        retry_config = get_retry_config()
+        max_attempts = retry_config["max_retries"] + 1
+        scheduler = get_scheduler()
+        estimated_tokens = estimate_tokens(self.instructions, task)
+        priority = ROLE_PRIORITIES.get(self.role, ROLE_PRIORITIES["specialist"])
+        
+        for attempt in range(1, max_attempts + 1):
+            queued_at = time.monotonic()
+            
+            # Wait for a global slot and the provider's request/token budget
+            try:
+                ticket = await asyncio.wait_for(
+                    scheduler.acquire(self.provider, estimated_tokens, priority),
+                    timeout=remaining_time()
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"Request deadline exceeded while {self.name} was queued")
+            
+            started_at = time.monotonic()
+            error = None
+            try:
+                timeout = retry_config["call_timeout"]
+                remaining = remaining_time()
+                if remaining is not None:
+                    if remaining <= 0:
+                        raise DeadlineExceeded(f"Request deadline exceeded before {self.name} attempt {attempt}")
+                    timeout = min(timeout, remaining)
+                
+                response_text = await asyncio.wait_for(
+                    self._complete(task, json_mode, ticket, stream, on_progress),
+                    timeout=timeout
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                error = e
+            finally:
+                # Free the slot before any backoff so other calls can proceed
+                await scheduler.release(ticket)
+            
+            self._log_call(attempt, queued_at, started_at, error=error)
+            
+            if error is None:
+                return response_text
+            
+            if not is_retryable(error) or attempt == max_attempts:
+                raise error
+            
+            delay = backoff_delay(
+                attempt,
+                retry_config["backoff_base"],
+                retry_config["backoff_max"],
+                get_retry_after(error)
+            )
+            remaining = remaining_time()
+            if remaining is not None and delay >= remaining:
+                raise DeadlineExceeded(f"Request deadline leaves no time to retry {self.name}") from error
+            
+            metrics.increment("llm_retries", self.name)
+            await asyncio.sleep(delay)
+    
+    def _log_call(self, attempt: int, queued_at: float, started_at: float, error: Optional[Exception] = None):
+        """Record one provider attempt (latency, queue wait, outcome) in the request's audit log."""
+        now = time.monotonic()
+        latency = now - started_at
+        metrics.increment("llm_call_seconds", self.name, latency)
+        if error is None:
+            latency_tracker.record(self.name, latency)
+        get_router().record(self.provider, error is None, latency)
+        
+        data = {
+            "role": self.role,
+            "provider": self.provider,
+            "model": self.model,
+            "status": "ok" if error is None else "error",
+            "latency_seconds": round(latency, 4),
+            "queue_seconds": round(started_at - queued_at, 4),
+        }
+        if error is not None:
+            data["error"] = str(error) or type(error).__name__
+            data["error_type"] = type(error).__name__
+            metrics.increment("llm_errors", self.name)
+        
+        log_request_event("llm_call", data, agent_id=self.name, attempt=attempt)
+    
+    async def _complete(
+        self,
+        task: str,
+        json_mode: bool,
+        ticket: Optional[SchedulerTicket] = None,
+        stream: bool = False,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> str:
+        """
+        Send one request to the provider.
+        
+        Args:
+            task: Task description/prompt for the agent
+            json_mode: Whether to enforce JSON response format
+            ticket: Scheduler ticket to report actual token usage (optional)
+            stream: Whether to stream the response
+            on_progress: Partial response callback (optional)
+            
+        Returns:
+            str: Raw response text
+        """
+        messages = [
+            {"role": "system", "content": self.instructions},
+            {"role": "user", "content": task}
+        ]
+        
+        # Handle different provider APIs
+        if self.provider == "azure_openai":
+            # Agent Framework with Azure OpenAI
+            run_kwargs = {}
+            if json_mode and self._response_format()["type"] == "json_schema":
+                run_kwargs["response_format"] = self.response_model
+            response = str(await self._azure_agent().run(task, **run_kwargs))
+            if on_progress:
+                on_progress(response)
+            return response
+        
+        # OpenAI or Groq via AsyncOpenAI client
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.config["temperature"],
+            "max_tokens": self.config["max_tokens"],
+        }
+        
+        if json_mode:
+            kwargs["response_format"] = self._response_format()
+        
+        try:
+            return await self._send(kwargs, json_mode, ticket, stream, on_progress)
+        except Exception as e:
+            if kwargs.get("response_format", {}).get("type") != "json_schema" or not _is_schema_rejection(e):
+                raise
+            # Model without structured outputs: remember it and fall back to json_object
+            _schema_unsupported.add((self.provider, self.model))
+            metrics.increment("structured_output_fallbacks", self.name)
+            print(f"⚠️ {self.provider}:{self.model} não aceita json_schema, usando json_object")
+            kwargs["response_format"] = {"type": "json_object"}
+            return await self._send(kwargs, json_mode, ticket, stream, on_progress)
+    
+    def _azure_agent(self):
+        """
+        Get the Agent Framework agent for this name and system prompt.
+        
+        Agents hold no per-call state, so one is built per (client, name,
+        instructions) and reused; the least recently used is dropped once
+        AZURE_AGENT_CACHE_SIZE is reached.
+        """
+        key = (id(self.client), self.name, hash_text(self.instructions))
+        entry = _azure_agents.get(key)
+        # The client reference guards against a recycled id after clients are recreated
+        if entry is not None and entry[0] is self.client:
+            _azure_agents.move_to_end(key)
+            metrics.increment("azure_agent_reuses", self.name)
+            return entry[1]
+        
+        agent = self.client.create_agent(
+            name=self.name,
+            instructions=self.instructions,
+        )
+        _azure_agents[key] = (self.client, agent)
+        _azure_agents.move_to_end(key)
+        while len(_azure_agents) > get_azure_agent_config()["cache_size"]:
+            _azure_agents.popitem(last=False)
+        return agent
+    
+    def _response_format(self) -> dict:
+        """json_schema response_format when supported by the provider, json_object otherwise."""
+        config = get_structured_output_config()
+        if (
+            self.response_model is not None
+            and config["enabled"]
+            and self.provider in config["providers"]
+            and (self.provider, self.model) not in _schema_unsupported
+        ):
+            return json_schema_response_format(self.response_model, strict=config["strict"])
+        return {"type": "json_object"}
+    
+    async def _send(
+        self,
+        kwargs: dict,
+        json_mode: bool,
+        ticket: Optional[SchedulerTicket] = None,
+        stream: bool = False,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> str:
+        """Send a chat completion request (streamed or not) and return its text."""
+        if stream:
+            return await self._stream_completion(kwargs, json_mode, ticket, on_progress)
+        
+        response = await self.client.chat.completions.create(**kwargs)
+        self._record_usage(response, ticket)
+        return response.choices[0].message.content
+    
+    async def _stream_completion(
+        self,
+        kwargs: dict,
+        json_mode: bool,
+        ticket: Optional[SchedulerTicket] = None,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> str:
+        """
+        Stream a chat completion, stopping once the JSON object is complete.
+        
+        After the object closes, the stream is only read on to its usage
+        chunk; if the model keeps generating text instead, the stream is
+        closed at once, which stops generation of trailing tokens.
+        
+        Args:
+            kwargs: chat.completions.create arguments
+            json_mode: Whether the response is a JSON object
+            ticket: Scheduler ticket to report actual token usage (optional)
+            on_progress: Called with each text chunk received (optional)
+            
+        Returns:
+            str: Response text (just the JSON object in json_mode)
+        """
+        scanner = JSONObjectScanner() if json_mode else None
+        chunks = []
+        complete = False
+        usage = None
+        
+        response = await self.client.chat.completions.create(
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs
+        )
+        try:
+            async for chunk in response:
+                usage = getattr(chunk, "usage", None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                
+                if complete:
+                    # Trailing text after the object: stop paying for it
+                    metrics.increment("streams_closed_early", self.name)
+                    break
+                
+                chunks.append(delta)
+                if on_progress:
+                    on_progress(delta)
+                
+                if scanner is not None and scanner.feed(delta) is not None:
+                    complete = True
+        finally:
+            await response.close()
+        
+        text = scanner.result if complete else "".join(chunks)
+        if usage is None and ticket is not None:
+            # Usage only arrives on the last chunk; estimate it when we stop early
+            ticket.actual_tokens = ticket.estimated_tokens + estimate_tokens(text)
+        self._record_usage(SimpleNamespace(usage=usage), ticket)
+        return text
+    
+    def _record_usage(self, response, ticket: Optional[SchedulerTicket] = None):
+        """Record token usage, including provider-side cached prompt tokens."""
+        metrics.increment("llm_calls", self.name)
+        
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        
+        if ticket is not None:
+            ticket.actual_tokens = usage.total_tokens
+        
+        metrics.increment("prompt_tokens", self.name, usage.prompt_tokens or 0)
+        metrics.increment("completion_tokens", self.name, usage.completion_tokens or 0)
+        
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) if details else None
+        metrics.increment("cached_prompt_tokens", self.name, cached_tokens or 0)
+
+
+def _is_schema_rejection(error: Exception) -> bool:
+    """Whether a provider error is a 400 rejecting the json_schema response_format."""
+    message = str(error).lower()
+    return getattr(error, "status_code", None) == 400 and (
+        "json_schema" in message or "response_format" in message
+    )
 
 
-def create_specialist_agent(agent_id: int, examples: str) -> AgentWrapper:
+def create_specialist_agent(agent_id: int, examples: str, role: str = "specialist") -> AgentWrapper:
     """
     Create a specialist agent for domain-specific analysis.
     
     Args:
         agent_id: Agent identifier (1-5)
         examples: Few-shot examples for this agent
+        role: "specialist" for the first analysis, "rework" for revisions
         
     Returns:
         AgentWrapper configured as specialist
@@ -98,7 +636,9 @@ def create_specialist_agent(agent_id: int, examples: str) -> AgentWrapper:
     
     return AgentWrapper(
         name=f"specialist_{agent_id}",
-        instructions=instructions
+        instructions=instructions,
+        role=role,
+        response_model=SpecialistReport
     )
 
 
@@ -111,7 +651,9 @@ def create_supervisor_agent() -> AgentWrapper:
     """
     return AgentWrapper(
         name="supervisor",
-        instructions=get_supervisor_prompt()
+        instructions=get_supervisor_prompt(),
+        role="supervisor",
+        response_model=ReviewFeedback
     )
 
 
@@ -124,5 +666,7 @@ def create_synthesizer_agent() -> AgentWrapper:
     """
     return AgentWrapper(
         name="synthesizer",
-        instructions=get_synthesizer_prompt()
+        instructions=get_synthesizer_prompt(),
+        role="synthesizer",
+        response_model=SynthesisResult
     )
@@ -0,0 +1,70 @@
+"""
+Batch execution of many analysis requests.
+
+Identical submissions (same responses after normalization) are analyzed
+once and their result shared; distinct ones run with bounded concurrency.
+Used by POST /analyze/batch and the offline batch_runner.py CLI.
+"""
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, List, Optional
+from models.schemas import FinalAnalysis
+from utils.cache import hash_text, normalize_response
+
+
+# Analyzes one request (a list of 5 responses)
+AnalyzeFunction = Callable[[List[str]], Awaitable[FinalAnalysis]]
+
+# Called with (request_key, indices, item_result) as each unique request finishes
+BatchResultCallback = Callable[[str, List[int], Dict], None]
+
+
+def request_key(responses: List[str]) -> str:
+    """Deduplication key of a request (normalized responses)."""
+    return hash_text(json.dumps([normalize_response(response) for response in responses]))
+
+
+async def run_batch(
+    requests: List[List[str]],
+    analyze: AnalyzeFunction,
+    max_concurrency: int = 4,
+    on_result: Optional[BatchResultCallback] = None
+) -> List[Dict]:
+    """
+    Analyze a batch of requests, deduplicating identical submissions.
+
+    A failed request does not fail the batch: its item carries the error.
+
+    Args:
+        requests: Responses of each request (5 per request)
+        analyze: Coroutine function that analyzes one request
+        max_concurrency: Maximum unique requests analyzed at once
+        on_result: Called as each unique request finishes (optional)
+
+    Returns:
+        One item per request, in input order:
+        {"status": "ok", "result": {...}} or {"status": "error", "error": "..."}
+    """
+    groups: Dict[str, List[int]] = {}
+    for index, responses in enumerate(requests):
+        groups.setdefault(request_key(responses), []).append(index)
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    results: List[Optional[Dict]] = [None] * len(requests)
+
+    async def process(key: str, indices: List[int]):
+        """Analyze one unique request and share the result with its duplicates."""
+        async with semaphore:
+            try:
+                final_analysis = await analyze(requests[indices[0]])
+                item = {"status": "ok", "result": final_analysis.model_dump()}
+            except Exception as e:
+                item = {"status": "error", "error": str(e) or type(e).__name__}
+
+        for index in indices:
+            results[index] = item
+        if on_result is not None:
+            on_result(key, indices, item)
+
+    await asyncio.gather(*[process(key, indices) for key, indices in groups.items()])
+    return results
@@ -0,0 +1,125 @@
+"""
+Micro-batching of LLM calls across concurrent requests.
+
+Calls that share a key (e.g. the same specialist) and arrive within a short
+window are handed to a batch function together, so one provider request
+serves several analysis requests. Each caller still waits only up to its
+own request deadline, and the events logged by the batch (e.g. its llm_call
+attempts) are copied into every caller's audit log.
+"""
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from agents.retry import DeadlineExceeded, get_request_deadline, remaining_time, set_request_deadline
+from utils.logger import append_request_events, capture_request_events
+
+
+# Receives (key, items) and returns one result per item, in order
+BatchFunction = Callable[[Hashable, List[Any]], Awaitable[List[Any]]]
+
+
+class CallCoalescer:
+    """Gathers calls with the same key for up to window_seconds and runs them as one batch."""
+
+    def __init__(self, run_batch: BatchFunction, window_seconds: float = 0.02, max_batch: int = 8):
+        """
+        Initialize CallCoalescer.
+
+        Args:
+            run_batch: Coroutine function executing a batch of items
+            window_seconds: How long the first call of a batch waits for others
+            max_batch: Batch size that triggers an immediate flush
+        """
+        self.run_batch = run_batch
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future, Optional[float]]]] = {}
+        self._timers: Dict[Hashable, asyncio.Task] = {}
+        self._flushes: Set[asyncio.Task] = set()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """
+        Run a batch task outside the submitter's context.
+
+        The batch serves several requests, so it must not inherit the first
+        caller's request log or deadline; its events are captured in _flush
+        and handed to every caller instead.
+        """
+        task = asyncio.get_running_loop().create_task(coro, context=contextvars.Context())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+        return task
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """
+        Add an item to the batch for its key and wait for its result.
+
+        Args:
+            key: Batch key (items with the same key are batched together)
+            item: Input passed to run_batch
+
+        Returns:
+            The item's result from run_batch (the batch's events are added
+            to the caller's request log)
+
+        Raises:
+            DeadlineExceeded: If the caller's request deadline passes first
+        """
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((item, future, get_request_deadline()))
+
+        if len(batch) >= self.max_batch:
+            self._flush_now(key)
+        elif key not in self._timers:
+            self._timers[key] = self._spawn(self._flush_later(key))
+
+        try:
+            # shield: a cancelled caller must not cancel the shared batch
+            result, events = await asyncio.wait_for(asyncio.shield(future), timeout=remaining_time())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"Request deadline exceeded while waiting for batch {key}")
+        append_request_events(events)
+        return result
+
+    def _flush_now(self, key: Hashable):
+        """Flush a full batch without waiting for the window to end."""
+        batch = self._pending.pop(key, None)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        if batch:
+            self._spawn(self._flush(key, batch))
+
+    async def _flush_later(self, key: Hashable):
+        """Flush whatever gathered for a key once the window ends."""
+        await asyncio.sleep(self.window_seconds)
+        self._timers.pop(key, None)
+        batch = self._pending.pop(key, None)
+        if batch:
+            await self._flush(key, batch)
+
+    async def _flush(self, key: Hashable, batch: List[Tuple[Any, asyncio.Future, Optional[float]]]):
+        """Run one batch and resolve each caller's future with (result, batch events)."""
+        # The batch may run until the latest deadline among its callers
+        deadlines = [deadline for _, _, deadline in batch]
+        if None not in deadlines:
+            set_request_deadline(max(max(deadlines) - time.monotonic(), 1e-3))
+
+        try:
+            with capture_request_events() as events:
+                results = await self.run_batch(key, [item for item, _, _ in batch])
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result((result, events))
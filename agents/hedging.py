@@ -0,0 +1,147 @@
+"""
+Hedged (speculative) LLM requests to cut tail latency.
+
+If a call has not returned by a percentile of its historical latency, a
+duplicate is fired (optionally at a secondary provider/model) and the first
+valid response wins; the other call is cancelled.
+"""
+import asyncio
+import math
+import threading
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+from utils.metrics import metrics
+from utils.response_parser import extract_json_object, loads_json
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per key (agent name)."""
+
+    def __init__(self, window: int = 200):
+        """
+        Initialize LatencyTracker.
+
+        Args:
+            window: Number of recent samples kept per key
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, key: str, seconds: float):
+        """Add a latency sample."""
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def percentile(self, key: str, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Get a latency percentile (nearest-rank).
+
+        Args:
+            key: Agent name
+            percentile: Percentile in (0, 100]
+            min_samples: Minimum samples required
+
+        Returns:
+            Latency in seconds, or None if there are not enough samples
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        rank = max(1, math.ceil(percentile / 100.0 * len(samples)))
+        return samples[min(rank, len(samples)) - 1]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Sample counts and p50/p95/p99 per key."""
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            key: {
+                "samples": len(self._samples[key]),
+                "p50": self.percentile(key, 50),
+                "p95": self.percentile(key, 95),
+                "p99": self.percentile(key, 99),
+            }
+            for key in keys
+        }
+
+
+# Shared by all agents
+latency_tracker = LatencyTracker()
+
+
+def is_valid_response(text: Optional[str], json_mode: bool) -> bool:
+    """Whether a response is usable (non-empty; a JSON object in json_mode)."""
+    if not text:
+        return False
+    if not json_mode:
+        return True
+    json_text = extract_json_object(text)
+    if json_text is None:
+        return False
+    try:
+        data = loads_json(json_text)
+    except ValueError:
+        return False
+    return isinstance(data, dict) and data.get("status") != "failed"
+
+
+async def run_hedged(
+    primary: Callable[[], Awaitable[str]],
+    secondary: Callable[[], Awaitable[str]],
+    delay: float,
+    json_mode: bool = True,
+    metric_key: str = "total"
+) -> str:
+    """
+    Run primary; if it is still pending after `delay`, also run secondary.
+
+    Args:
+        primary: Factory for the primary call
+        secondary: Factory for the hedge call
+        delay: Seconds to wait before hedging
+        json_mode: Whether responses must be JSON objects to count as valid
+        metric_key: Key for the hedges_fired / hedges_won counters
+
+    Returns:
+        str: First valid response (or the primary's response if none is valid)
+    """
+    primary_task = asyncio.ensure_future(primary())
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+    except asyncio.CancelledError:
+        primary_task.cancel()
+        raise
+    if done:
+        return primary_task.result()
+
+    metrics.increment("hedges_fired", metric_key)
+    hedge_task = asyncio.ensure_future(secondary())
+    pending = {primary_task, hedge_task}
+    first_error: Optional[BaseException] = None
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    first_error = first_error or task.exception()
+                    continue
+                if is_valid_response(task.result(), json_mode):
+                    if task is hedge_task:
+                        metrics.increment("hedges_won", metric_key)
+                    return task.result()
+    finally:
+        # Cancel the loser and wait for it to release its resources
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    # No valid response: prefer the primary's answer, then its error
+    if primary_task.exception() is None:
+        return primary_task.result()
+    if hedge_task.exception() is None:
+        return hedge_task.result()
+    raise first_error
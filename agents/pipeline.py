@@ -0,0 +1,412 @@
+"""
+Analysis pipeline orchestrating specialists, supervisor and synthesizer.
+
+Two execution modes are supported:
+- phased: all specialists run (Phase 1), then all reviews run (Phase 2)
+- pipelined: each specialist report flows straight into its own review loop,
+  so the critical path is max(analysis + review) per agent instead of
+  max(analysis) + max(review)
+"""
+import asyncio
+import time
+from typing import Callable, List, Optional, Tuple
+from agents.specialist_analysis import analyze_single, run_specialist_analysis
+from agents.review_loop import run_review_loop, run_review_stage
+from agents.retry import DeadlineExceeded, set_request_deadline
+from agents.synthesizer import run_synthesis
+from config.app_config import get_pipeline_config
+from config.llm_config import get_model_signature, get_retry_config
+from models.schemas import SpecialistReport, ReviewFeedback, FinalAnalysis
+from prompts.system_prompts import PROMPT_VERSION
+from utils.cache import analysis_cache_key
+from utils.data_loader import DataLoader
+from utils.logger import Logger
+from utils.response_parser import track_parse_failures
+
+
+PIPELINE_MODES = ("phased", "pipelined")
+
+# (initial_report, final_report, feedback_history) for one specialist
+AgentOutcome = Tuple[SpecialistReport, SpecialistReport, List[ReviewFeedback]]
+
+# Called with (event_name, payload) as results become available:
+# specialist_report, review, agent_complete and final_analysis
+PipelineEventCallback = Callable[[str, dict], None]
+
+
+def _emit(on_event: Optional[PipelineEventCallback], event: str, data: dict):
+    """Send a progress event if a callback was given."""
+    if on_event is not None:
+        on_event(event, data)
+
+
+def _feedback_emitter(on_event: Optional[PipelineEventCallback]):
+    """Adapt on_event to the review loop's (attempt, feedback) callback."""
+    if on_event is None:
+        return None
+
+    def on_feedback(attempt: int, feedback: ReviewFeedback):
+        _emit(on_event, "review", {
+            "agent_id": feedback.agent_id,
+            "attempt": attempt,
+            "feedback": feedback.model_dump()
+        })
+
+    return on_feedback
+
+
+async def run_pipelined_analysis(
+    responses: List[str],
+    data_loader: DataLoader,
+    max_rework: int = 1,
+    max_concurrency: Optional[int] = None,
+    on_event: Optional[PipelineEventCallback] = None
+) -> List[AgentOutcome]:
+    """
+    Run one analysis → review chain per specialist, all chains in parallel.
+
+    Args:
+        responses: List of 5 user responses
+        data_loader: DataLoader instance for Few-Shot examples
+        max_rework: Maximum number of rework attempts per report
+        max_concurrency: Maximum review loops running at once (None = no cap)
+        on_event: Progress callback (optional)
+
+    Returns:
+        List of AgentOutcome tuples in the original response order
+    """
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    on_feedback = _feedback_emitter(on_event)
+
+    async def agent_chain(agent_id: int, response: str) -> AgentOutcome:
+        """Analyze one response and review it as soon as it is ready."""
+        initial_report = await analyze_single(agent_id, response, data_loader)
+        print(f"✅ Agente {agent_id} ({initial_report.domain}): Score {initial_report.preliminary_score:.1f}")
+        _emit(on_event, "specialist_report", {
+            "agent_id": initial_report.agent_id,
+            "report": initial_report.model_dump()
+        })
+
+        if semaphore is None:
+            final_report, feedback_history = await run_review_loop(
+                initial_report, data_loader, response, max_rework, on_feedback
+            )
+        else:
+            async with semaphore:
+                final_report, feedback_history = await run_review_loop(
+                    initial_report, data_loader, response, max_rework, on_feedback
+                )
+
+        _emit(on_event, "agent_complete", {
+            "agent_id": final_report.agent_id,
+            "report": final_report.model_dump()
+        })
+        return initial_report, final_report, feedback_history
+
+    return await asyncio.gather(*[
+        agent_chain(agent_id, response)
+        for agent_id, response in enumerate(responses, start=1)
+    ])
+
+
+async def run_phased_analysis(
+    responses: List[str],
+    data_loader: DataLoader,
+    max_rework: int = 1,
+    max_concurrency: Optional[int] = None,
+    on_event: Optional[PipelineEventCallback] = None
+) -> List[AgentOutcome]:
+    """
+    Run all specialists first, then all review loops.
+
+    Args:
+        responses: List of 5 user responses
+        data_loader: DataLoader instance for Few-Shot examples
+        max_rework: Maximum number of rework attempts per report
+        max_concurrency: Maximum review loops running at once (None = no cap)
+        on_event: Progress callback (optional)
+
+    Returns:
+        List of AgentOutcome tuples in the original response order
+    """
+    print(f"\n{'='*60}")
+    print("🔬 FASE 1: ANÁLISE PARALELA DOS ESPECIALISTAS")
+    print(f"{'='*60}\n")
+
+    specialist_reports = await run_specialist_analysis(responses, data_loader)
+
+    for idx, report in enumerate(specialist_reports, 1):
+        print(f"✅ Agente {idx} ({report.domain}): Score {report.preliminary_score:.1f}")
+        _emit(on_event, "specialist_report", {
+            "agent_id": report.agent_id,
+            "report": report.model_dump()
+        })
+
+    print(f"\n{'='*60}")
+    print("👨‍💼 FASE 2: LOOP DE REVISÃO COM SUPERVISOR")
+    print(f"{'='*60}\n")
+
+    review_results = await run_review_stage(
+        reports=specialist_reports,
+        data_loader=data_loader,
+        user_responses=responses,
+        max_rework=max_rework,
+        max_concurrency=max_concurrency,
+        on_feedback=_feedback_emitter(on_event)
+    )
+
+    for final_report, _ in review_results:
+        _emit(on_event, "agent_complete", {
+            "agent_id": final_report.agent_id,
+            "report": final_report.model_dump()
+        })
+
+    return [
+        (initial_report, final_report, feedback_history)
+        for initial_report, (final_report, feedback_history)
+        in zip(specialist_reports, review_results)
+    ]
+
+
+async def run_analysis(
+    responses: List[str],
+    data_loader: DataLoader,
+    logger: Optional[Logger] = None,
+    mode: Optional[str] = None,
+    cache=None,
+    on_event: Optional[PipelineEventCallback] = None
+) -> FinalAnalysis:
+    """
+    Run the complete analysis (specialists, reviews and synthesis).
+
+    Args:
+        responses: List of 5 user responses
+        data_loader: DataLoader instance for Few-Shot examples
+        logger: Logger with an active request log (optional)
+        mode: "phased" or "pipelined" (defaults to PIPELINE_MODE)
+        cache: Result cache (MemoryCache/SQLiteCache) keyed on normalized
+            responses, model, prompt version and Few-Shot mode/seed (optional). Analyses where
+            any agent response failed to parse (placeholder reports,
+            auto-approved reviews, fallback synthesis) are not cached.
+        on_event: Called with (event_name, payload) as each specialist
+            report, supervisor verdict and the final analysis complete (optional)
+
+    Returns:
+        FinalAnalysis with consolidated results
+
+    Raises:
+        ValueError: If mode is not a known pipeline mode
+    """
+    config = get_pipeline_config()
+    mode = mode or config["mode"]
+
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Invalid pipeline mode: {mode}. Must be one of {PIPELINE_MODES}.")
+
+    cache_key = None
+    if cache is not None:
+        cache_key = analysis_cache_key(
+            responses,
+            get_model_signature(),
+            PROMPT_VERSION,
+            few_shot_mode=data_loader.few_shot_mode,
+            seed=data_loader.seed
+        )
+        cached = await cache.aget(cache_key)
+        cache_hit = cached is not None
+
+        if logger and logger.current_log:
+            logger.log_event(
+                event_type="cache_lookup",
+                data={"hit": cache_hit, "key": cache_key}
+            )
+            logger.current_log.cache_hit = cache_hit
+
+        if cache_hit:
+            print("⚡ Análise servida do cache")
+            final_analysis = FinalAnalysis.model_validate_json(cached)
+            _emit(on_event, "final_analysis", final_analysis.model_dump())
+            return final_analysis
+
+    # Shared with every agent task of this request
+    parse_failures = track_parse_failures()
+
+    if mode == "pipelined":
+        print(f"\n{'='*60}")
+        print("🔬 FASES 1+2: ANÁLISE E REVISÃO EM PIPELINE")
+        print(f"{'='*60}\n")
+        run_agents = run_pipelined_analysis
+    else:
+        run_agents = run_phased_analysis
+
+    outcomes = await run_agents(
+        responses,
+        data_loader,
+        max_rework=config["max_rework"],
+        max_concurrency=config["review_max_concurrency"],
+        on_event=on_event
+    )
+
+    approved_reports = []
+
+    # Log grouped per agent to keep each agent's events in order
+    for initial_report, final_report, feedback_history in outcomes:
+        if logger:
+            logger.log_event(
+                event_type="specialist_analysis",
+                agent_id=initial_report.agent_id,
+                attempt=1,
+                data=initial_report.model_dump()
+            )
+
+        print(f"Revisão do Agente {final_report.agent_id}:")
+
+        for attempt_num, feedback in enumerate(feedback_history, 1):
+            if logger:
+                logger.log_event(
+                    event_type="reviewer_feedback",
+                    agent_id=feedback.agent_id,
+                    attempt=attempt_num,
+                    data=feedback.model_dump()
+                )
+
+            if feedback.status == "APROVADO":
+                print(f"  ✅ APROVADO (Tentativa {attempt_num})")
+            else:
+                print(f"  🔄 REVISAR (Tentativa {attempt_num})")
+
+        approved_reports.append(final_report)
+
+    # Phase 3 starts as soon as the last approved report lands
+    print(f"\n{'='*60}")
+    print("🎯 FASE 3: SÍNTESE FINAL")
+    print(f"{'='*60}\n")
+
+    final_analysis = await run_synthesis(approved_reports)
+
+    if logger:
+        logger.log_event(
+            event_type="final_synthesis",
+            data=final_analysis.model_dump()
+        )
+
+    _emit(on_event, "final_analysis", final_analysis.model_dump())
+
+    if cache is not None:
+        if parse_failures:
+            # Degraded result (e.g. provider outage): let the next request retry
+            print(f"⚠️ Análise não armazenada no cache: falha de parsing em {', '.join(sorted(set(parse_failures)))}")
+            if logger and logger.current_log:
+                logger.log_event(
+                    event_type="cache_skip",
+                    data={"reason": "parse_failures", "agents": parse_failures}
+                )
+        else:
+            await cache.aset(cache_key, final_analysis.model_dump_json())
+
+    return final_analysis
+
+
+async def run_request(
+    responses: List[str],
+    data_loader: DataLoader,
+    logger: Logger,
+    cache=None,
+    on_event: Optional[PipelineEventCallback] = None
+) -> FinalAnalysis:
+    """
+    Run one analysis request with its deadline and audit log.
+
+    Sets the request-wide deadline (REQUEST_DEADLINE_SECONDS), opens a
+    request log, runs run_analysis and finalizes the log, recording errors.
+    Shared by the HTTP endpoints, the job workers and the batch runner.
+
+    Args:
+        responses: List of 5 user responses
+        data_loader: DataLoader instance for Few-Shot examples
+        logger: Logger for the request's audit log
+        cache: Result cache (optional)
+        on_event: Progress callback, also receives a "started" event (optional)
+
+    Returns:
+        FinalAnalysis with consolidated results
+
+    Raises:
+        DeadlineExceeded: If the request deadline passes (error already logged)
+        asyncio.CancelledError: If the request is cancelled (log finalized)
+        Exception: Any other pipeline error (error already logged)
+    """
+    start_time = time.time()
+
+    try:
+        # Request-wide deadline shared by every LLM call of this request
+        set_request_deadline(get_retry_config()["request_deadline"])
+
+        # Start logging
+        request_id = logger.start_request_log({"responses": responses})
+        logger.log_event(
+            event_type="request_received",
+            data={"num_responses": len(responses)}
+        )
+        if on_event is not None:
+            on_event("started", {"request_id": request_id})
+
+        # Phases 1-3: specialists, supervisor reviews and synthesis
+        final_analysis = await run_analysis(
+            responses,
+            data_loader,
+            logger=logger,
+            cache=cache,
+            on_event=on_event
+        )
+
+        print(f"📊 Score Final: {final_analysis.final_score:.1f}")
+        print(f"⚠️  Nível de Risco: {final_analysis.risk_level}")
+        print(f"🔍 Fatores Identificados: {len(final_analysis.consolidated_factors)}")
+
+        # Finalize log (written by the background audit writer)
+        duration = time.time() - start_time
+        logger.finalize_log(
+            response=final_analysis.model_dump(),
+            duration=duration
+        )
+
+        print(f"\n⏱️  Tempo total: {duration:.2f}s")
+        print(f"📝 Log salvo: {request_id}\n")
+
+        return final_analysis
+
+    except DeadlineExceeded as e:
+        if logger.current_log:
+            logger.log_event(
+                event_type="error",
+                data={"error": str(e), "type": type(e).__name__}
+            )
+            logger.finalize_log(duration=time.time() - start_time)
+
+        print(f"\n⏱️  PRAZO EXCEDIDO: {str(e)}\n")
+        raise
+
+    except asyncio.CancelledError:
+        # Client disconnected (/analyze/stream) or job cancelled: still write the log
+        if logger.current_log:
+            logger.log_event(
+                event_type="error",
+                data={"error": "cancelled", "type": "CancelledError"}
+            )
+            logger.finalize_log(duration=time.time() - start_time)
+
+        print("\n🛑 ANÁLISE CANCELADA\n")
+        raise
+
+    except Exception as e:
+        # Log error
+        if logger.current_log:
+            logger.log_event(
+                event_type="error",
+                data={"error": str(e), "type": type(e).__name__}
+            )
+            logger.finalize_log()
+
+        print(f"\n❌ ERRO: {str(e)}\n")
+        raise
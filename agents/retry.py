@@ -0,0 +1,118 @@
+"""
+Retry, backoff and deadline helpers for LLM calls.
+
+A request-wide deadline is stored in a context variable: the /analyze
+handler sets it once, and every AgentWrapper.run call made while serving
+that request caps its per-call timeout and retries to the time left.
+"""
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+# Absolute deadline (time.monotonic()) of the request being served
+_request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request-wide deadline has passed."""
+
+
+def set_request_deadline(seconds: Optional[float]):
+    """
+    Set the deadline for the current request context.
+
+    Args:
+        seconds: Seconds from now (None or 0 disables the deadline)
+    """
+    _request_deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def get_request_deadline() -> Optional[float]:
+    """Absolute deadline (time.monotonic()) of the current request, if any."""
+    return _request_deadline.get()
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the request deadline (None if there is no deadline)."""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def is_retryable(exc: Exception) -> bool:
+    """
+    Whether a provider error is worth retrying.
+    Retries rate limits (429), server errors (5xx), timeouts and connection errors.
+    """
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+
+    try:
+        import openai
+        if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+    except ImportError:
+        pass
+
+    status_code = getattr(exc, "status_code", None)
+    return status_code == 429 or (status_code is not None and status_code >= 500)
+
+
+def get_retry_after(exc: Exception) -> Optional[float]:
+    """
+    Read the Retry-After hint (seconds) from a provider error, if any.
+    Supports retry-after-ms, retry-after in seconds and retry-after as an HTTP date.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(
+    attempt: int,
+    base: float,
+    maximum: float,
+    retry_after: Optional[float] = None
+) -> float:
+    """
+    Exponential backoff with full jitter, never shorter than Retry-After.
+
+    Args:
+        attempt: Number of the attempt that just failed (1-based)
+        base: Base delay in seconds
+        maximum: Maximum delay in seconds
+        retry_after: Server-provided minimum delay (optional)
+
+    Returns:
+        Seconds to wait before the next attempt
+    """
+    delay = random.uniform(0, min(maximum, base * (2 ** (attempt - 1))))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, maximum))
+    return delay
@@ -2,18 +2,25 @@
 Review loop with supervisor for quality control using Agent Framework.
 """
 import asyncio
-import json
-from typing import List, Tuple
+from typing import Callable, List, Optional, Tuple
 from agents.agent_factory import create_supervisor_agent, create_specialist_agent
+from config.llm_config import get_report_budget_config
 from models.schemas import SpecialistReport, ReviewFeedback
 from utils.data_loader import DataLoader
+from utils.report_serializer import fit_reports
+from utils.response_parser import ResponseParseError, parse_response
+
+
+# Called with (attempt, feedback) as soon as each supervisor verdict arrives
+FeedbackCallback = Callable[[int, ReviewFeedback], None]
 
 
 async def run_review_loop(
     report: SpecialistReport,
     data_loader: DataLoader,
     user_response: str,
-    max_rework: int = 1
+    max_rework: int = 1,
+    on_feedback: Optional[FeedbackCallback] = None
 ) -> Tuple[SpecialistReport, List[ReviewFeedback]]:
     """
     Run review loop for a single specialist report.
@@ -23,21 +30,24 @@ async def run_review_loop(
         data_loader: DataLoader for Few-Shot examples
         user_response: Original user response
         max_rework: Maximum number of rework attempts
+        on_feedback: Called with each verdict as it arrives (optional)
         
     Returns:
         Tuple of (final_report, feedback_history)
     """
     supervisor = create_supervisor_agent()
+    budget = get_report_budget_config("supervisor")
     
     feedback_history = []
     current_report = report
     
     for attempt in range(max_rework + 1):
         # Create review task
+        report_json = fit_reports([current_report], supervisor.provider, supervisor.model, **budget)[0]
         review_message = f"""Revise o seguinte relatório de análise:
 
 RELATÓRIO DO AGENTE:
-{current_report.model_dump_json(indent=2)}
+{report_json}
 
 Avalie a qualidade da análise e determine se está APROVADO ou precisa de REVISÃO."""
         
@@ -46,16 +56,8 @@ Avalie a qualidade da análise e determine se está APROVADO ou precisa de REVIS
         
         # Parse feedback
         try:
-            if '```json' in response_text:
-                json_text = response_text.split('```json')[1].split('```')[0].strip()
-            elif '```' in response_text:
-                json_text = response_text.split('```')[1].split('```')[0].strip()
-            else:
-                json_text = response_text.strip()
-            
-            feedback_data = json.loads(json_text)
-            feedback = ReviewFeedback(**feedback_data)
-        except Exception as e:
+            feedback = parse_response(response_text, ReviewFeedback, agent=supervisor.name)
+        except ResponseParseError:
             # Default to approval on parse error
             feedback = ReviewFeedback(
                 status="APROVADO",
@@ -64,6 +66,8 @@ Avalie a qualidade da análise e determine se está APROVADO ou precisa de REVIS
             )
         
         feedback_history.append(feedback)
+        if on_feedback is not None:
+            on_feedback(attempt + 1, feedback)
         
         # Check if approved
         if feedback.status == "APROVADO":
@@ -81,6 +85,44 @@ Avalie a qualidade da análise e determine se está APROVADO ou precisa de REVIS
     return current_report, feedback_history
 
 
+async def run_review_stage(
+    reports: List[SpecialistReport],
+    data_loader: DataLoader,
+    user_responses: List[str],
+    max_rework: int = 1,
+    max_concurrency: Optional[int] = None,
+    on_feedback: Optional[FeedbackCallback] = None
+) -> List[Tuple[SpecialistReport, List[ReviewFeedback]]]:
+    """
+    Run the review loops for all specialist reports concurrently.
+    
+    Args:
+        reports: Specialist reports from Phase 1 (one per user response)
+        data_loader: DataLoader for Few-Shot examples
+        user_responses: Original user responses, aligned with reports
+        max_rework: Maximum number of rework attempts per report
+        max_concurrency: Maximum review loops running at once (None = no cap)
+        on_feedback: Called with each verdict as it arrives (optional)
+        
+    Returns:
+        List of (final_report, feedback_history) tuples in the same order as reports
+    """
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    
+    async def review_single(report: SpecialistReport, user_response: str):
+        """Review one report, respecting the concurrency cap."""
+        if semaphore is None:
+            return await run_review_loop(report, data_loader, user_response, max_rework, on_feedback)
+        async with semaphore:
+            return await run_review_loop(report, data_loader, user_response, max_rework, on_feedback)
+    
+    # gather preserves input order regardless of completion order
+    return await asyncio.gather(*[
+        review_single(report, user_response)
+        for report, user_response in zip(reports, user_responses)
+    ])
+
+
 async def _rework_analysis(
     original_report: SpecialistReport,
     feedback: ReviewFeedback,
@@ -100,15 +142,21 @@ async def _rework_analysis(
         Improved SpecialistReport
     """
     agent_id = int(original_report.agent_id)
-    examples = data_loader.get_few_shot_examples(agent_id, num_examples=5)
+    examples = data_loader.get_few_shot_examples(agent_id, num_examples=5, query=user_response)
     
-    specialist = create_specialist_agent(agent_id, examples)
+    specialist = create_specialist_agent(agent_id, examples, role="rework")
+    report_json = fit_reports(
+        [original_report],
+        specialist.provider,
+        specialist.model,
+        **get_report_budget_config("rework")
+    )[0]
     
     rework_message = f"""RELATO ATUAL DA USUÁRIA:
 "{user_response}"
 
 SUA ANÁLISE ANTERIOR:
-{original_report.model_dump_json(indent=2)}
+{report_json}
 
 FEEDBACK DO SUPERVISOR:
 {feedback.feedback}
@@ -120,16 +168,7 @@ Retorne a análise melhorada em formato JSON."""
     response_text = await specialist.run(rework_message, json_mode=True)
     
     try:
-        if '```json' in response_text:
-            json_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in response_text:
-            json_text = response_text.split('```')[1].split('```')[0].strip()
-        else:
-            json_text = response_text.strip()
-        
-        report_data = json.loads(json_text)
-        improved_report = SpecialistReport(**report_data)
-        return improved_report
-    except Exception as e:
+        return parse_response(response_text, SpecialistReport, agent=specialist.name)
+    except ResponseParseError:
         # Return original if rework fails
         return original_report
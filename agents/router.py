@@ -0,0 +1,195 @@
+"""
+Health-aware routing of agent roles to LLM providers.
+
+Each role (specialist, rework, supervisor, synthesizer) has a preferred
+provider/model (LLM_ROUTE_<ROLE>). The router tracks a rolling window of
+outcomes and latencies per provider; a provider whose error rate or run of
+consecutive failures crosses the threshold is degraded for a cooldown
+period, and calls are routed to the healthiest other configured provider.
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from config.llm_config import (
+    get_configured_providers,
+    get_model_name,
+    get_role_routes,
+    get_router_config
+)
+
+
+class ProviderHealth:
+    """Rolling outcome/latency window for one provider."""
+
+    def __init__(self, window: int = 50):
+        self.samples: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.degraded_until = 0.0
+
+    def record(self, ok: bool, latency: float):
+        """Add the outcome of one call."""
+        self.samples.append((ok, latency))
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for ok, _ in self.samples if not ok) / len(self.samples)
+
+    @property
+    def avg_latency(self) -> float:
+        latencies = [latency for ok, latency in self.samples if ok]
+        return sum(latencies) / len(latencies) if latencies else 0.0
+
+
+class ProviderRouter:
+    """Routes roles to provider/model pairs and fails over away from degraded providers."""
+
+    def __init__(
+        self,
+        providers: List[str],
+        routes: Dict[str, Tuple[str, str]],
+        window: int = 50,
+        error_threshold: float = 0.5,
+        min_samples: int = 5,
+        max_consecutive_failures: int = 3,
+        cooldown_seconds: float = 30,
+        max_failovers: int = 1
+    ):
+        """
+        Initialize ProviderRouter.
+
+        Args:
+            providers: Configured providers (in precedence order)
+            routes: Role -> preferred (provider, model)
+            window: Recent calls tracked per provider
+            error_threshold: Error rate above which a provider is degraded
+            min_samples: Calls required before the error rate is trusted
+            max_consecutive_failures: Failures in a row that degrade a provider
+            cooldown_seconds: How long a degraded provider is avoided
+            max_failovers: Other providers tried after the preferred one fails
+        """
+        self.providers = list(providers)
+        self.routes = dict(routes)
+        self.error_threshold = error_threshold
+        self.min_samples = min_samples
+        self.max_consecutive_failures = max_consecutive_failures
+        self.cooldown_seconds = cooldown_seconds
+        self.max_failovers = max_failovers
+        self._lock = threading.Lock()
+        self._health: Dict[str, ProviderHealth] = {
+            provider: ProviderHealth(window) for provider in self.providers
+        }
+        self._window = window
+
+    def _get_health(self, provider: str) -> ProviderHealth:
+        if provider not in self._health:
+            self._health[provider] = ProviderHealth(self._window)
+        return self._health[provider]
+
+    def route(self, role: str) -> Tuple[str, str]:
+        """Preferred (provider, model) for a role, ignoring health."""
+        if role in self.routes:
+            return self.routes[role]
+        provider = self.providers[0] if self.providers else "unknown"
+        return provider, get_model_name(provider)
+
+    def is_degraded(self, provider: str) -> bool:
+        """Whether a provider is currently in its cooldown period."""
+        with self._lock:
+            return self._get_health(provider).degraded_until > time.monotonic()
+
+    def record(self, provider: str, ok: bool, latency: float):
+        """
+        Record the outcome of one call and degrade the provider if needed.
+
+        Args:
+            provider: Provider that served the call
+            ok: Whether the call succeeded
+            latency: Call latency in seconds
+        """
+        with self._lock:
+            health = self._get_health(provider)
+            health.record(ok, latency)
+            if ok:
+                return
+            too_many_errors = (
+                len(health.samples) >= self.min_samples
+                and health.error_rate >= self.error_threshold
+            )
+            if too_many_errors or health.consecutive_failures >= self.max_consecutive_failures:
+                health.degraded_until = time.monotonic() + self.cooldown_seconds
+
+    def candidates(self, role: str, preferred: Optional[Tuple[str, str]] = None) -> List[Tuple[str, str]]:
+        """
+        Ordered (provider, model) pairs to try for a role.
+
+        The preferred route comes first unless it is degraded; other
+        configured providers follow, healthiest and fastest first.
+        Degraded providers are kept as a last resort.
+
+        Args:
+            role: Agent role
+            preferred: (provider, model) to prefer over the role's route (optional)
+
+        Returns:
+            At most 1 + max_failovers candidates
+        """
+        preferred = preferred or self.route(role)
+        now = time.monotonic()
+
+        with self._lock:
+            def sort_key(provider: str):
+                health = self._get_health(provider)
+                return (
+                    health.degraded_until > now,
+                    provider != preferred[0],
+                    health.error_rate,
+                    health.avg_latency,
+                )
+
+            providers = set(self.providers) | {preferred[0]}
+            ordered = sorted(providers, key=sort_key)
+
+        candidates = [
+            preferred if provider == preferred[0] else (provider, get_model_name(provider))
+            for provider in ordered
+        ]
+        return candidates[:1 + self.max_failovers]
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Health summary per provider."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                provider: {
+                    "calls": len(health.samples),
+                    "error_rate": round(health.error_rate, 4),
+                    "avg_latency": round(health.avg_latency, 4),
+                    "consecutive_failures": health.consecutive_failures,
+                    "degraded": health.degraded_until > now,
+                }
+                for provider, health in self._health.items()
+            }
+
+
+_router: Optional[ProviderRouter] = None
+
+
+def get_router() -> ProviderRouter:
+    """
+    Get the process-wide provider router (built from the environment on first use).
+
+    Returns:
+        Shared ProviderRouter
+    """
+    global _router
+    if _router is None:
+        _router = ProviderRouter(
+            providers=get_configured_providers(),
+            routes=get_role_routes(),
+            **get_router_config()
+        )
+    return _router
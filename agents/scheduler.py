@@ -0,0 +1,242 @@
+"""
+Shared scheduler for LLM calls.
+
+Caps the number of in-flight calls across all requests and enforces
+requests/min and tokens/min budgets per provider with token buckets.
+Waiting calls share one queue across providers and are served by priority
+(roles closest to finishing a request go first: synthesizer, then
+supervisor/rework, then specialists) and FIFO within the same priority, so
+no request starves the others. Calls to a provider whose budget is
+exhausted are skipped until it refills, without holding up other providers.
+"""
+import asyncio
+import bisect
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from config.llm_config import PROVIDERS, get_rate_limits, get_scheduler_config
+
+
+# Lower value = served first
+ROLE_PRIORITIES = {
+    "synthesizer": 0,
+    "supervisor": 1,
+    "rework": 1,
+    "specialist": 2,
+}
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token estimate (~4 characters per token) used for budgeting."""
+    return max(1, sum(len(text) for text in texts) // 4)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate_per_minute."""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.rate_per_second = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be consumed (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate_per_second
+
+    def consume(self, amount: float):
+        """Consume tokens (the balance may go negative to record debt)."""
+        self._refill()
+        self.tokens -= amount
+
+
+# Queued call: (priority, sequence number, provider, estimated tokens)
+QueueEntry = Tuple[int, int, str, int]
+
+
+@dataclass
+class SchedulerTicket:
+    """Grant for one LLM call; actual_tokens is filled in from the response usage."""
+    provider: str
+    estimated_tokens: int
+    actual_tokens: Optional[int] = None
+
+
+class LLMScheduler:
+    """Priority scheduler with a global in-flight cap and per-provider rate limits."""
+
+    def __init__(self, max_in_flight: int = 16, rate_limits: Optional[Dict[str, Tuple[int, int]]] = None):
+        """
+        Initialize LLMScheduler.
+
+        Args:
+            max_in_flight: Maximum concurrent LLM calls across all requests
+            rate_limits: Provider -> (requests/min, tokens/min); 0 disables a limit
+        """
+        self.max_in_flight = max_in_flight
+        self.rate_limits = rate_limits or {}
+        self.in_flight = 0
+        self._buckets: Dict[str, Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+        # Global wait queue, kept sorted by (priority, sequence)
+        self._waiters: List[QueueEntry] = []
+        self._seq = itertools.count()
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        """Condition bound to the running loop (recreated if the loop changed)."""
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self._waiters = []
+            self.in_flight = 0
+        return self._condition
+
+    def _get_buckets(self, provider: str) -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+        if provider not in self._buckets:
+            rpm, tpm = self.rate_limits.get(provider, (0, 0))
+            self._buckets[provider] = (
+                TokenBucket(rpm) if rpm else None,
+                TokenBucket(tpm) if tpm else None,
+            )
+        return self._buckets[provider]
+
+    def _budget_wait(self, provider: str, tokens: int) -> float:
+        """Seconds until both the request and token budgets allow this call."""
+        request_bucket, token_bucket = self._get_buckets(provider)
+        wait = 0.0
+        if request_bucket:
+            wait = max(wait, request_bucket.wait_time(1))
+        if token_bucket:
+            wait = max(wait, token_bucket.wait_time(tokens))
+        return wait
+
+    def _next_grant(self) -> Tuple[Optional[QueueEntry], Dict[QueueEntry, float]]:
+        """
+        Pick the queued call to serve next.
+
+        Walks the queue in (priority, FIFO) order and returns the first call
+        whose provider budget allows it. Once a provider's first waiter is
+        blocked, the provider's later calls are skipped too (FIFO per provider).
+
+        Returns:
+            (entry to serve or None, {blocked first waiter: seconds until its budget allows it})
+        """
+        blocked: Set[str] = set()
+        waits: Dict[QueueEntry, float] = {}
+        for entry in self._waiters:
+            provider, tokens = entry[2], entry[3]
+            if provider in blocked:
+                continue
+            wait = self._budget_wait(provider, tokens)
+            if wait == 0:
+                return entry, waits
+            blocked.add(provider)
+            waits[entry] = wait
+        return None, waits
+
+    async def acquire(self, provider: str, estimated_tokens: int, priority: int = 2) -> SchedulerTicket:
+        """
+        Wait for a slot and budget, then reserve them.
+
+        Args:
+            provider: Provider the call will go to
+            estimated_tokens: Estimated prompt tokens for the call
+            priority: Lower is served first (see ROLE_PRIORITIES)
+
+        Returns:
+            SchedulerTicket to pass to release()
+        """
+        condition = self._get_condition()
+        entry = (priority, next(self._seq), provider, estimated_tokens)
+
+        async with condition:
+            bisect.insort(self._waiters, entry)
+            try:
+                while True:
+                    timeout = None
+                    if self.in_flight < self.max_in_flight:
+                        chosen, waits = self._next_grant()
+                        if chosen == entry:
+                            self._waiters.remove(entry)
+                            self.in_flight += 1
+                            request_bucket, token_bucket = self._get_buckets(provider)
+                            if request_bucket:
+                                request_bucket.consume(1)
+                            if token_bucket:
+                                token_bucket.consume(estimated_tokens)
+                            condition.notify_all()
+                            return SchedulerTicket(provider, estimated_tokens)
+                        # First waiter of a rate-limited provider: wake up when its budget refills
+                        timeout = waits.get(entry)
+                    try:
+                        await asyncio.wait_for(condition.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                # Cancelled while waiting: leave the queue without blocking others
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    condition.notify_all()
+                raise
+
+    async def release(self, ticket: SchedulerTicket):
+        """
+        Release a slot and reconcile the token budget with actual usage.
+
+        Args:
+            ticket: Ticket returned by acquire()
+        """
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            _, token_bucket = self._get_buckets(ticket.provider)
+            if token_bucket and ticket.actual_tokens is not None:
+                token_bucket.consume(ticket.actual_tokens - ticket.estimated_tokens)
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self, provider: str, estimated_tokens: int, priority: int = 2):
+        """
+        Context manager around acquire/release.
+
+        Usage:
+            async with scheduler.slot("groq", 800, priority=1) as ticket:
+                ...
+        """
+        ticket = await self.acquire(provider, estimated_tokens, priority)
+        try:
+            yield ticket
+        finally:
+            await self.release(ticket)
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_scheduler() -> LLMScheduler:
+    """
+    Get the process-wide LLM scheduler (created from the environment on first use).
+
+    Returns:
+        Shared LLMScheduler
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(
+            max_in_flight=get_scheduler_config()["max_in_flight"],
+            rate_limits={provider: get_rate_limits(provider) for provider in PROVIDERS}
+        )
+    return _scheduler
@@ -2,73 +2,231 @@
 Specialist analysis with parallel execution using Agent Framework.
 """
 import asyncio
-import json
-from typing import List
-from agents.agent_factory import create_specialist_agent
+from typing import List, Optional, Tuple
+from pydantic import BaseModel
+from agents.agent_factory import ProgressCallback, create_specialist_agent
+from agents.coalescer import CallCoalescer
+from config.app_config import get_coalescing_config
+from config.llm_config import get_model_config
+from config.llm_config import get_streaming_config
 from utils.data_loader import DataLoader
+from utils.metrics import metrics
+from utils.response_parser import ResponseParseError, extract_json_object, loads_json, parse_response
 from models.schemas import SpecialistReport
 
 
-async def run_specialist_analysis(
-    responses: List[str],
-    data_loader: DataLoader
-) -> List[SpecialistReport]:
+# Shared across requests when SPECIALIST_COALESCING_ENABLED=true (created on first use)
+_coalescer: Optional[CallCoalescer] = None
+
+
+class IndexedReport(SpecialistReport):
+    """Specialist report tagged with the number of the relato it analyzes."""
+    index: int
+
+
+class ReportBatch(BaseModel):
+    """Response schema of a coalesced specialist call."""
+    reports: List[IndexedReport]
+
+
+async def analyze_single(
+    agent_id: int,
+    response: str,
+    data_loader: DataLoader,
+    on_progress: Optional[ProgressCallback] = None
+) -> SpecialistReport:
     """
-    Run parallel analysis by all 5 specialist agents.
+    Analyze a single response with one specialist.
+    
+    The call is streamed when LLM_STREAMING_ENABLED is set or a progress
+    callback is given; the report is parsed as soon as its JSON closes.
+    With SPECIALIST_COALESCING_ENABLED, non-streamed calls for the same
+    specialist from concurrent requests are merged into one LLM call; a
+    relato missing from the merged response is retried with its own call,
+    made from (and logged in) this request.
     
     Args:
-        responses: List of 5 user responses
+        agent_id: Specialist agent identifier (1-5)
+        response: User response to analyze
         data_loader: DataLoader instance for Few-Shot examples
+        on_progress: Called with each streamed text chunk (optional)
         
     Returns:
-        List of SpecialistReport objects
+        SpecialistReport (error report if the response cannot be parsed)
     """
+    stream = on_progress is not None or get_streaming_config()["enabled"]
+    if not stream:
+        coalescer = _get_coalescer()
+        if coalescer is not None:
+            report = await coalescer.submit(agent_id, (response, data_loader))
+            if report is not None:
+                return report
     
-    async def analyze_single(agent_id: int, response: str) -> SpecialistReport:
-        """Analyze single response with one specialist."""
-        # Get Few-Shot examples for this agent
-        examples = data_loader.get_few_shot_examples(agent_id, num_examples=5)
-        
-        # Create specialist agent (using Agent Framework)
-        specialist = create_specialist_agent(agent_id, examples)
-        
-        # Create task message
-        task_message = f"""RELATO ATUAL DA USUÁRIA:
+    return await _analyze_direct(agent_id, response, data_loader, stream, on_progress)
+
+
+async def _analyze_direct(
+    agent_id: int,
+    response: str,
+    data_loader: DataLoader,
+    stream: bool = False,
+    on_progress: Optional[ProgressCallback] = None
+) -> SpecialistReport:
+    """Analyze one response with its own LLM call."""
+    # Get Few-Shot examples for this agent (matched to the response in similar mode)
+    examples = data_loader.get_few_shot_examples(agent_id, num_examples=5, query=response)
+    
+    # Create specialist agent (using Agent Framework)
+    specialist = create_specialist_agent(agent_id, examples)
+    
+    # Create task message
+    task_message = f"""RELATO ATUAL DA USUÁRIA:
 "{response}"
 
 Analise este relato com base no seu domínio de expertise e nos exemplos fornecidos.
 Retorne sua análise em formato JSON conforme instruído."""
-        
-        # Run agent (Agent Framework uses .run() instead of initiate_chat)
-        response_text = await specialist.run(task_message, json_mode=True)
-        
-        # Parse JSON response
+    
+    # Run agent (Agent Framework uses .run() instead of initiate_chat)
+    response_text = await specialist.run(
+        task_message,
+        json_mode=True,
+        stream=stream,
+        on_progress=on_progress
+    )
+    
+    # Parse JSON response
+    try:
+        return parse_response(response_text, SpecialistReport, agent=specialist.name)
+    except ResponseParseError as e:
+        # Return error report
+        return SpecialistReport(
+            agent_id=str(agent_id),
+            domain=f"Specialist {agent_id}",
+            analysis=f"Error parsing response: {str(e)}",
+            preliminary_score=50.0,
+            risk_factors=[],
+            justification=f"Raw response: {response_text[:500]}"
+        )
+
+
+def _get_coalescer() -> Optional[CallCoalescer]:
+    """Get the shared specialist coalescer (None if coalescing is disabled)."""
+    global _coalescer
+    config = get_coalescing_config()
+    if not config["enabled"]:
+        return None
+    if _coalescer is None:
+        # A batch's completion (one report budget per relato) must fit the model's output limit
+        model_config = get_model_config("specialist")
+        fitting = model_config["max_output_tokens"] // max(model_config["max_tokens"], 1)
+        _coalescer = CallCoalescer(
+            _analyze_batch,
+            window_seconds=config["window_seconds"],
+            max_batch=max(1, min(config["max_batch"], fitting))
+        )
+    return _coalescer
+
+
+def _parse_batch_reports(agent_id: int, response_text: str, count: int) -> List[Optional[SpecialistReport]]:
+    """
+    Parse a {"reports": [...]} response into one report per relato.
+    
+    Reports are matched by their "index" field (1-based), falling back to
+    position. Entries that are missing or invalid come back as None.
+    """
+    reports: List[Optional[SpecialistReport]] = [None] * count
+    try:
+        entries = loads_json(extract_json_object(response_text) or "").get("reports", [])
+    except (ValueError, AttributeError):
+        return reports
+    
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get("index")
+        slot = index - 1 if isinstance(index, int) and 1 <= index <= count else position
+        if slot >= count or reports[slot] is not None:
+            continue
         try:
-            # Try to extract JSON from response
-            if '```json' in response_text:
-                json_text = response_text.split('```json')[1].split('```')[0].strip()
-            elif '```' in response_text:
-                json_text = response_text.split('```')[1].split('```')[0].strip()
-            else:
-                json_text = response_text.strip()
-            
-            report_data = json.loads(json_text)
-            report = SpecialistReport(**report_data)
-            return report
-        except Exception as e:
-            # Return error report
-            return SpecialistReport(
-                agent_id=str(agent_id),
-                domain=f"Specialist {agent_id}",
-                analysis=f"Error parsing response: {str(e)}",
-                preliminary_score=50.0,
-                risk_factors=[],
-                justification=f"Raw response: {response_text[:500]}"
-            )
+            reports[slot] = SpecialistReport.model_validate({**entry, "agent_id": str(agent_id)})
+        except ValueError:
+            continue
+    return reports
+
+
+async def _analyze_batch(
+    agent_id: int,
+    items: List[Tuple[str, DataLoader]]
+) -> List[Optional[SpecialistReport]]:
+    """
+    Analyze several relatos (from different requests) in one LLM call.
+    
+    The response must be a single JSON object, so the reports come back
+    wrapped as {"reports": [...]}. Relatos whose report is missing or
+    invalid come back as None, so each caller retries its own relato
+    individually (see analyze_single).
+    
+    Args:
+        agent_id: Specialist agent identifier (1-5)
+        items: (response, data_loader) for each coalesced call
+        
+    Returns:
+        One SpecialistReport (or None) per item, in order
+    """
+    if len(items) == 1:
+        # Nothing to merge: the caller makes the plain call in its own request context
+        return [None]
+    
+    # One system prompt serves every relato: in similar mode, match them all
+    examples = items[0][1].get_few_shot_examples(
+        agent_id,
+        num_examples=5,
+        query=" ".join(response for response, _ in items)
+    )
+    specialist = create_specialist_agent(agent_id, examples)
+    specialist.response_model = ReportBatch
+    # One report per relato: scale the completion budget, within the model's output limit
+    max_tokens = min(specialist.config["max_tokens"] * len(items), specialist.config["max_output_tokens"])
+    specialist.config = {**specialist.config, "max_tokens": max_tokens}
+    
+    relatos = "\n".join(f'[{index}] "{response}"' for index, (response, _) in enumerate(items, start=1))
+    task_message = f"""RELATOS ATUAIS ({len(items)} usuárias diferentes; analise cada relato de forma independente):
+{relatos}
+
+Analise cada relato com base no seu domínio de expertise e nos exemplos fornecidos.
+Retorne um objeto JSON no formato {{"reports": [...]}}, com uma análise por relato, na mesma ordem,
+cada uma no formato JSON instruído e com o campo "index" igual ao número do relato."""
+    
+    response_text = await specialist.run(task_message, json_mode=True)
+    reports = _parse_batch_reports(agent_id, response_text, len(items))
+    
+    metrics.increment("coalesced_batches", f"specialist_{agent_id}")
+    metrics.increment("coalesced_calls", f"specialist_{agent_id}", len(items))
+    
+    missing = reports.count(None)
+    if missing:
+        metrics.increment("coalesced_fallbacks", f"specialist_{agent_id}", missing)
+    
+    return reports
+
+
+async def run_specialist_analysis(
+    responses: List[str],
+    data_loader: DataLoader
+) -> List[SpecialistReport]:
+    """
+    Run parallel analysis by all 5 specialist agents.
     
+    Args:
+        responses: List of 5 user responses
+        data_loader: DataLoader instance for Few-Shot examples
+        
+    Returns:
+        List of SpecialistReport objects
+    """
     # Run all 5 specialists in parallel
     tasks = [
-        analyze_single(agent_id, response)
+        analyze_single(agent_id, response, data_loader)
         for agent_id, response in enumerate(responses, start=1)
     ]
     
@@ -2,28 +2,40 @@
 Synthesizer agent for final consolidated analysis using Agent Framework.
 """
 import asyncio
-import json
-from typing import List
-from agents.agent_factory import create_synthesizer_agent
+from typing import List, Optional
+from agents.agent_factory import ProgressCallback, create_synthesizer_agent
+from config.llm_config import get_report_budget_config, get_streaming_config
 from models.schemas import SpecialistReport, FinalAnalysis
+from utils.report_serializer import fit_reports
+from utils.response_parser import ResponseParseError, parse_response
 
 
-async def run_synthesis(approved_reports: List[SpecialistReport]) -> FinalAnalysis:
+async def run_synthesis(
+    approved_reports: List[SpecialistReport],
+    on_progress: Optional[ProgressCallback] = None
+) -> FinalAnalysis:
     """
     Synthesize all approved specialist reports into final analysis.
     
     Args:
         approved_reports: List of approved specialist reports
+        on_progress: Called with each streamed text chunk (optional)
         
     Returns:
         FinalAnalysis with consolidated results
     """
     synthesizer = create_synthesizer_agent()
     
-    # Prepare synthesis task
+    # Prepare synthesis task (reports shrunk together to the synthesizer's token budget)
+    reports_json = fit_reports(
+        approved_reports,
+        synthesizer.provider,
+        synthesizer.model,
+        **get_report_budget_config("synthesizer")
+    )
     reports_summary = "\n\n".join([
-        f"=== RELATÓRIO DO AGENTE {report.agent_id} - {report.domain} ===\n{report.model_dump_json(indent=2)}"
-        for report in approved_reports
+        f"=== RELATÓRIO DO AGENTE {report.agent_id} - {report.domain} ===\n{report_json}"
+        for report, report_json in zip(approved_reports, reports_json)
     ])
     
     synthesis_message = f"""Consolide os seguintes relatórios dos agentes especialistas em uma análise final:
@@ -36,28 +48,24 @@ determine o nível de risco e forneça recomendações práticas.
 Retorne em formato JSON conforme instruído."""
     
     # Get synthesis (using Agent Framework)
-    response_text = await synthesizer.run(synthesis_message, json_mode=True)
+    response_text = await synthesizer.run(
+        synthesis_message,
+        json_mode=True,
+        stream=on_progress is not None or get_streaming_config()["enabled"],
+        on_progress=on_progress
+    )
     
     # Parse response
     try:
-        if '```json' in response_text:
-            json_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in response_text:
-            json_text = response_text.split('```')[1].split('```')[0].strip()
-        else:
-            json_text = response_text.strip()
-        
-        synthesis_data = json.loads(json_text)
-        
         # Add specialist reports to synthesis
-        synthesis_data['specialist_reports'] = [
-            report.model_dump() for report in approved_reports
-        ]
-        
-        final_analysis = FinalAnalysis(**synthesis_data)
-        return final_analysis
+        return parse_response(
+            response_text,
+            FinalAnalysis,
+            agent=synthesizer.name,
+            overrides={'specialist_reports': approved_reports}
+        )
         
-    except Exception as e:
+    except ResponseParseError:
         # Create fallback synthesis
         avg_score = sum(r.preliminary_score for r in approved_reports) / len(approved_reports)
         
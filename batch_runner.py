@@ -0,0 +1,212 @@
+"""
+Offline batch runner: analyzes a JSONL file of AnalysisRequests.
+
+Each input line is an AnalysisRequest ({"responses": [...]}, optionally with
+an "id"). Results are appended to the output JSONL as they finish, one line
+per input line:
+
+    {"line": 3, "id": "abc", "key": "...", "status": "ok", "result": {...}}
+
+The output doubles as the checkpoint: rerunning the same command skips
+lines already written, so a crashed run resumes where it stopped. Identical
+submissions are analyzed once, and all requests share the same LLM clients,
+scheduler and caches.
+
+Usage:
+    python batch_runner.py input.jsonl results.jsonl [--concurrency 4] [--retry-failed]
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from agents.batch import request_key, run_batch
+from agents.agent_factory import close_llm_cache
+from agents.pipeline import run_request
+from config.app_config import (
+    get_audit_log_config,
+    get_analysis_cache_config,
+    get_batch_config,
+    get_few_shot_config
+)
+from config.llm_config import init_chat_clients, close_chat_clients
+from models.schemas import AnalysisRequest
+from utils.cache import create_cache
+from utils.data_loader import DataLoader
+from utils.log_writer import AuditLogWriter
+from utils.logger import Logger
+
+
+def load_checkpoint(output_path: Path, retry_failed: bool = False) -> Tuple[set, Dict[str, Dict], set]:
+    """
+    Read the results already written to the output file.
+
+    Invalid input lines are never retried (reparsing them gives the same
+    error), so they stay done and failed.
+
+    Args:
+        output_path: Output JSONL (may not exist yet)
+        retry_failed: Treat lines that ended in error as not done
+
+    Returns:
+        (line numbers already done, successful results by request key,
+        done line numbers whose latest result is a failure)
+    """
+    status_by_line: Dict[int, str] = {}
+    results_by_key: Dict[str, Dict] = {}
+    if not output_path.exists():
+        return set(), results_by_key, set()
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                # Partial line from a crash: that request is simply redone
+                continue
+            # A retried line appears again later: its latest record wins
+            status_by_line[record["line"]] = record.get("status")
+            if record.get("status") == "ok":
+                results_by_key[record["key"]] = {"status": "ok", "result": record["result"]}
+
+    done_lines = {
+        line for line, status in status_by_line.items()
+        if status in ("ok", "invalid") or not retry_failed
+    }
+    failed_lines = {line for line in done_lines if status_by_line[line] != "ok"}
+    return done_lines, results_by_key, failed_lines
+
+
+def read_requests(input_path: Path, done_lines: set) -> Tuple[List[Tuple[int, object, List[str]]], List[Dict]]:
+    """
+    Parse pending input lines.
+
+    Args:
+        input_path: Input JSONL of AnalysisRequests
+        done_lines: Line numbers to skip
+
+    Returns:
+        (pending (line, id, responses) tuples, records for invalid lines)
+    """
+    pending = []
+    invalid = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, raw in enumerate(f, start=1):
+            if line_number in done_lines or not raw.strip():
+                continue
+            try:
+                data = json.loads(raw)
+                request_id = data.pop("id", None) if isinstance(data, dict) else None
+                request = AnalysisRequest(**data)
+            except (ValueError, TypeError, ValidationError) as e:
+                invalid.append({"line": line_number, "status": "invalid", "error": str(e)})
+                continue
+            pending.append((line_number, request_id, request.responses))
+    return pending, invalid
+
+
+async def run(input_path: Path, output_path: Path, concurrency: int, retry_failed: bool = False) -> int:
+    """
+    Run the batch and append results to the output file.
+
+    Returns:
+        int: Number of input lines whose latest result is a failure
+            (from this run or left in the output by a previous one)
+    """
+    done_lines, results_by_key, failed_lines = load_checkpoint(output_path, retry_failed)
+    pending, invalid = read_requests(input_path, done_lines)
+    print(f"📄 {len(pending)} requisições pendentes ({len(done_lines)} já concluídas, {len(failed_lines)} com falha)")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output = open(output_path, "a", encoding="utf-8")
+    failures = len(invalid) + len(failed_lines)
+    written = 0
+
+    def write(record: Dict):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    for record in invalid:
+        write(record)
+
+    # Requests already answered in a previous run are copied, not re-analyzed
+    to_run = []
+    for line_number, request_id, responses in pending:
+        key = request_key(responses)
+        if key in results_by_key:
+            write({"line": line_number, "id": request_id, "key": key, **results_by_key[key]})
+            written += 1
+        else:
+            to_run.append((line_number, request_id, responses))
+    output.flush()
+
+    # Shared resources, as in the API server
+    data_loader = DataLoader(data_dir="data", **get_few_shot_config())
+    audit_config = get_audit_log_config()
+    log_writer = AuditLogWriter(**audit_config)
+    log_writer.start()
+    logger = Logger(log_dir=audit_config["log_dir"], writer=log_writer)
+    analysis_cache = create_cache(**get_analysis_cache_config())
+    init_chat_clients()
+
+    def on_result(key: str, indices: List[int], item: Dict):
+        """Checkpoint each finished request immediately."""
+        nonlocal failures, written
+        for index in indices:
+            line_number, request_id, _ = to_run[index]
+            write({"line": line_number, "id": request_id, "key": key, **item})
+            written += 1
+            if item["status"] != "ok":
+                failures += 1
+        output.flush()
+        print(f"✅ {written}/{len(pending)}")
+
+    async def analyze(responses: List[str]):
+        return await run_request(responses, data_loader, logger, cache=analysis_cache)
+
+    try:
+        await run_batch(
+            [responses for _, _, responses in to_run],
+            analyze,
+            max_concurrency=concurrency,
+            on_result=on_result
+        )
+    finally:
+        output.close()
+        await close_chat_clients()
+        close_llm_cache()
+        if analysis_cache is not None and hasattr(analysis_cache, "close"):
+            analysis_cache.close()
+        await asyncio.to_thread(logger.close)
+
+    return failures
+
+
+def main() -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Analisa um arquivo JSONL de AnalysisRequests em lote.")
+    parser.add_argument("input", type=Path, help="JSONL de entrada (um AnalysisRequest por linha)")
+    parser.add_argument("output", type=Path, help="JSONL de resultados (também usado como checkpoint)")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=get_batch_config()["max_concurrency"],
+        help="Requisições analisadas em paralelo (padrão: BATCH_MAX_CONCURRENCY)"
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Reprocessa linhas que terminaram com erro em uma execução anterior (linhas inválidas não)"
+    )
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args.input, args.output, args.concurrency, args.retry_failed))
+    print(f"\n🏁 Lote concluído ({failures} falhas)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Benchmark: per-call overhead of the Azure Agent Framework path vs the
+OpenAI-compatible path of AgentWrapper.
+
+Offline (default), both providers are replaced by zero-latency fakes, so the
+numbers are the wrapper's own cost per call: building (or reusing) the Azure
+agent versus building the chat.completions request. With --live the
+configured providers are called for real (requires credentials in .env).
+
+Usage:
+    python benchmarks/agent_paths.py [--calls 200] [--live]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents import agent_factory
+from agents.agent_factory import AgentWrapper
+from config.llm_config import close_chat_clients, get_configured_providers, get_model_name, init_chat_clients
+from models.schemas import ReviewFeedback
+from prompts.system_prompts import get_supervisor_prompt
+
+
+REPLY = '{"status": "APROVADO", "feedback": null, "agent_id": "1"}'
+TASK = 'Revise o relatório do agente 1: {"agent_id": "1", "preliminary_score": 40}'
+
+
+class FakeAzureClient:
+    """Agent Framework client whose agents answer immediately."""
+
+    def create_agent(self, name, instructions):
+        async def run(task, **kwargs):
+            return REPLY
+        return SimpleNamespace(name=name, instructions=instructions, run=run)
+
+
+class FakeOpenAIClient:
+    """AsyncOpenAI stand-in whose completions answer immediately."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        message = SimpleNamespace(content=REPLY)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def make_agent(provider: str, client=None) -> AgentWrapper:
+    """Supervisor agent bound to a provider (and optionally a fake client)."""
+    agent = AgentWrapper.__new__(AgentWrapper)
+    agent.name = "supervisor"
+    agent.role = "supervisor"
+    agent.instructions = get_supervisor_prompt()
+    agent.provider = provider
+    agent.model = get_model_name(provider)
+    agent.client = client
+    agent.config = {"temperature": 0.0, "max_tokens": 200}
+    agent.response_model = ReviewFeedback
+    return agent
+
+
+async def measure(label: str, provider: str, calls: int, client=None, reuse: bool = True):
+    """Time `calls` sequential calls (a new AgentWrapper per call, as the pipeline does)."""
+    if client is None:
+        client = init_chat_clients()[provider]
+    agent_factory._azure_agents.clear()
+    latencies = []
+    for _ in range(calls):
+        if not reuse:
+            agent_factory._azure_agents.clear()
+        started = time.perf_counter()
+        await make_agent(provider, client)._complete(TASK, json_mode=True)
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    unit, scale = ("ms", 1e3) if latencies[-1] > 0.01 else ("µs", 1e6)
+    print(
+        f"{label:<38} mean {statistics.mean(latencies) * scale:9.1f} {unit}"
+        f"   p50 {latencies[len(latencies) // 2] * scale:9.1f} {unit}"
+        f"   p95 {latencies[int(len(latencies) * 0.95) - 1] * scale:9.1f} {unit}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compara o custo por chamada dos caminhos Azure e OpenAI-compatível.")
+    parser.add_argument("--calls", type=int, default=200, help="Chamadas por cenário")
+    parser.add_argument("--live", action="store_true", help="Usa os provedores configurados no .env")
+    args = parser.parse_args()
+
+    if not args.live:
+        print(f"🔬 Overhead do AgentWrapper (clientes falsos, {args.calls} chamadas)\n")
+        await measure("azure_openai (novo agente por chamada)", "azure_openai", args.calls, FakeAzureClient(), reuse=False)
+        await measure("azure_openai (agente reutilizado)", "azure_openai", args.calls, FakeAzureClient())
+        await measure("openai-compatível", "openai", args.calls, FakeOpenAIClient())
+        return
+
+    providers = get_configured_providers()
+    if not providers:
+        print("❌ Nenhum provedor configurado no .env")
+        return
+    print(f"🌐 Latência real ({args.calls} chamadas por provedor)\n")
+    try:
+        for provider in providers:
+            if provider == "azure_openai":
+                await measure("azure_openai (novo agente por chamada)", provider, args.calls, reuse=False)
+                await measure("azure_openai (agente reutilizado)", provider, args.calls)
+            else:
+                await measure(provider, provider, args.calls)
+    finally:
+        await close_chat_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Benchmark: BM25 Few-Shot retrieval at dataset scale.
+
+Builds a synthetic corpus by recombining the words of the real "frase"
+column up to --rows documents, then reports index build time, save/load
+time and per-query latency for top-k retrieval.
+
+Usage:
+    python benchmarks/few_shot_retrieval.py [--rows 100000] [--queries 1000] [--top-k 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_loader import DataLoader
+from utils.example_index import BM25Index
+
+
+def synthetic_corpus(loader: DataLoader, rows: int, seed: int = 0) -> list:
+    """Sentences of 8-25 words drawn from the vocabulary of every dataset."""
+    words = [
+        word
+        for records in loader.datasets.values()
+        for record in records
+        for word in record.frase.split()
+    ]
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(words, k=rng.randint(8, 25))) for _ in range(rows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a recuperação de exemplos Few-Shot com BM25.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Documentos no corpus sintético")
+    parser.add_argument("--queries", type=int, default=1000, help="Consultas medidas")
+    parser.add_argument("--top-k", type=int, default=5, help="Exemplos por consulta")
+    args = parser.parse_args()
+
+    loader = DataLoader(data_dir="data")
+    corpus = synthetic_corpus(loader, args.rows)
+    queries = [record.frase for records in loader.datasets.values() for record in records]
+
+    started = time.perf_counter()
+    index = BM25Index.build(corpus)
+    build = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "index.npz")
+        started = time.perf_counter()
+        index.save(path)
+        save = time.perf_counter() - started
+        started = time.perf_counter()
+        index = BM25Index.load(path)
+        load = time.perf_counter() - started
+
+    print(f"📚 {args.rows} documentos, {len(index.vocabulary)} termos, {len(index.doc_ids)} postings\n")
+    print(f"{'construção':<12} {build * 1e3:9.1f} ms")
+    print(f"{'salvar':<12} {save * 1e3:9.1f} ms")
+    print(f"{'carregar':<12} {load * 1e3:9.1f} ms\n")
+
+    index.search(queries[0], args.top_k)  # warm-up
+    timings = []
+    for query_number in range(args.queries):
+        query = queries[query_number % len(queries)]
+        started = time.perf_counter()
+        index.search(query, args.top_k)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(
+        f"🔎 top-{args.top_k}: mean {statistics.mean(timings) * 1e6:.1f} µs"
+        f"   p50 {timings[len(timings) // 2] * 1e6:.1f} µs"
+        f"   p99 {timings[int(len(timings) * 0.99) - 1] * 1e6:.1f} µs"
+    )
+
+
+if __name__ == "__main__":
+    main()
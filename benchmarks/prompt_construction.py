@@ -0,0 +1,126 @@
+"""
+Microbenchmark: cost of building the prompts of one analysis request.
+
+One request builds the system prompt of the 5 specialists (Few-Shot examples
++ instructions) plus the supervisor and synthesizer prompts. Compares the
+cached path (stable mode), random mode (fresh sample, pre-rendered
+snippets) and the previous implementation (DataFrame sample + to_dict +
+string concatenation + full template render on every call). Also reports
+the DataLoader startup cost (CSV store vs pandas import + read_csv).
+
+Usage:
+    python benchmarks/prompt_construction.py [--requests 2000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompts import system_prompts
+from prompts.system_prompts import (
+    DOMAIN_DESCRIPTIONS,
+    get_domain_description,
+    get_specialist_prompt,
+    get_supervisor_prompt,
+    get_synthesizer_prompt
+)
+from utils.data_loader import DataLoader
+
+
+def legacy_examples(loader: DataLoader, agent_id: int, num_examples: int = 5) -> str:
+    """Few-Shot block as built before snippets were pre-rendered (pandas DataFrames)."""
+    df = _frames(loader)[agent_id]
+    examples = df.sample(n=num_examples, random_state=loader.seed + agent_id).to_dict('records')
+    formatted_examples = "=== EXEMPLOS DE CASOS ANTERIORES ===\n\n"
+    for idx, example in enumerate(examples, 1):
+        formatted_examples += f"EXEMPLO {idx}:\n"
+        formatted_examples += f"Relato: \"{example['frase']}\"\n"
+        formatted_examples += f"Risco: {example['risco']}\n"
+        formatted_examples += f"Fator: {example['fator']}\n"
+        formatted_examples += f"Taxonomia: {example['taxonomia']}\n"
+        formatted_examples += f"Metadata: {example['metadata']}\n"
+        formatted_examples += "\n" + "-" * 50 + "\n\n"
+    return formatted_examples
+
+
+def _frames(loader: DataLoader) -> dict:
+    """DataFrames of the loader's datasets (built once, as the previous DataLoader kept them)."""
+    if not hasattr(loader, "_benchmark_frames"):
+        loader._benchmark_frames = {agent_id: loader.get_dataset(agent_id) for agent_id in loader.datasets}
+    return loader._benchmark_frames
+
+
+def build_request_prompts(loader: DataLoader) -> int:
+    """Build every prompt of one request; returns the total characters."""
+    total = 0
+    for agent_id in DOMAIN_DESCRIPTIONS:
+        examples = loader.get_few_shot_examples(agent_id, num_examples=5)
+        total += len(get_specialist_prompt(agent_id, get_domain_description(agent_id), examples))
+    return total + len(get_supervisor_prompt()) + len(get_synthesizer_prompt())
+
+
+def build_request_prompts_legacy(loader: DataLoader) -> int:
+    """Same prompts, rendered from scratch on every call."""
+    total = 0
+    for agent_id in DOMAIN_DESCRIPTIONS:
+        examples = legacy_examples(loader, agent_id)
+        instructions = system_prompts._SPECIALIST_TEMPLATE.format(
+            agent_id=agent_id,
+            domain=get_domain_description(agent_id)
+        )
+        total += len(instructions + examples)
+    return total + len(get_supervisor_prompt()) + len(get_synthesizer_prompt())
+
+
+def measure_startup():
+    """Time DataLoader construction against the previous pandas.read_csv loading."""
+    started = time.perf_counter()
+    DataLoader(data_dir="data")
+    store = time.perf_counter() - started
+
+    started = time.perf_counter()
+    import pandas as pd
+    frames = [pd.read_csv(f"data/dataset_{agent_id}.csv") for agent_id in DOMAIN_DESCRIPTIONS]
+    legacy = time.perf_counter() - started
+    print(f"{'DataLoader (store CSV)':<34} {store * 1e3:9.1f} ms")
+    print(f"{'pandas import + read_csv':<34} {legacy * 1e3:9.1f} ms  ({len(frames)} datasets)\n")
+
+
+def measure(label: str, build, loader: DataLoader, requests: int):
+    """Time `requests` sequential prompt constructions."""
+    build(loader)  # warm-up
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        build(loader)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(
+        f"{label:<34} mean {statistics.mean(timings) * 1e6:9.1f} µs"
+        f"   p50 {timings[len(timings) // 2] * 1e6:9.1f} µs"
+        f"   p99 {timings[int(len(timings) * 0.99) - 1] * 1e6:9.1f} µs"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o custo de montar os prompts de uma requisição.")
+    parser.add_argument("--requests", type=int, default=2000, help="Requisições simuladas por cenário")
+    args = parser.parse_args()
+
+    print("🚀 Inicialização\n")
+    measure_startup()
+
+    stable = DataLoader(data_dir="data", few_shot_mode="stable")
+    random_mode = DataLoader(data_dir="data", few_shot_mode="random")
+
+    print(f"🔬 Montagem de prompts por requisição ({args.requests} requisições)\n")
+    measure("stable (fragmentos em cache)", build_request_prompts, stable, args.requests)
+    measure("random (snippets pré-renderizados)", build_request_prompts, random_mode, args.requests)
+    measure("implementação anterior", build_request_prompts_legacy, stable, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,62 @@
 """Initialize config package."""
 from .llm_config import (
+    init_chat_clients,
+    close_chat_clients,
     get_chat_client,
     get_model_name,
     get_model_config,
-    get_provider_name
+    get_report_budget_config,
+    get_provider_name,
+    get_configured_providers,
+    get_model_signature,
+    get_role_routes,
+    get_router_config,
+    get_rate_limits,
+    get_scheduler_config,
+    get_retry_config,
+    get_streaming_config,
+    get_structured_output_config,
+    get_azure_agent_config,
+    get_hedge_config
+)
+from .app_config import (
+    get_pipeline_config,
+    get_audit_log_config,
+    get_few_shot_config,
+    get_analysis_cache_config,
+    get_llm_cache_config,
+    get_stream_config,
+    get_job_config,
+    get_batch_config,
+    get_coalescing_config
 )
 
 __all__ = [
+    'init_chat_clients',
+    'close_chat_clients',
     'get_chat_client',
     'get_model_name',
     'get_model_config',
-    'get_provider_name'
+    'get_report_budget_config',
+    'get_provider_name',
+    'get_configured_providers',
+    'get_model_signature',
+    'get_role_routes',
+    'get_router_config',
+    'get_rate_limits',
+    'get_scheduler_config',
+    'get_retry_config',
+    'get_streaming_config',
+    'get_structured_output_config',
+    'get_azure_agent_config',
+    'get_hedge_config',
+    'get_pipeline_config',
+    'get_audit_log_config',
+    'get_few_shot_config',
+    'get_analysis_cache_config',
+    'get_llm_cache_config',
+    'get_stream_config',
+    'get_job_config',
+    'get_batch_config',
+    'get_coalescing_config'
 ]
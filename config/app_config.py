@@ -0,0 +1,155 @@
+"""
+Application-level configuration for the analysis pipeline.
+Values are read from environment variables (see .env.example).
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def get_pipeline_config() -> dict:
+    """
+    Get configuration for the analysis pipeline.
+
+    Returns:
+        dict: Pipeline settings
+            - mode: "pipelined" (review each report as soon as it lands) or "phased"
+            - max_rework: Maximum rework attempts per specialist report
+            - review_max_concurrency: Maximum supervisor review loops running at once
+    """
+    return {
+        "mode": os.getenv("PIPELINE_MODE", "pipelined").lower(),
+        "max_rework": int(os.getenv("MAX_REWORK_ATTEMPTS", "1")),
+        "review_max_concurrency": int(os.getenv("REVIEW_MAX_CONCURRENCY", "5")),
+    }
+
+
+def get_audit_log_config() -> dict:
+    """
+    Get configuration for the background audit log writer.
+
+    Returns:
+        dict: Keyword arguments for AuditLogWriter
+    """
+    return {
+        "log_dir": os.getenv("AUDIT_LOG_DIR", "logs"),
+        "max_bytes": int(os.getenv("AUDIT_LOG_MAX_BYTES", str(50 * 1024 * 1024))),
+        "rotate_seconds": float(os.getenv("AUDIT_LOG_ROTATE_SECONDS", "86400")),
+        "fsync_interval": float(os.getenv("AUDIT_LOG_FSYNC_SECONDS", "5")),
+        "batch_size": int(os.getenv("AUDIT_LOG_BATCH_SIZE", "100")),
+    }
+
+
+def get_few_shot_config() -> dict:
+    """
+    Get configuration for Few-Shot example selection.
+
+    Returns:
+        dict: Keyword arguments for DataLoader (few_shot_mode, seed, index_dir)
+    """
+    return {
+        "few_shot_mode": os.getenv("FEW_SHOT_MODE", "stable").lower(),
+        "seed": int(os.getenv("FEW_SHOT_SEED", "42")),
+        "index_dir": os.getenv("FEW_SHOT_INDEX_DIR", "cache/few_shot_index") or None,
+    }
+
+
+def get_analysis_cache_config() -> dict:
+    """
+    Get configuration for the whole-analysis result cache.
+
+    Returns:
+        dict: Keyword arguments for utils.cache.create_cache
+            - backend: "none" (disabled), "memory" or "sqlite"
+    """
+    return {
+        "backend": os.getenv("ANALYSIS_CACHE_BACKEND", "none").lower(),
+        "max_entries": int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1000")),
+        "ttl_seconds": float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "3600")),
+        "path": os.getenv("ANALYSIS_CACHE_PATH", "cache/analysis_cache.sqlite3"),
+    }
+
+
+def get_llm_cache_config() -> dict:
+    """
+    Get configuration for per-call LLM memoization in AgentWrapper.run.
+
+    Returns:
+        dict: Keyword arguments for utils.cache.create_cache
+            - backend: "none" (disabled, the default), "memory" or "sqlite"
+    """
+    return {
+        "backend": os.getenv("LLM_CACHE_BACKEND", "none").lower(),
+        "max_entries": int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048")),
+        "ttl_seconds": float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600")),
+        "path": os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3"),
+    }
+
+
+def get_stream_config() -> dict:
+    """
+    Get configuration for the /analyze/stream Server-Sent Events endpoint.
+
+    Returns:
+        dict: Streaming settings
+            - heartbeat_seconds: Idle time before a keep-alive comment is sent
+    """
+    return {
+        "heartbeat_seconds": float(os.getenv("SSE_HEARTBEAT_SECONDS", "15")),
+    }
+
+
+def get_job_config() -> dict:
+    """
+    Get configuration for the asynchronous job API (/jobs).
+
+    Returns:
+        dict: Job settings
+            - backend: "memory" or "sqlite" (jobs survive restarts)
+            - path: SQLite file for the sqlite backend
+            - workers: Jobs executed concurrently by the worker pool
+            - max_pending: Maximum queued + running jobs (0 = unbounded)
+            - retention_seconds: How long finished jobs can be polled
+            - poll_seconds: Idle re-check interval of the workers
+    """
+    return {
+        "backend": os.getenv("JOB_QUEUE_BACKEND", "memory").lower(),
+        "path": os.getenv("JOB_QUEUE_PATH", "cache/jobs.sqlite3"),
+        "workers": int(os.getenv("JOB_WORKERS", "2")),
+        "max_pending": int(os.getenv("JOB_MAX_PENDING", "100")),
+        "retention_seconds": float(os.getenv("JOB_RETENTION_SECONDS", "86400")),
+        "poll_seconds": float(os.getenv("JOB_POLL_SECONDS", "1.0")),
+    }
+
+
+def get_batch_config() -> dict:
+    """
+    Get configuration for batch analysis (/analyze/batch and batch_runner.py).
+
+    Returns:
+        dict: Batch settings
+            - max_concurrency: Unique requests analyzed at once
+            - max_items: Maximum requests per /analyze/batch call
+    """
+    return {
+        "max_concurrency": int(os.getenv("BATCH_MAX_CONCURRENCY", "4")),
+        "max_items": int(os.getenv("BATCH_MAX_ITEMS", "100")),
+    }
+
+
+def get_coalescing_config() -> dict:
+    """
+    Get configuration for coalescing specialist calls across requests.
+
+    Returns:
+        dict: Coalescing settings
+            - enabled: Whether concurrent calls to the same specialist are merged
+            - window_seconds: How long the first call waits for others
+            - max_batch: Relatos per merged call (a full batch is sent immediately)
+    """
+    return {
+        "enabled": os.getenv("SPECIALIST_COALESCING_ENABLED", "false").lower() == "true",
+        "window_seconds": float(os.getenv("SPECIALIST_COALESCING_WINDOW_MS", "20")) / 1000.0,
+        "max_batch": int(os.getenv("SPECIALIST_COALESCING_MAX_BATCH", "8")),
+    }
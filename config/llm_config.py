@@ -2,91 +2,329 @@
 LLM Configuration for Microsoft Agent Framework.
 Supports Azure OpenAI, OpenAI, and Groq (via OpenAI-compatible API).
 """
+import asyncio
 import os
-from typing import Any
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-def get_chat_client() -> Any:
+PROVIDERS = ("azure_openai", "openai", "groq")
+
+# Agent roles that can be routed to different providers/models
+ROLES = ("specialist", "rework", "supervisor", "synthesizer")
+
+# Process-wide client registry: one client (and connection pool) per provider
+_chat_clients: Dict[str, Any] = {}
+_http_clients: List[Any] = []
+# Event loop the registered clients belong to (httpx pools are bound to one loop)
+_clients_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_pool_config() -> dict:
     """
-    Get configured chat client for Agent Framework.
-    Tries providers in order: Azure OpenAI → OpenAI → Groq
+    Get HTTP connection pool configuration shared by all LLM clients.
     
     Returns:
-        Configured chat client for creating agents
-        
-    Raises:
-        ValueError: If no valid configuration is found
+        dict: Pool limits and HTTP/2 flag
+    """
+    return {
+        "max_connections": int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+        "max_keepalive_connections": int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        "keepalive_expiry": float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+        "http2": os.getenv("LLM_HTTP2", "true").lower() == "true",
+    }
+
+
+def _create_http_client() -> Any:
+    """
+    Create a pooled async HTTP client with keep-alive (and HTTP/2 if available).
+    
+    Returns:
+        httpx.AsyncClient configured with the pool limits
+    """
+    import httpx
+    
+    pool_config = get_http_pool_config()
+    http2 = pool_config["http2"]
+    
+    if http2:
+        try:
+            import h2  # noqa: F401  (optional dependency for HTTP/2)
+        except ImportError:
+            http2 = False
+    
+    http_client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=pool_config["max_connections"],
+            max_keepalive_connections=pool_config["max_keepalive_connections"],
+            keepalive_expiry=pool_config["keepalive_expiry"],
+        ),
+        timeout=httpx.Timeout(600.0, connect=10.0),
+    )
+    _http_clients.append(http_client)
+    return http_client
+
+
+def get_configured_providers() -> List[str]:
     """
+    Get all providers that have credentials in the environment.
     
+    Returns:
+        List of provider names in precedence order (Azure OpenAI → OpenAI → Groq)
+    """
+    providers = []
+    if os.getenv("AZURE_OPENAI_ENDPOINT"):
+        providers.append("azure_openai")
+    if os.getenv("OPENAI_API_KEY"):
+        providers.append("openai")
+    if os.getenv("GROQ_API_KEY"):
+        providers.append("groq")
+    return providers
+
+
+def _create_chat_client(provider: str) -> Any:
+    """
+    Create a new chat client for a provider.
+    
+    Args:
+        provider: Provider name (azure_openai, openai or groq)
+        
+    Returns:
+        Configured chat client for creating agents
+    """
     # Option 1: Azure OpenAI (Recommended for production)
-    azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-    if azure_endpoint:
+    if provider == "azure_openai":
         from agent_framework.azure import AzureOpenAIResponsesClient
         
         return AzureOpenAIResponsesClient(
-            endpoint=azure_endpoint,
+            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
             deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini"),
             api_key=os.getenv("AZURE_OPENAI_API_KEY"),
             api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
         )
     
     # Option 2: OpenAI direct
-    openai_key = os.getenv("OPENAI_API_KEY")
-    if openai_key:
+    if provider == "openai":
         from openai import AsyncOpenAI
         
         return AsyncOpenAI(
-            api_key=openai_key
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            http_client=_create_http_client(),
+            max_retries=0  # retries, backoff and timeouts live in AgentWrapper._call_with_retry
         )
     
     # Option 3: Groq (via OpenAI-compatible API)
-    groq_key = os.getenv("GROQ_API_KEY")
-    if groq_key:
+    if provider == "groq":
         from openai import AsyncOpenAI
         
         return AsyncOpenAI(
-            api_key=groq_key,
-            base_url="https://api.groq.com/openai/v1"
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url=os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
+            http_client=_create_http_client(),
+            max_retries=0  # retries, backoff and timeouts live in AgentWrapper._call_with_retry
         )
     
-    raise ValueError(
-        "No LLM configuration found! Please set one of:\n"
-        "  - AZURE_OPENAI_ENDPOINT + AZURE_OPENAI_API_KEY (Azure OpenAI)\n"
-        "  - OPENAI_API_KEY (OpenAI)\n"
-        "  - GROQ_API_KEY (Groq)"
-    )
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def _check_clients_loop():
+    """
+    Drop clients created under another event loop.
+    
+    Each asyncio.run() starts a new loop and closes the previous one, whose
+    connection pools can no longer be used; the clients are then rebuilt on
+    the running loop. Clients created outside any loop are adopted by the
+    first loop that uses them.
+    """
+    global _clients_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if _clients_loop is not loop:
+        if _clients_loop is not None:
+            _chat_clients.clear()
+            _http_clients.clear()
+        _clients_loop = loop
+
+
+def init_chat_clients() -> Dict[str, Any]:
+    """
+    Create one shared client per configured provider.
+    Called once at application startup (lifespan).
+    
+    Returns:
+        Dict mapping provider name to its shared client
+    """
+    _check_clients_loop()
+    for provider in get_configured_providers():
+        if provider not in _chat_clients:
+            _chat_clients[provider] = _create_chat_client(provider)
+    return dict(_chat_clients)
+
+
+def get_chat_client(provider: Optional[str] = None) -> Any:
+    """
+    Get the shared chat client for Agent Framework.
+    Tries providers in order: Azure OpenAI → OpenAI → Groq
+    
+    Clients are created once per provider and reused, so every agent shares
+    the same keep-alive connection pool. They are rebuilt when called from a
+    different event loop than the one they were created on.
+    
+    Args:
+        provider: Provider name (defaults to the active provider)
+    
+    Returns:
+        Configured chat client for creating agents
+        
+    Raises:
+        ValueError: If no valid configuration is found
+    """
+    provider = provider or get_provider_name()
+    
+    if provider == "unknown":
+        raise ValueError(
+            "No LLM configuration found! Please set one of:\n"
+            "  - AZURE_OPENAI_ENDPOINT + AZURE_OPENAI_API_KEY (Azure OpenAI)\n"
+            "  - OPENAI_API_KEY (OpenAI)\n"
+            "  - GROQ_API_KEY (Groq)"
+        )
+    
+    _check_clients_loop()
+    if provider not in _chat_clients:
+        _chat_clients[provider] = _create_chat_client(provider)
+    
+    return _chat_clients[provider]
+
+
+async def close_chat_clients():
+    """
+    Close all shared clients and their connection pools.
+    Called once at application shutdown (lifespan).
+    """
+    global _clients_loop
+    _check_clients_loop()
+    for provider, client in list(_chat_clients.items()):
+        close = getattr(client, "close", None)
+        if close is None:
+            continue
+        try:
+            result = close()
+            if hasattr(result, "__await__"):
+                await result
+        except Exception as e:
+            print(f"⚠️ Error closing {provider} client: {str(e)}")
+    
+    for http_client in _http_clients:
+        if not http_client.is_closed:
+            await http_client.aclose()
+    
+    _chat_clients.clear()
+    _http_clients.clear()
+    _clients_loop = None
 
 
-def get_model_name() -> str:
+def get_model_name(provider: Optional[str] = None) -> str:
     """
     Get the model name based on active provider.
     
+    Args:
+        provider: Provider name (defaults to the active provider)
+    
     Returns:
         str: Model name to use
     """
-    if os.getenv("AZURE_OPENAI_ENDPOINT"):
+    provider = provider or get_provider_name()
+    
+    if provider == "azure_openai":
         return os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")
-    elif os.getenv("OPENAI_API_KEY"):
+    elif provider == "openai":
         return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    elif os.getenv("GROQ_API_KEY"):
+    elif provider == "groq":
         return os.getenv("GROQ_MODEL", "llama3-8b-8192")
     
     return "gpt-4o-mini"  # Default fallback
 
 
-def get_model_config() -> dict:
+def _get_role_env(role: Optional[str], name: str) -> str:
+    """
+    Read LLM_<ROLE>_<NAME> for a role ("rework" falls back to the specialist value).
+    
+    Returns:
+        str: The role-scoped value, or "" if not set
+    """
+    if not role:
+        return ""
+    value = os.getenv(f"LLM_{role.upper()}_{name}", "")
+    if not value and role == "rework":
+        value = os.getenv(f"LLM_SPECIALIST_{name}", "")
+    return value
+
+
+def get_model_config(role: Optional[str] = None) -> dict:
     """
     Get model configuration parameters.
     
+    Role-scoped values (LLM_<ROLE>_TEMPERATURE, LLM_<ROLE>_MAX_TOKENS,
+    LLM_<ROLE>_MAX_OUTPUT_TOKENS) override the global LLM_TEMPERATURE /
+    LLM_MAX_TOKENS / LLM_MAX_OUTPUT_TOKENS.
+    
+    Args:
+        role: Agent role (specialist, rework, supervisor, synthesizer) (optional)
+    
     Returns:
         dict: Configuration for model behavior
+            - temperature: Sampling temperature
+            - max_tokens: Completion budget of one call
+            - max_output_tokens: Largest completion the model accepts (caps
+              budgets scaled for coalesced calls)
+    """
+    temperature = _get_role_env(role, "TEMPERATURE") or os.getenv("LLM_TEMPERATURE", "0.2")
+    max_tokens = _get_role_env(role, "MAX_TOKENS") or os.getenv("LLM_MAX_TOKENS", "4000")
+    max_output_tokens = _get_role_env(role, "MAX_OUTPUT_TOKENS") or os.getenv("LLM_MAX_OUTPUT_TOKENS", "16384")
+    return {
+        "temperature": float(temperature),
+        "max_tokens": int(max_tokens),
+        "max_output_tokens": int(max_output_tokens),
+    }
+
+
+# Default token budget for the reports embedded in each role's prompt (absent = unlimited)
+_REPORT_TOKEN_BUDGETS = {"synthesizer": 8000}
+
+
+def get_report_budget_config(role: str) -> dict:
     """
+    Get the budget for specialist reports embedded in a role's prompt.
+    
+    Role-scoped values (LLM_<ROLE>_REPORT_TOKENS, LLM_<ROLE>_REPORT_ANALYSIS_CHARS)
+    override the defaults and the global LLM_REPORT_ANALYSIS_CHARS.
+    
+    Only the synthesizer, which reads all five reports, is budgeted by default.
+    The supervisor and rework prompts hold the single report under review: a
+    report is already bounded by the specialist's max_tokens, and shortening
+    it saves few tokens while making the supervisor judge (and likely reject)
+    text the specialist never wrote. Set a budget for them only when prompt
+    cost matters more than review accuracy.
+    
+    Args:
+        role: Agent role receiving the reports (rework, supervisor, synthesizer)
+    
+    Returns:
+        dict: Report serialization settings
+            - max_tokens: Token budget for all reports of one prompt (0 = unlimited)
+            - analysis_chars: Cap on each report text field (0 = keep whole)
+    """
+    max_tokens = _get_role_env(role, "REPORT_TOKENS") or str(_REPORT_TOKEN_BUDGETS.get(role, 0))
+    analysis_chars = _get_role_env(role, "REPORT_ANALYSIS_CHARS") or os.getenv("LLM_REPORT_ANALYSIS_CHARS", "0")
     return {
-        "temperature": float(os.getenv("LLM_TEMPERATURE", "0.2")),
-        "max_tokens": int(os.getenv("LLM_MAX_TOKENS", "4000")),
+        "max_tokens": int(max_tokens),
+        "analysis_chars": int(analysis_chars),
     }
 
 
@@ -105,3 +343,197 @@ def get_provider_name() -> str:
         return "groq"
     
     return "unknown"
+
+
+def get_role_routes() -> Dict[str, tuple]:
+    """
+    Get the preferred provider/model for each agent role.
+    
+    Read from LLM_ROUTE_<ROLE> as "provider" or "provider:model"
+    (e.g. LLM_ROUTE_SUPERVISOR=groq:llama-3.1-8b-instant). A route without
+    a model uses LLM_<ROLE>_MODEL, then the provider's default model. Roles
+    without a route use the active provider; "rework" falls back to the
+    specialist route.
+    
+    Returns:
+        Dict mapping role to (provider, model)
+    """
+    routes = {}
+    for role in ROLES:
+        route = os.getenv(f"LLM_ROUTE_{role.upper()}", "")
+        if not route and role == "rework" and not os.getenv("LLM_REWORK_MODEL"):
+            routes[role] = routes["specialist"]
+            continue
+        
+        provider, _, model = route.partition(":")
+        default_provider = routes["specialist"][0] if role == "rework" else get_provider_name()
+        provider = provider.strip() or default_provider
+        model = model.strip() or _get_role_env(role, "MODEL") or get_model_name(provider)
+        routes[role] = (provider, model)
+    return routes
+
+
+def get_router_config() -> dict:
+    """
+    Get configuration for health-aware provider routing.
+    
+    Returns:
+        dict: Router settings
+            - window: Recent calls tracked per provider
+            - error_threshold: Error rate above which a provider is degraded
+            - min_samples: Calls required before the error rate is trusted
+            - max_consecutive_failures: Failures in a row that degrade a provider
+            - cooldown_seconds: How long a degraded provider is avoided
+            - max_failovers: Other providers tried after the preferred one fails
+    """
+    return {
+        "window": int(os.getenv("LLM_ROUTER_WINDOW", "50")),
+        "error_threshold": float(os.getenv("LLM_ROUTER_ERROR_THRESHOLD", "0.5")),
+        "min_samples": int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "5")),
+        "max_consecutive_failures": int(os.getenv("LLM_ROUTER_MAX_CONSECUTIVE_FAILURES", "3")),
+        "cooldown_seconds": float(os.getenv("LLM_ROUTER_COOLDOWN_SECONDS", "30")),
+        "max_failovers": int(os.getenv("LLM_ROUTER_MAX_FAILOVERS", "1")),
+    }
+
+
+def get_model_signature() -> str:
+    """
+    Get an identifier of the provider/model configuration in use.
+    Used in cache keys so a model change never serves stale results.
+    
+    Returns:
+        str: "role=provider:model:temperature:max_tokens" entries for every role
+    """
+    entries = []
+    for role, (provider, model) in get_role_routes().items():
+        config = get_model_config(role)
+        entries.append(f"{role}={provider}:{model}:{config['temperature']}:{config['max_tokens']}")
+    return ";".join(entries)
+
+
+# Environment variable prefix for each provider's rate limits
+_RATE_LIMIT_PREFIXES = {
+    "azure_openai": "AZURE_OPENAI",
+    "openai": "OPENAI",
+    "groq": "GROQ",
+}
+
+
+def get_rate_limits(provider: str) -> tuple:
+    """
+    Get request and token budgets for a provider.
+    Read from <PREFIX>_RPM and <PREFIX>_TPM (e.g. GROQ_RPM, GROQ_TPM).
+    
+    Args:
+        provider: Provider name
+        
+    Returns:
+        tuple: (requests per minute, tokens per minute); 0 means unlimited
+    """
+    prefix = _RATE_LIMIT_PREFIXES.get(provider, provider.upper())
+    return (
+        int(os.getenv(f"{prefix}_RPM", "0")),
+        int(os.getenv(f"{prefix}_TPM", "0")),
+    )
+
+
+def get_scheduler_config() -> dict:
+    """
+    Get configuration for the shared LLM call scheduler.
+    
+    Returns:
+        dict: max_in_flight (maximum concurrent LLM calls across all requests)
+    """
+    return {
+        "max_in_flight": int(os.getenv("LLM_MAX_IN_FLIGHT", "16")),
+    }
+
+
+def get_retry_config() -> dict:
+    """
+    Get timeout and retry configuration for LLM calls.
+    
+    Returns:
+        dict: Retry settings
+            - call_timeout: Seconds allowed per provider call
+            - max_retries: Retries after the first attempt (429/5xx/timeouts)
+            - backoff_base: Base delay for exponential backoff
+            - backoff_max: Maximum delay between attempts
+            - request_deadline: Seconds allowed for a whole /analyze request (0 = none)
+    """
+    return {
+        "call_timeout": float(os.getenv("LLM_CALL_TIMEOUT", "60")),
+        "max_retries": int(os.getenv("LLM_MAX_RETRIES", "3")),
+        "backoff_base": float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+        "backoff_max": float(os.getenv("LLM_BACKOFF_MAX", "20")),
+        "request_deadline": float(os.getenv("REQUEST_DEADLINE_SECONDS", "180")),
+    }
+
+
+def get_streaming_config() -> dict:
+    """
+    Get configuration for streamed LLM responses.
+    
+    Returns:
+        dict: Streaming settings
+            - enabled: Whether specialist and synthesizer calls stream tokens
+              (and stop reading once the JSON object is complete)
+    """
+    return {
+        "enabled": os.getenv("LLM_STREAMING_ENABLED", "false").lower() == "true",
+    }
+
+
+def get_structured_output_config() -> dict:
+    """
+    Get configuration for schema-constrained (structured output) responses.
+    
+    Returns:
+        dict: Structured output settings
+            - enabled: Whether agents send their Pydantic schema as response_format
+            - providers: Providers that accept json_schema response_format
+              (others keep json_object)
+            - strict: Whether the provider must follow the schema exactly
+    """
+    providers = os.getenv("LLM_STRUCTURED_OUTPUTS_PROVIDERS", "openai,azure_openai")
+    return {
+        "enabled": os.getenv("LLM_STRUCTURED_OUTPUTS_ENABLED", "true").lower() == "true",
+        "providers": [p.strip().lower() for p in providers.split(",") if p.strip()],
+        "strict": os.getenv("LLM_STRUCTURED_OUTPUTS_STRICT", "true").lower() == "true",
+    }
+
+
+def get_azure_agent_config() -> dict:
+    """
+    Get configuration for reused Azure Agent Framework agents.
+    
+    Returns:
+        dict: Azure agent settings
+            - cache_size: Maximum agents kept (one per name and system prompt)
+    """
+    return {
+        "cache_size": max(1, int(os.getenv("AZURE_AGENT_CACHE_SIZE", "32"))),
+    }
+
+
+def get_hedge_config() -> dict:
+    """
+    Get configuration for hedged (speculative) LLM requests.
+    
+    Returns:
+        dict: Hedging settings
+            - enabled: Whether slow calls are hedged
+            - percentile: Latency percentile after which a duplicate is fired
+            - min_samples: Latency samples required before hedging an agent
+            - min_delay: Minimum seconds before hedging
+            - provider: Secondary provider for the duplicate (None = same provider)
+            - model: Secondary model for the duplicate (None = same model)
+    """
+    return {
+        "enabled": os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true",
+        "percentile": float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+        "min_samples": int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        "min_delay": float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0")),
+        "provider": os.getenv("LLM_HEDGE_PROVIDER") or None,
+        "model": os.getenv("LLM_HEDGE_MODEL") or None,
+    }
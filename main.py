@@ -4,40 +4,105 @@ Uses Microsoft Agent Framework.
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
-import time
-from typing import Dict
+import asyncio
+import json
+from typing import Dict, Optional
 
-from models.schemas import AnalysisRequest, FinalAnalysis
+from models.schemas import AnalysisRequest, BatchAnalysisRequest, FinalAnalysis, JobInfo
 from utils.data_loader import DataLoader
 from utils.logger import Logger
-from agents.specialist_analysis import run_specialist_analysis
-from agents.review_loop import run_review_loop
-from agents.synthesizer import run_synthesis
+from utils.log_writer import AuditLogWriter
+from utils.metrics import metrics, get_prompt_cache_stats
+from utils.cache import create_cache
+from utils.job_queue import JobQueueFull, create_job_queue
+from utils.job_worker import JobWorkerPool
+from agents.pipeline import PipelineEventCallback, run_request
+from agents.batch import request_key, run_batch
+from agents.agent_factory import close_llm_cache
+from agents.retry import DeadlineExceeded
+from agents.hedging import latency_tracker
+from agents.router import get_router
+from config.llm_config import init_chat_clients, close_chat_clients
+from config.app_config import (
+    get_audit_log_config,
+    get_few_shot_config,
+    get_analysis_cache_config,
+    get_stream_config,
+    get_job_config,
+    get_batch_config
+)
 
 
 # Global instances
 data_loader = None
 logger = None
+analysis_cache = None
+job_queue = None
+job_pool = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize resources on startup."""
-    global data_loader, logger
+    global data_loader, logger, analysis_cache, job_queue, job_pool
     
     # Initialize data loader
-    data_loader = DataLoader(data_dir="data")
+    data_loader = DataLoader(data_dir="data", **get_few_shot_config())
     print("✅ DataLoader initialized")
     
-    # Initialize logger
-    logger = Logger(log_dir="logs")
+    # Initialize logger (audit logs written in background as JSON Lines)
+    audit_config = get_audit_log_config()
+    log_writer = AuditLogWriter(**audit_config)
+    log_writer.start()
+    logger = Logger(log_dir=audit_config["log_dir"], writer=log_writer)
     print("✅ Logger initialized")
     
+    # Initialize result cache (optional)
+    cache_config = get_analysis_cache_config()
+    analysis_cache = create_cache(**cache_config)
+    print(f"✅ Analysis cache: {cache_config['backend']}")
+    
+    # Initialize shared LLM clients (one pooled client per provider)
+    clients = init_chat_clients()
+    print(f"✅ LLM clients initialized: {', '.join(clients) or 'none configured'}")
+    
+    # Initialize job queue and background workers (/jobs)
+    job_config = get_job_config()
+    job_queue = create_job_queue(
+        job_config["backend"],
+        path=job_config["path"],
+        max_pending=job_config["max_pending"],
+        retention_seconds=job_config["retention_seconds"]
+    )
+    job_pool = JobWorkerPool(
+        job_queue,
+        _run_job,
+        num_workers=job_config["workers"],
+        poll_seconds=job_config["poll_seconds"]
+    )
+    requeued = await job_pool.start()
+    print(f"✅ Job workers: {job_config['workers']} ({job_config['backend']}, {requeued} jobs retomados)")
+    
     yield
     
-    # Cleanup (if needed)
+    # Cleanup
     print("🔄 Shutting down...")
+    await job_pool.stop()
+    job_queue.close()
+    print("✅ Job workers stopped")
+    
+    await close_chat_clients()
+    close_llm_cache()
+    print("✅ LLM clients closed")
+    
+    if analysis_cache is not None and hasattr(analysis_cache, "close"):
+        analysis_cache.close()
+    
+    # Flush pending audit logs to disk
+    await asyncio.to_thread(logger.close)
+    print("✅ Audit logs flushed")
 
 
 # Create FastAPI app with complete metadata
@@ -123,7 +188,12 @@ async def root():
         "endpoints": {
             "GET /": "Informações da API",
             "GET /health": "Verifica status do sistema",
+            "GET /metrics": "Métricas internas e cache de prompt",
             "POST /analyze": "Analisa respostas e retorna avaliação de risco",
+            "POST /analyze/stream": "Análise com progresso via Server-Sent Events",
+            "POST /analyze/batch": "Analisa várias requisições em lote",
+            "POST /jobs": "Enfileira uma análise e retorna o id do job",
+            "GET /jobs/{job_id}": "Consulta status e resultado de um job",
             "GET /docs": "Documentação Swagger UI",
             "GET /redoc": "Documentação ReDoc"
         },
@@ -156,6 +226,12 @@ async def health_check():
         "status": "healthy",
         "data_loader": "initialized" if data_loader else "not initialized",
         "logger": "initialized" if logger else "not initialized",
+        "analysis_cache": type(analysis_cache).__name__ if analysis_cache is not None else "disabled",
+        "jobs": await asyncio.to_thread(job_queue.stats) if job_queue is not None else "not initialized",
+        "providers": {
+            provider: "degraded" if health["degraded"] else "healthy"
+            for provider, health in get_router().snapshot().items()
+        },
         "framework": "Microsoft Agent Framework",
         "agents": {
             "specialists": 5,
@@ -165,6 +241,23 @@ async def health_check():
     }
 
 
+@app.get("/metrics", tags=["Sistema"])
+async def get_metrics():
+    """
+    ## 📈 Métricas
+    
+    Contadores internos do pipeline (incluindo hedges disparados/vencidos),
+    taxa de acerto do cache de prompt do provedor, latência p50/p95/p99
+    por agente e saúde de cada provedor usada no roteamento.
+    """
+    return {
+        "counters": metrics.snapshot(),
+        "prompt_cache": get_prompt_cache_stats(),
+        "latency": latency_tracker.snapshot(),
+        "providers": get_router().snapshot()
+    }
+
+
 @app.post("/analyze", response_model=Dict, tags=["Análise de Risco"])
 async def analyze_responses(request: AnalysisRequest):
     """
@@ -175,7 +268,9 @@ async def analyze_responses(request: AnalysisRequest):
     ### 📋 Processo de Análise (3 Fases):
     
     #### Fase 1: Análise Paralela (5 Especialistas)
-    Cada especialista analisa as respostas de forma independente:
+    Cada especialista analisa as respostas de forma independente.
+    No modo `pipelined` (`PIPELINE_MODE`), cada relatório segue direto para
+    a revisão assim que fica pronto, sem esperar os demais especialistas:
     - **Especialista Emocional:** Avalia estado emocional e dependência
     - **Especialista Comportamental:** Analisa padrões comportamentais
     - **Especialista em Agressão:** Identifica sinais de violência
@@ -183,9 +278,10 @@ async def analyze_responses(request: AnalysisRequest):
     - **Especialista Ambiental:** Analisa contexto social e suporte
     
     #### Fase 2: Revisão pelo Supervisor
-    - Supervisor revisa cada análise individual
+    - Supervisor revisa cada análise individual (revisões em paralelo)
     - Pode solicitar retrabalho se análise não for satisfatória
-    - Máximo de 1 tentativa de retrabalho por especialista
+    - Máximo de 1 tentativa de retrabalho por especialista (`MAX_REWORK_ATTEMPTS`)
+    - Paralelismo limitado por `REVIEW_MAX_CONCURRENCY`
     
     #### Fase 3: Síntese Final
     - Consolida todas as análises aprovadas
@@ -226,107 +322,189 @@ async def analyze_responses(request: AnalysisRequest):
     - Dados não são armazenados permanentemente
     - Logs são salvos apenas para auditoria
     """
-    start_time = time.time()
-    
     try:
-        # Start logging
-        request_id = logger.start_request_log(request.model_dump())
-        logger.log_event(
-            event_type="request_received",
-            data={"num_responses": len(request.responses)}
-        )
-        
-        # Phase 1: Parallel Specialist Analysis
-        print(f"\n{'='*60}")
-        print("🔬 FASE 1: ANÁLISE PARALELA DOS ESPECIALISTAS")
-        print(f"{'='*60}\n")
-        
-        specialist_reports = await run_specialist_analysis(
-            request.responses,
-            data_loader
-        )
-        
-        for idx, report in enumerate(specialist_reports, 1):
-            logger.log_event(
-                event_type="specialist_analysis",
-                agent_id=report.agent_id,
-                attempt=1,
-                data=report.model_dump()
-            )
-            print(f"✅ Agente {idx} ({report.domain}): Score {report.preliminary_score:.1f}")
-        
-        # Phase 2: Review Loop with Supervisor
-        print(f"\n{'='*60}")
-        print("👨‍💼 FASE 2: LOOP DE REVISÃO COM SUPERVISOR")
-        print(f"{'='*60}\n")
-        
-        approved_reports = []
-        
-        for idx, report in enumerate(specialist_reports):
-            print(f"Revisando Agente {report.agent_id}...")
-            
-            final_report, feedback_history = await run_review_loop(
-                report=report,
-                data_loader=data_loader,
-                user_response=request.responses[idx],
-                max_rework=1
-            )
-            
-            # Log feedback
-            for attempt_num, feedback in enumerate(feedback_history, 1):
-                logger.log_event(
-                    event_type="reviewer_feedback",
-                    agent_id=feedback.agent_id,
-                    attempt=attempt_num,
-                    data=feedback.model_dump()
-                )
-                
-                if feedback.status == "APROVADO":
-                    print(f"  ✅ APROVADO (Tentativa {attempt_num})")
-                else:
-                    print(f"  🔄 REVISAR (Tentativa {attempt_num})")
-            
-            approved_reports.append(final_report)
-        
-        # Phase 3: Final Synthesis
-        print(f"\n{'='*60}")
-        print("🎯 FASE 3: SÍNTESE FINAL")
-        print(f"{'='*60}\n")
-        
-        final_analysis = await run_synthesis(approved_reports)
-        
-        logger.log_event(
-            event_type="final_synthesis",
-            data=final_analysis.model_dump()
-        )
-        
-        print(f"📊 Score Final: {final_analysis.final_score:.1f}")
-        print(f"⚠️  Nível de Risco: {final_analysis.risk_level}")
-        print(f"🔍 Fatores Identificados: {len(final_analysis.consolidated_factors)}")
-        
-        # Finalize log
-        duration = time.time() - start_time
-        logger.finalize_log(
-            response=final_analysis.model_dump(),
-            duration=duration
-        )
-        
-        print(f"\n⏱️  Tempo total: {duration:.2f}s")
-        print(f"📝 Log salvo: {request_id}\n")
-        
-        return final_analysis.model_dump()
-        
+        final_analysis = await _execute_analysis(request)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        # Log error
-        if logger.current_log:
-            logger.log_event(
-                event_type="error",
-                data={"error": str(e), "type": type(e).__name__}
-            )
-            logger.finalize_log()
-        
-        print(f"\n❌ ERRO: {str(e)}\n")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return final_analysis.model_dump()
+
+
+@app.post("/analyze/stream", tags=["Análise de Risco"])
+async def analyze_responses_stream(request: AnalysisRequest):
+    """
+    ## 📡 Análise com Progresso em Tempo Real (SSE)
+    
+    Mesma análise de `POST /analyze`, mas a resposta é um fluxo
+    Server-Sent Events (`text/event-stream`) com cada resultado assim que
+    fica pronto, em vez de segurar a conexão até o fim das 3 fases.
+    
+    ### 📤 Eventos:
+    - `started`: `{"request_id": "..."}`
+    - `specialist_report`: relatório inicial de um especialista
+    - `review`: veredito do supervisor (`agent_id`, `attempt`, `feedback`)
+    - `agent_complete`: relatório final aprovado de um especialista
+    - `final_analysis`: análise consolidada (mesmo formato de `/analyze`)
+    - `error`: `{"status_code": 504|500, "detail": "..."}`
+    
+    Comentários `: keep-alive` são enviados a cada `SSE_HEARTBEAT_SECONDS`
+    sem eventos, permitindo timeouts de ociosidade curtos nos proxies.
+    Se o cliente desconectar, a análise é cancelada.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    heartbeat_seconds = get_stream_config()["heartbeat_seconds"]
+    
+    def on_event(event: str, data: dict):
+        queue.put_nowait(_format_sse(event, data))
+    
+    async def produce():
+        try:
+            await _execute_analysis(request, on_event=on_event)
+        except DeadlineExceeded as e:
+            on_event("error", {"status_code": 504, "detail": str(e)})
+        except Exception as e:
+            on_event("error", {"status_code": 500, "detail": str(e)})
+        finally:
+            queue.put_nowait(None)
+    
+    async def event_stream():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            # Client went away: stop spending tokens on this request
+            if not task.done():
+                task.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/analyze/batch", response_model=Dict, tags=["Análise de Risco"])
+async def analyze_batch(request: BatchAnalysisRequest):
+    """
+    ## 📦 Análise em Lote
+    
+    Analisa várias requisições (cada uma com 5 respostas) em uma única
+    chamada, com paralelismo limitado (`BATCH_MAX_CONCURRENCY`) e os mesmos
+    clientes LLM compartilhados. Submissões idênticas (após normalização)
+    são analisadas uma única vez.
+    
+    Uma requisição com falha não derruba o lote: o item correspondente
+    retorna `status: "error"`. Para arquivos grandes, use `batch_runner.py`.
+    
+    ### 📤 Saída:
+    ```json
+    {
+        "total": 3,
+        "unique": 2,
+        "results": [
+            {"status": "ok", "result": {...}},
+            {"status": "error", "error": "..."},
+            {"status": "ok", "result": {...}}
+        ]
+    }
+    ```
+    
+    ### Erros:
+    - `413`: mais requisições que `BATCH_MAX_ITEMS`
+    """
+    batch_config = get_batch_config()
+    if len(request.requests) > batch_config["max_items"]:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.requests)} requests (max {batch_config['max_items']})"
+        )
+    
+    async def analyze(responses):
+        return await run_request(responses, data_loader, logger, cache=analysis_cache)
+    
+    requests = [item.responses for item in request.requests]
+    results = await run_batch(requests, analyze, max_concurrency=batch_config["max_concurrency"])
+    
+    return {
+        "total": len(results),
+        "unique": len({request_key(responses) for responses in requests}),
+        "results": results
+    }
+
+
+@app.post("/jobs", response_model=JobInfo, status_code=202, tags=["Jobs"])
+async def submit_job(request: AnalysisRequest):
+    """
+    ## 📥 Enfileirar Análise
+    
+    Aceita o mesmo corpo de `POST /analyze` e retorna imediatamente o id do
+    job (`202 Accepted`). A análise é executada por um pool de workers em
+    segundo plano (`JOB_WORKERS`); consulte o resultado em `GET /jobs/{job_id}`.
+    
+    Com `JOB_QUEUE_BACKEND=sqlite` os jobs sobrevivem a reinícios: jobs
+    interrompidos voltam para a fila na próxima inicialização.
+    
+    ### Erros:
+    - `503`: fila cheia (`JOB_MAX_PENDING`); tente novamente mais tarde
+    """
+    try:
+        job_id = await job_pool.submit(request.model_dump())
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    return await job_queue.aget(job_id)
+
+
+@app.get("/jobs/{job_id}", response_model=JobInfo, tags=["Jobs"])
+async def get_job(job_id: str):
+    """
+    ## 🔎 Status do Job
+    
+    Retorna o status (`queued`, `running`, `succeeded`, `failed`) e, quando
+    concluído, o resultado no mesmo formato de `POST /analyze`.
+    
+    ### Erros:
+    - `404`: job inexistente ou expirado (`JOB_RETENTION_SECONDS`)
+    """
+    job = await job_queue.aget(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+async def _run_job(payload: Dict) -> Dict:
+    """Job handler: run the analysis for a queued request."""
+    final_analysis = await _execute_analysis(AnalysisRequest(**payload))
+    return final_analysis.model_dump()
+
+
+def _format_sse(event: str, data: dict) -> str:
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _execute_analysis(
+    request: AnalysisRequest,
+    on_event: Optional[PipelineEventCallback] = None
+) -> FinalAnalysis:
+    """Run one analysis request with the app's data loader, logger and cache."""
+    return await run_request(
+        request.responses,
+        data_loader,
+        logger,
+        cache=analysis_cache,
+        on_event=on_event
+    )
 
 
 if __name__ == "__main__":
@@ -1,20 +1,26 @@
 """Initialize models package."""
 from .schemas import (
     AnalysisRequest,
+    BatchAnalysisRequest,
     SpecialistReport,
     ReviewFeedback,
     FinalAnalysis,
+    SynthesisResult,
     RiskFactor,
+    JobInfo,
     LogEvent,
     RequestLog
 )
 
 __all__ = [
     'AnalysisRequest',
+    'BatchAnalysisRequest',
     'SpecialistReport',
     'ReviewFeedback',
     'FinalAnalysis',
+    'SynthesisResult',
     'RiskFactor',
+    'JobInfo',
     'LogEvent',
     'RequestLog'
 ]
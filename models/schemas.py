@@ -59,6 +59,15 @@ class RiskFactor(BaseModel):
     )
 
 
+class BatchAnalysisRequest(BaseModel):
+    """Request model for the batch analysis endpoint."""
+    requests: List[AnalysisRequest] = Field(
+        ...,
+        min_length=1,
+        description="Analysis requests (identical submissions are analyzed once)"
+    )
+
+
 class SpecialistReport(BaseModel):
     """Report from a specialist agent."""
     agent_id: str = Field(..., description="Specialist agent identifier")
@@ -76,16 +85,31 @@ class ReviewFeedback(BaseModel):
     agent_id: str = Field(..., description="Agent being reviewed")
 
 
-class FinalAnalysis(BaseModel):
-    """Final consolidated analysis."""
+class SynthesisResult(BaseModel):
+    """Synthesizer output (the final analysis without the specialist reports)."""
     final_score: float = Field(..., ge=0, le=100, description="Final consolidated risk score")
     risk_level: Literal["Baixo", "Médio", "Alto"] = Field(..., description="Overall risk classification")
     consolidated_factors: List[RiskFactor] = Field(..., description="All identified risk factors")
     synthesis: str = Field(..., description="Holistic analysis synthesizing all reports")
     recommendations: List[str] = Field(default_factory=list, description="Recommended actions")
+
+
+class FinalAnalysis(SynthesisResult):
+    """Final consolidated analysis."""
     specialist_reports: List[SpecialistReport] = Field(..., description="All approved specialist reports")
 
 
+class JobInfo(BaseModel):
+    """Status (and result, once finished) of an asynchronous analysis job."""
+    job_id: str = Field(..., description="Job identifier")
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(..., description="Job status")
+    result: Optional[FinalAnalysis] = Field(None, description="Final analysis when succeeded")
+    error: Optional[str] = Field(None, description="Error message when failed")
+    created_at: float = Field(..., description="Submission time (Unix timestamp)")
+    started_at: Optional[float] = Field(None, description="Start time (Unix timestamp)")
+    finished_at: Optional[float] = Field(None, description="Completion time (Unix timestamp)")
+
+
 class LogEvent(BaseModel):
     """Individual log event."""
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -95,6 +119,9 @@ class LogEvent(BaseModel):
         "reviewer_feedback", 
         "rework_attempt",
         "final_synthesis",
+        "cache_lookup",
+        "cache_skip",
+        "llm_call",
         "error"
     ]
     agent_id: Optional[str] = None
@@ -110,3 +137,4 @@ class RequestLog(BaseModel):
     events: List[LogEvent] = Field(default_factory=list)
     response: Optional[Dict] = None
     duration_seconds: Optional[float] = None
+    cache_hit: Optional[bool] = Field(None, description="Whether the analysis was served from the result cache")
@@ -4,7 +4,8 @@ from .system_prompts import (
     get_supervisor_prompt,
     get_synthesizer_prompt,
     get_domain_description,
-    DOMAIN_DESCRIPTIONS
+    DOMAIN_DESCRIPTIONS,
+    PROMPT_VERSION
 )
 
 __all__ = [
@@ -12,5 +13,6 @@ __all__ = [
     'get_supervisor_prompt',
     'get_synthesizer_prompt',
     'get_domain_description',
-    'DOMAIN_DESCRIPTIONS'
+    'DOMAIN_DESCRIPTIONS',
+    'PROMPT_VERSION'
 ]
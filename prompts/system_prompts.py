@@ -1,34 +1,25 @@
 """
 System prompts for all agents.
 """
+from functools import lru_cache
 
+# Bump whenever prompt wording or layout changes (invalidates cached analyses)
+PROMPT_VERSION = "3"
 
-def get_specialist_prompt(agent_id: int, domain: str, examples: str) -> str:
-    """
-    Get specialized prompt for a specialist agent.
-    
-    Args:
-        agent_id: Agent identifier (1-5)
-        domain: Domain of expertise
-        examples: Few-shot examples from dataset
-        
-    Returns:
-        System prompt for the specialist
-    """
-    
-    base_prompt = f"""Você é um Agente Especialista em Análise de Risco de Violência Doméstica.
 
-SEU DOMÍNIO DE EXPERTISE: {domain}
+# Layout: instructions shared by every specialist first, then the
+# agent-specific domain/output format, then the examples. Keeping the
+# variable parts at the end maximizes the prefix reused by provider-side
+# prompt caching (OpenAI/Azure/Groq). The examples are appended after it.
+_SPECIALIST_TEMPLATE = """Você é um Agente Especialista em Análise de Risco de Violência Doméstica.
 
 TAREFA:
-Analise o relato da usuária abaixo com foco no seu domínio de especialização.
-Use os exemplos de casos anteriores como referência para sua análise.
-
-{examples}
+Analise o relato da usuária com foco no seu domínio de especialização (indicado abaixo).
+Use os exemplos de casos anteriores (ao final destas instruções) como referência para sua análise.
 
 PROCESSO DE ANÁLISE (Chain of Thought):
 1. Leia atentamente o RELATO ATUAL da usuária
-2. Compare com os EXEMPLOS DE CASOS ANTERIORES acima
+2. Compare com os EXEMPLOS DE CASOS ANTERIORES
 3. Identifique fatores de risco específicos do seu domínio
 4. Classifique a severidade de cada fator (Baixo/Médio/Alto)
 5. Calcule um score preliminar de risco (0-100)
@@ -40,6 +31,9 @@ IMPORTANTE:
 - Considere tanto fatores explícitos quanto implícitos
 - Use linguagem técnica mas compreensível
 - Seja sensível ao contexto de violência doméstica
+- RETORNE APENAS O JSON, SEM TEXTO ADICIONAL
+
+SEU DOMÍNIO DE EXPERTISE: {domain}
 
 FORMATO DE SAÍDA (JSON OBRIGATÓRIO):
 {{
@@ -57,9 +51,31 @@ FORMATO DE SAÍDA (JSON OBRIGATÓRIO):
   "justification": "Justificativa completa para o score..."
 }}
 
-RETORNE APENAS O JSON, SEM TEXTO ADICIONAL."""
+"""
 
-    return base_prompt
+
+@lru_cache(maxsize=None)
+def _compile_specialist_prompt(agent_id: int, domain: str) -> str:
+    """Render the specialist instructions (everything before the examples) once per agent."""
+    return _SPECIALIST_TEMPLATE.format(agent_id=agent_id, domain=domain)
+
+
+def get_specialist_prompt(agent_id: int, domain: str, examples: str) -> str:
+    """
+    Get specialized prompt for a specialist agent.
+    
+    The instructions are compiled once per agent; only the examples are
+    appended per call.
+    
+    Args:
+        agent_id: Agent identifier (1-5)
+        domain: Domain of expertise
+        examples: Few-shot examples from dataset
+        
+    Returns:
+        System prompt for the specialist
+    """
+    return _compile_specialist_prompt(agent_id, domain) + examples
 
 
 def get_supervisor_prompt() -> str:
@@ -166,3 +182,8 @@ DOMAIN_DESCRIPTIONS = {
 def get_domain_description(agent_id: int) -> str:
     """Get domain description for an agent."""
     return DOMAIN_DESCRIPTIONS.get(agent_id, f"Domínio {agent_id}")
+
+
+# Compile every specialist's instructions at startup
+for _agent_id, _domain in DOMAIN_DESCRIPTIONS.items():
+    _compile_specialist_prompt(_agent_id, _domain)
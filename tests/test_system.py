@@ -13,6 +13,44 @@ from utils.data_loader import DataLoader
 from agents.specialist_analysis import run_specialist_analysis_sync
 
 
+class FakeChatClient:
+    """Minimal stand-in for AsyncOpenAI (chat.completions.create only)."""
+    
+    def __init__(self, replies, delay=0.0):
+        from types import SimpleNamespace
+        self.replies = list(replies)
+        self.delay = delay
+        self.calls = 0
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+    
+    async def _create(self, **kwargs):
+        from types import SimpleNamespace
+        self.calls += 1
+        self.requests.append(kwargs)
+        await asyncio.sleep(self.delay)
+        reply = self.replies[min(self.calls, len(self.replies)) - 1]
+        if isinstance(reply, Exception):
+            raise reply
+        message = SimpleNamespace(content=reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def make_fake_agent(name, client, role="supervisor"):
+    """Build an AgentWrapper bound to a fake OpenAI-compatible client."""
+    from agents.agent_factory import AgentWrapper
+    agent = AgentWrapper.__new__(AgentWrapper)
+    agent.name = name
+    agent.role = role
+    agent.instructions = "Instruções de teste"
+    agent.client = client
+    agent.model = "fake-model"
+    agent.config = {"temperature": 0.0, "max_tokens": 100, "max_output_tokens": 16384}
+    agent.provider = "openai"
+    agent.response_model = None
+    return agent
+
+
 def test_data_loader():
     """Test data loader functionality."""
     print("\n" + "="*60)
@@ -28,6 +66,10 @@ def test_data_loader():
         print(f"✅ Retrieved examples for Agent 1")
         print(f"   Length: {len(examples)} characters")
         
+        # Stable mode must yield identical prompts (provider prompt caching)
+        assert examples == loader.get_few_shot_examples(1, num_examples=3)
+        print("✅ Stable Few-Shot selection is deterministic")
+        
         # Test stats
         stats = loader.get_dataset_stats(1)
         print(f"✅ Dataset 1 stats: {stats['total_examples']} examples")
@@ -106,6 +148,1488 @@ def test_api_request_validation():
         return False
 
 
+def test_review_stage_order():
+    """Test concurrent review stage keeps order and respects the cap."""
+    print("\n" + "="*60)
+    print("TEST 4: Concurrent Review Stage")
+    print("="*60)
+    
+    from agents import review_loop
+    from models.schemas import SpecialistReport, ReviewFeedback
+    
+    original_loop = review_loop.run_review_loop
+    state = {"running": 0, "peak": 0}
+    
+    async def fake_review_loop(report, data_loader, user_response, max_rework=1, on_feedback=None):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        # Later agents finish first to prove ordering is preserved
+        await asyncio.sleep(0.01 * (6 - int(report.agent_id)))
+        state["running"] -= 1
+        feedback = ReviewFeedback(status="APROVADO", agent_id=report.agent_id)
+        return report, [feedback]
+    
+    try:
+        review_loop.run_review_loop = fake_review_loop
+        reports = [
+            SpecialistReport(
+                agent_id=str(i),
+                domain=f"Domínio {i}",
+                analysis="Análise",
+                preliminary_score=10.0 * i,
+                justification="Justificativa"
+            )
+            for i in range(1, 6)
+        ]
+        results = asyncio.run(review_loop.run_review_stage(
+            reports, None, [f"Relato {i}" for i in range(1, 6)], max_concurrency=2
+        ))
+        
+        order = [final_report.agent_id for final_report, _ in results]
+        assert order == ["1", "2", "3", "4", "5"], f"Unexpected order: {order}"
+        assert state["peak"] <= 2, f"Concurrency cap exceeded: {state['peak']}"
+        print(f"✅ Order preserved, peak concurrency {state['peak']}")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Review stage test failed: {e}")
+        return False
+    finally:
+        review_loop.run_review_loop = original_loop
+
+
+def test_pipelined_analysis():
+    """Test pipelined mode reviews each report without waiting for the rest."""
+    print("\n" + "="*60)
+    print("TEST 5: Pipelined Analysis")
+    print("="*60)
+    
+    from agents import pipeline
+    from models.schemas import SpecialistReport, ReviewFeedback
+    
+    original_analyze = pipeline.analyze_single
+    original_loop = pipeline.run_review_loop
+    events = []
+    
+    async def fake_analyze(agent_id, response, data_loader):
+        # Agent 5 is the slow specialist
+        await asyncio.sleep(0.05 if agent_id == 5 else 0.0)
+        events.append(("analysis", agent_id))
+        return SpecialistReport(
+            agent_id=str(agent_id),
+            domain=f"Domínio {agent_id}",
+            analysis="Análise",
+            preliminary_score=50.0,
+            justification="Justificativa"
+        )
+    
+    async def fake_review_loop(report, data_loader, user_response, max_rework=1, on_feedback=None):
+        events.append(("review", int(report.agent_id)))
+        return report, [ReviewFeedback(status="APROVADO", agent_id=report.agent_id)]
+    
+    try:
+        pipeline.analyze_single = fake_analyze
+        pipeline.run_review_loop = fake_review_loop
+        outcomes = asyncio.run(pipeline.run_pipelined_analysis(
+            [f"Relato {i}" for i in range(1, 6)], None
+        ))
+        
+        order = [final_report.agent_id for _, final_report, _ in outcomes]
+        assert order == ["1", "2", "3", "4", "5"], f"Unexpected order: {order}"
+        assert events.index(("review", 1)) < events.index(("analysis", 5)), \
+            "Review waited for the slowest specialist"
+        print("✅ Reviews start before the slowest specialist finishes")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Pipelined analysis test failed: {e}")
+        return False
+    finally:
+        pipeline.analyze_single = original_analyze
+        pipeline.run_review_loop = original_loop
+
+
+def test_concurrent_request_logs():
+    """Test that concurrent requests keep separate audit logs."""
+    print("\n" + "="*60)
+    print("TEST 6: Concurrent Request Logs")
+    print("="*60)
+    
+    import tempfile
+    from utils.logger import Logger
+    
+    async def fake_request(logger, name):
+        logger.start_request_log({"name": name})
+        for step in range(3):
+            logger.log_event(event_type="specialist_analysis", data={"name": name, "step": step})
+            await asyncio.sleep(0)
+        events = list(logger.current_log.events)
+        logger.finalize_log()
+        return events
+    
+    async def run_both(logger):
+        return await asyncio.gather(fake_request(logger, "a"), fake_request(logger, "b"))
+    
+    try:
+        with tempfile.TemporaryDirectory() as log_dir:
+            logger = Logger(log_dir=log_dir)
+            events_a, events_b = asyncio.run(run_both(logger))
+        
+        assert [e.data["name"] for e in events_a] == ["a"] * 3, "Request A log mixed"
+        assert [e.data["name"] for e in events_b] == ["b"] * 3, "Request B log mixed"
+        print("✅ Each request kept its own events")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Concurrent logging test failed: {e}")
+        return False
+
+
+def test_audit_log_writer():
+    """Test background JSONL audit writer with size-based rotation."""
+    print("\n" + "="*60)
+    print("TEST 7: Audit Log Writer")
+    print("="*60)
+    
+    import json
+    import tempfile
+    from pathlib import Path
+    from utils.logger import Logger
+    from utils.log_writer import AuditLogWriter
+    
+    try:
+        with tempfile.TemporaryDirectory() as log_dir:
+            writer = AuditLogWriter(log_dir=log_dir, max_bytes=1, flush_interval=0.05)
+            logger = Logger(log_dir=log_dir, writer=writer)
+            
+            for idx in range(3):
+                logger.start_request_log({"idx": idx})
+                logger.log_event(event_type="request_received", data={"idx": idx})
+                logger.finalize_log(response={"ok": True}, duration=0.1)
+                logger.flush()
+            
+            logger.close()
+            
+            files = sorted(Path(log_dir).glob("audit_*.jsonl"))
+            records = [
+                json.loads(line)
+                for path in files
+                for line in path.read_text(encoding="utf-8").splitlines()
+            ]
+        
+        assert len(records) == 3, f"Expected 3 records, got {len(records)}"
+        assert len(files) >= 2, "Expected size-based rotation"
+        print(f"✅ {len(records)} logs written across {len(files)} files")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Audit log writer test failed: {e}")
+        return False
+
+
+def test_result_cache():
+    """Test cache backends (LRU, TTL, SQLite persistence) and key normalization."""
+    print("\n" + "="*60)
+    print("TEST 8: Result Cache")
+    print("="*60)
+    
+    import tempfile
+    from pathlib import Path
+    from utils.cache import MemoryCache, SQLiteCache, analysis_cache_key
+    
+    try:
+        memory = MemoryCache(max_entries=2, ttl_seconds=60)
+        memory.set("a", "1")
+        memory.set("b", "2")
+        memory.get("a")
+        memory.set("c", "3")
+        assert memory.get("b") is None, "LRU entry not evicted"
+        assert memory.get("a") == "1" and memory.get("c") == "3"
+        memory.set("d", "4", ttl_seconds=-1)
+        assert memory.get("d") is None, "Expired entry returned"
+        print("✅ MemoryCache LRU and TTL")
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = Path(cache_dir) / "cache.sqlite3"
+            disk = SQLiteCache(str(path), max_entries=2)
+            disk.set("a", "1")
+            disk.set("b", "2")
+            disk.set("c", "3")
+            disk.close()
+            disk = SQLiteCache(str(path), max_entries=2)
+            assert disk.get("c") == "3" and len(disk) == 2, "SQLite cache not persisted/evicted"
+            disk.close()
+        print("✅ SQLiteCache persistence and eviction")
+        
+        key_a = analysis_cache_key(["Ele  GRITA comigo "] + ["x"] * 4, "groq:m", "2")
+        key_b = analysis_cache_key(["ele grita comigo"] + ["x"] * 4, "groq:m", "2")
+        key_c = analysis_cache_key(["ele grita comigo"] + ["x"] * 4, "groq:m", "3")
+        assert key_a == key_b and key_a != key_c, "Cache key normalization failed"
+        print("✅ Cache key normalization")
+        
+        responses = ["ele grita comigo"] + ["x"] * 4
+        key_similar = analysis_cache_key(responses, "groq:m", "2", few_shot_mode="similar")
+        key_seed = analysis_cache_key(responses, "groq:m", "2", seed=7)
+        assert len({key_b, key_similar, key_seed}) == 3, "Few-Shot mode/seed not in the cache key"
+        print("✅ Few-Shot mode and seed in the cache key")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Result cache test failed: {e}")
+        return False
+
+
+def test_llm_call_memoization():
+    """Test AgentWrapper.run memoization and bypass flag."""
+    print("\n" + "="*60)
+    print("TEST 9: LLM Call Memoization")
+    print("="*60)
+    
+    from agents import agent_factory
+    from utils.cache import MemoryCache
+    
+    original_cache = agent_factory.get_llm_cache
+    
+    try:
+        cache = MemoryCache(max_entries=10)
+        agent_factory.get_llm_cache = lambda: cache
+        client = FakeChatClient(['{"status": "APROVADO", "agent_id": "1"}'])
+        agent = make_fake_agent("supervisor", client)
+        
+        first = asyncio.run(agent.run("Revise o relatório"))
+        second = asyncio.run(agent.run("Revise o relatório"))
+        assert first == second and client.calls == 1, "Repeated call not memoized"
+        
+        asyncio.run(agent.run("Revise o relatório", use_cache=False))
+        assert client.calls == 2, "Bypass flag ignored"
+        print("✅ Repeated calls memoized, bypass honoured")
+        
+        # Truncated JSON and schema mismatches are returned but never memoized
+        from models.schemas import ReviewFeedback
+        client = FakeChatClient([
+            '{"status": "APROVADO", "agent_id": ',
+            '{"status": "OK"}',
+            '{"status": "APROVADO", "agent_id": "1"}'
+        ])
+        agent = make_fake_agent("supervisor", client)
+        agent.response_model = ReviewFeedback
+        for _ in range(4):
+            asyncio.run(agent.run("Revise outro relatório"))
+        assert client.calls == 3, f"Unparseable response memoized ({client.calls} calls)"
+        print("✅ Truncated and invalid responses not memoized")
+        
+        return True
+    except Exception as e:
+        print(f"❌ LLM memoization test failed: {e}")
+        return False
+    finally:
+        agent_factory.get_llm_cache = original_cache
+
+
+def test_llm_scheduler():
+    """Test in-flight cap and priority ordering of the LLM scheduler."""
+    print("\n" + "="*60)
+    print("TEST 10: LLM Scheduler")
+    print("="*60)
+    
+    from agents.scheduler import LLMScheduler, ROLE_PRIORITIES
+    
+    async def scenario():
+        scheduler = LLMScheduler(max_in_flight=1)
+        order = []
+        
+        async def call(label, role):
+            async with scheduler.slot("groq", 100, ROLE_PRIORITIES[role]):
+                order.append(label)
+                await asyncio.sleep(0.01)
+        
+        # First call holds the only slot; the rest queue up
+        first = asyncio.create_task(call("specialist_a", "specialist"))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.create_task(call("specialist_b", "specialist")),
+            asyncio.create_task(call("supervisor", "supervisor")),
+            asyncio.create_task(call("synthesizer", "synthesizer")),
+        ]
+        await asyncio.gather(first, *queued)
+        return order
+    
+    try:
+        order = asyncio.run(scenario())
+        expected = ["specialist_a", "synthesizer", "supervisor", "specialist_b"]
+        assert order == expected, f"Unexpected order: {order}"
+        print("✅ Single slot shared, later-stage roles served first")
+        
+        async def cross_provider(rate_limits):
+            scheduler = LLMScheduler(max_in_flight=1, rate_limits=rate_limits)
+            order = []
+            
+            async def call(label, provider, role):
+                async with scheduler.slot(provider, 100, ROLE_PRIORITIES[role]):
+                    order.append(label)
+                    await asyncio.sleep(0.01)
+            
+            first = asyncio.create_task(call("specialist_a", "groq", "specialist"))
+            await asyncio.sleep(0)
+            queued = [
+                asyncio.create_task(call("specialist_b", "openai", "specialist")),
+                asyncio.create_task(call("supervisor", "openai", "supervisor")),
+                asyncio.create_task(call("synthesizer", "groq", "synthesizer")),
+            ]
+            await asyncio.sleep(0.1)
+            for task in queued:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(first, *queued, return_exceptions=True)
+            return order
+        
+        order = asyncio.run(cross_provider({}))
+        expected = ["specialist_a", "synthesizer", "supervisor", "specialist_b"]
+        assert order == expected, f"Unexpected cross-provider order: {order}"
+        print("✅ One priority queue across providers")
+        
+        # groq allows 1 request/min, already spent by the first call
+        order = asyncio.run(cross_provider({"groq": (1, 0)}))
+        expected = ["specialist_a", "supervisor", "specialist_b"]
+        assert order == expected, f"Unexpected rate-limited order: {order}"
+        print("✅ Provider with an exhausted budget skipped")
+        
+        return True
+    except Exception as e:
+        print(f"❌ LLM scheduler test failed: {e}")
+        return False
+
+
+def test_llm_retry_backoff():
+    """Test retry on 429 with attempts recorded in the request log."""
+    print("\n" + "="*60)
+    print("TEST 11: LLM Retry and Backoff")
+    print("="*60)
+    
+    import tempfile
+    from utils.logger import Logger
+    
+    class RateLimited(Exception):
+        status_code = 429
+    
+    class BadRequest(Exception):
+        status_code = 400
+    
+    original_backoff = os.environ.get("LLM_BACKOFF_BASE")
+    
+    async def scenario(agent, logger):
+        logger.start_request_log({"test": "retry"})
+        text = await agent.run("Revise o relatório", use_cache=False)
+        events = list(logger.current_log.events)
+        logger.finalize_log()
+        return text, events
+    
+    try:
+        os.environ["LLM_BACKOFF_BASE"] = "0.001"
+        with tempfile.TemporaryDirectory() as log_dir:
+            logger = Logger(log_dir=log_dir)
+            
+            client = FakeChatClient([RateLimited("429"), '{"status": "APROVADO", "agent_id": "1"}'])
+            text, events = asyncio.run(scenario(make_fake_agent("supervisor", client), logger))
+            attempts = [(e.attempt, e.data["status"]) for e in events if e.event_type == "llm_call"]
+            assert "APROVADO" in text and client.calls == 2, "429 not retried"
+            assert attempts == [(1, "error"), (2, "ok")], f"Unexpected attempts: {attempts}"
+            print("✅ 429 retried and attempts logged")
+            
+            client = FakeChatClient([BadRequest("400"), "{}"])
+            text, _ = asyncio.run(scenario(make_fake_agent("supervisor", client), logger))
+            assert client.calls == 1 and '"status": "failed"' in text, "400 should not be retried"
+            print("✅ Non-retryable error not retried")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Retry test failed: {e}")
+        return False
+    finally:
+        if original_backoff is None:
+            os.environ.pop("LLM_BACKOFF_BASE", None)
+        else:
+            os.environ["LLM_BACKOFF_BASE"] = original_backoff
+
+
+def test_hedged_requests():
+    """Test that a straggling call is hedged and the loser cancelled."""
+    print("\n" + "="*60)
+    print("TEST 12: Hedged Requests")
+    print("="*60)
+    
+    from agents.hedging import run_hedged, is_valid_response, LatencyTracker
+    from utils.metrics import metrics
+    
+    state = {"primary_cancelled": False}
+    
+    async def slow_primary():
+        try:
+            await asyncio.sleep(1.0)
+            return '{"source": "primary"}'
+        except asyncio.CancelledError:
+            state["primary_cancelled"] = True
+            raise
+    
+    async def fast_secondary():
+        return '{"source": "hedge"}'
+    
+    try:
+        tracker = LatencyTracker()
+        for value in range(1, 101):
+            tracker.record("agent", value / 100)
+        assert tracker.percentile("agent", 95) == 0.95, "Wrong percentile"
+        assert tracker.percentile("other", 95) is None
+        
+        won_before = metrics.get("hedges_won", "test_agent")
+        result = asyncio.run(run_hedged(
+            slow_primary, fast_secondary, delay=0.01, metric_key="test_agent"
+        ))
+        assert "hedge" in result, f"Unexpected winner: {result}"
+        assert state["primary_cancelled"], "Loser not cancelled"
+        assert metrics.get("hedges_won", "test_agent") == won_before + 1
+        print("✅ Hedge fired, won and loser cancelled")
+        
+        # Same JSON extraction as the parser: braces in trailing prose don't break it
+        assert is_valid_response('```json\n{"status": "ok"}\n```\nObs.: {fim}', json_mode=True)
+        assert not is_valid_response('{"status": "failed"}', json_mode=True)
+        assert not is_valid_response('{"status": "ok"', json_mode=True)
+        assert not is_valid_response("sem JSON", json_mode=True)
+        print("✅ Response validity uses the shared JSON extraction")
+        
+        # Hedge provider without credentials: the primary call must still succeed
+        from agents import agent_factory
+        from agents.hedging import latency_tracker
+        from agents.router import get_router
+        hedge_env = {
+            "LLM_HEDGE_ENABLED": "true",
+            "LLM_HEDGE_PROVIDER": "azure_openai",
+            "LLM_HEDGE_MIN_SAMPLES": "1",
+            "AZURE_OPENAI_ENDPOINT": None
+        }
+        saved_env = {name: os.environ.get(name) for name in hedge_env}
+        try:
+            for name, value in hedge_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            latency_tracker.record("hedge_check", 0.5)
+            client = FakeChatClient(['{"status": "APROVADO", "agent_id": "1"}'])
+            agent = make_fake_agent("hedge_check", client)
+            failures_before = metrics.get("provider_failovers", "openai")
+            text = asyncio.run(agent.run("Revise o relatório", use_cache=False))
+            assert "APROVADO" in text and client.calls == 1, f"Primary call failed: {text}"
+            assert metrics.get("provider_failovers", "openai") == failures_before
+            assert not get_router().is_degraded("openai")
+            print("✅ Unconfigured hedge provider disables hedging, primary unaffected")
+        finally:
+            for name, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+        
+        return True
+    except Exception as e:
+        print(f"❌ Hedging test failed: {e}")
+        return False
+
+def test_provider_failover():
+    """Test that a failing provider is degraded and calls fail over."""
+    print("\n" + "="*60)
+    print("TEST 13: Provider Failover")
+    print("="*60)
+    
+    from agents import agent_factory, router
+    from agents.router import ProviderRouter
+    
+    class ServerError(Exception):
+        status_code = 503
+    
+    original_router = router._router
+    original_get_client = agent_factory.get_chat_client
+    original_retries = os.environ.get("LLM_MAX_RETRIES")
+    
+    try:
+        os.environ["LLM_MAX_RETRIES"] = "0"
+        test_router = ProviderRouter(
+            providers=["groq", "openai"],
+            routes={"supervisor": ("groq", "fake-model")},
+            max_consecutive_failures=2,
+            cooldown_seconds=60
+        )
+        router._router = test_router
+        
+        failing = FakeChatClient([ServerError("503")])
+        healthy = FakeChatClient(['{"status": "APROVADO", "agent_id": "1"}'])
+        clients = {"groq": failing, "openai": healthy}
+        agent_factory.get_chat_client = lambda provider=None: clients[provider]
+        
+        agent = make_fake_agent("supervisor", failing)
+        agent.provider = "groq"
+        
+        for _ in range(2):
+            text = asyncio.run(agent.run("Revise o relatório", use_cache=False))
+            assert "APROVADO" in text, f"Failover did not answer: {text}"
+        assert failing.calls == 2 and healthy.calls == 2
+        assert test_router.is_degraded("groq"), "Provider not degraded"
+        print("✅ Failed calls answered by the fallback provider")
+        
+        asyncio.run(agent.run("Revise o relatório", use_cache=False))
+        assert failing.calls == 2 and healthy.calls == 3, "Degraded provider still tried first"
+        print("✅ Degraded provider skipped during cooldown")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Provider failover test failed: {e}")
+        return False
+    finally:
+        router._router = original_router
+        agent_factory.get_chat_client = original_get_client
+        if original_retries is None:
+            os.environ.pop("LLM_MAX_RETRIES", None)
+        else:
+            os.environ["LLM_MAX_RETRIES"] = original_retries
+
+def test_role_model_config():
+    """Test role-scoped model, temperature and max_tokens."""
+    print("\n" + "="*60)
+    print("TEST 14: Per-Role Model Config")
+    print("="*60)
+    
+    from config.llm_config import get_model_config, get_role_routes, get_model_signature
+    
+    overrides = {
+        "GROQ_API_KEY": "test-key",
+        "LLM_SUPERVISOR_MODEL": "llama-3.1-8b-instant",
+        "LLM_SUPERVISOR_MAX_TOKENS": "800",
+        "LLM_SPECIALIST_TEMPERATURE": "0.4",
+        "LLM_TEMPERATURE": "0.2",
+        "LLM_MAX_TOKENS": "4000",
+        "LLM_MAX_OUTPUT_TOKENS": "16384",
+    }
+    originals = {name: os.environ.get(name) for name in overrides}
+    
+    try:
+        os.environ.update(overrides)
+        signature_before = get_model_signature()
+        
+        supervisor = get_model_config("supervisor")
+        assert supervisor == {"temperature": 0.2, "max_tokens": 800, "max_output_tokens": 16384}, f"Unexpected: {supervisor}"
+        assert get_model_config("rework")["temperature"] == 0.4, "Rework should inherit specialist"
+        assert get_model_config()["max_tokens"] == 4000
+        print("✅ Role overrides with global fallback")
+        
+        routes = get_role_routes()
+        assert routes["supervisor"][1] == "llama-3.1-8b-instant", f"Unexpected route: {routes}"
+        assert routes["specialist"][1] != "llama-3.1-8b-instant"
+        
+        os.environ["LLM_SUPERVISOR_MAX_TOKENS"] = "900"
+        assert get_model_signature() != signature_before, "Signature ignores role config"
+        print("✅ Role model routed and included in cache signature")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Per-role model config test failed: {e}")
+        return False
+    finally:
+        for name, value in originals.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def test_streaming_early_stop():
+    """Test incremental JSON scanning and early stream close."""
+    print("\n" + "="*60)
+    print("TEST 15: Streaming with Early JSON Parsing")
+    print("="*60)
+    
+    from types import SimpleNamespace
+    from utils.json_stream import JSONObjectScanner
+    
+    class FakeStream:
+        def __init__(self, pieces, usage=None):
+            self.pieces = pieces
+            self.usage = usage
+            self.sent = 0
+            self.closed = False
+        
+        def __aiter__(self):
+            return self
+        
+        async def __anext__(self):
+            if self.sent == len(self.pieces):
+                if self.usage is None:
+                    raise StopAsyncIteration
+                # include_usage: final chunk without choices
+                usage, self.usage = self.usage, None
+                return SimpleNamespace(choices=[], usage=usage)
+            self.sent += 1
+            delta = SimpleNamespace(content=self.pieces[self.sent - 1])
+            return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        
+        async def close(self):
+            self.closed = True
+    
+    pieces = ['```json\n{"agent_id": "1", ', '"analysis": "uso de {chaves} e \\"aspas\\""', '}', '\n```', ' texto extra']
+    stream = FakeStream(pieces)
+    
+    async def create(**kwargs):
+        assert kwargs.get("stream") is True
+        assert kwargs.get("stream_options") == {"include_usage": True}
+        return stream
+    
+    try:
+        scanner = JSONObjectScanner()
+        results = [scanner.feed(piece) for piece in pieces[:3]]
+        assert results[:2] == [None, None] and results[2].endswith('""}'), f"Unexpected: {results}"
+        print("✅ Scanner ignores braces and quotes inside strings")
+        
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        agent = make_fake_agent("specialist_1", client, role="specialist")
+        progress = []
+        text = asyncio.run(agent.run("Analise", use_cache=False, stream=True, on_progress=progress.append))
+        
+        assert text.startswith("{") and text.endswith("}"), f"Unexpected text: {text}"
+        assert stream.sent == 4 and stream.closed, "Stream not closed when text followed the JSON object"
+        assert progress == pieces[:3], "Progress not reported chunk by chunk"
+        print("✅ Stream closed as soon as text followed the completed JSON object")
+        
+        from agents.scheduler import SchedulerTicket
+        from utils.metrics import metrics
+        usage = SimpleNamespace(prompt_tokens=120, completion_tokens=30, total_tokens=150, prompt_tokens_details=None)
+        stream = FakeStream(pieces[:3], usage=usage)
+        ticket = SchedulerTicket("openai", estimated_tokens=100)
+        prompt_tokens = metrics.get("prompt_tokens", "specialist_1")
+        text = asyncio.run(agent._stream_completion({"model": "fake-model"}, True, ticket))
+        assert text.endswith("}") and ticket.actual_tokens == 150, f"Usage not reconciled: {ticket.actual_tokens}"
+        assert metrics.get("prompt_tokens", "specialist_1") == prompt_tokens + 120
+        print("✅ Usage chunk read after the JSON object (tokens reconciled)")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Streaming test failed: {e}")
+        return False
+
+def test_analyze_stream_endpoint():
+    """Test that /analyze/stream pushes pipeline events as SSE."""
+    print("\n" + "="*60)
+    print("TEST 16: Streaming Endpoint (SSE)")
+    print("="*60)
+    
+    import json
+    import tempfile
+    from fastapi.testclient import TestClient
+    import main
+    from agents import pipeline
+    from models.schemas import FinalAnalysis
+    from utils.logger import Logger
+    
+    original_run = pipeline.run_analysis
+    original_logger = main.logger
+    
+    async def fake_run_analysis(responses, data_loader, logger=None, cache=None, on_event=None):
+        for agent_id in range(1, 6):
+            on_event("specialist_report", {"agent_id": str(agent_id), "report": {}})
+            on_event("review", {"agent_id": str(agent_id), "attempt": 1, "feedback": {"status": "APROVADO"}})
+        final_analysis = FinalAnalysis(
+            final_score=42.0,
+            risk_level="Médio",
+            consolidated_factors=[],
+            synthesis="Síntese",
+            recommendations=[],
+            specialist_reports=[]
+        )
+        on_event("final_analysis", final_analysis.model_dump())
+        return final_analysis
+    
+    try:
+        with tempfile.TemporaryDirectory() as log_dir:
+            main.logger = Logger(log_dir=log_dir)
+            pipeline.run_analysis = fake_run_analysis
+            
+            client = TestClient(main.app)
+            response = client.post("/analyze/stream", json={"responses": [f"Relato {i}" for i in range(5)]})
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            
+            events = []
+            for block in response.text.strip().split("\n\n"):
+                lines = dict(line.split(": ", 1) for line in block.splitlines())
+                events.append((lines["event"], json.loads(lines["data"])))
+            
+            names = [name for name, _ in events]
+            assert names[0] == "started" and names[-1] == "final_analysis", f"Unexpected: {names}"
+            assert names.count("specialist_report") == 5 and names.count("review") == 5
+            assert events[-1][1]["final_score"] == 42.0
+            print("✅ Reports, verdicts and final analysis streamed in order")
+            
+            # Client disconnects mid-run: the request log must still be written
+            async def stalled_run_analysis(responses, data_loader, logger=None, cache=None, on_event=None):
+                on_event("specialist_report", {"agent_id": "1", "report": {}})
+                await asyncio.sleep(60)
+            
+            async def disconnect_mid_stream():
+                pipeline.run_analysis = stalled_run_analysis
+                stream = await main.analyze_responses_stream(
+                    main.AnalysisRequest(responses=[f"Relato {i}" for i in range(5)])
+                )
+                body = stream.body_iterator
+                assert "event: started" in await body.__anext__()
+                assert "event: specialist_report" in await body.__anext__()
+                await body.aclose()
+                await asyncio.sleep(0.05)
+            
+            asyncio.run(disconnect_mid_stream())
+            logs = [
+                json.loads(open(os.path.join(log_dir, name), encoding="utf-8").read())
+                for name in os.listdir(log_dir)
+            ]
+            cancelled = [log for log in logs if log["events"][-1]["data"].get("type") == "CancelledError"]
+            assert len(cancelled) == 1 and cancelled[0]["duration_seconds"] is not None, "Cancelled request not logged"
+            print("✅ Cancelled stream finalizes its audit log")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Streaming endpoint test failed: {e}")
+        return False
+    finally:
+        pipeline.run_analysis = original_run
+        main.logger = original_logger
+
+def test_job_queue_and_workers():
+    """Test job queue backends, restart recovery and the worker pool."""
+    print("\n" + "="*60)
+    print("TEST 17: Job Queue and Workers")
+    print("="*60)
+    
+    import tempfile
+    from pathlib import Path
+    from utils.job_queue import MemoryJobQueue, SQLiteJobQueue, JobQueueFull
+    from utils.job_worker import JobWorkerPool
+    
+    async def handler(payload):
+        await asyncio.sleep(0.01)
+        if payload["n"] == 2:
+            raise ValueError("falha simulada")
+        return {"n": payload["n"]}
+    
+    async def scenario(queue):
+        pool = JobWorkerPool(queue, handler, num_workers=2, poll_seconds=0.05)
+        await pool.start()
+        job_ids = [await pool.submit({"n": n}) for n in range(1, 4)]
+        for _ in range(100):
+            jobs = [await queue.aget(job_id) for job_id in job_ids]
+            if all(job["status"] in ("succeeded", "failed") for job in jobs):
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+        return jobs
+    
+    try:
+        jobs = asyncio.run(scenario(MemoryJobQueue()))
+        assert [job["status"] for job in jobs] == ["succeeded", "failed", "succeeded"], jobs
+        assert jobs[0]["result"] == {"n": 1} and "simulada" in jobs[1]["error"]
+        print("✅ Workers ran jobs and recorded results/errors")
+        
+        bounded = MemoryJobQueue(max_pending=1)
+        bounded.submit({"n": 1})
+        try:
+            bounded.submit({"n": 2})
+            raise AssertionError("Queue accepted more than max_pending jobs")
+        except JobQueueFull:
+            pass
+        print("✅ Pending jobs bounded")
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = str(Path(tmp_dir) / "jobs.sqlite3")
+            queue = SQLiteJobQueue(path)
+            first = queue.submit({"n": 1})
+            queue.submit({"n": 2})
+            assert queue.claim()[0] == first
+            queue.close()
+            
+            # Simulated restart: the interrupted job is queued again
+            queue = SQLiteJobQueue(path)
+            assert queue.requeue_running() == 1
+            assert queue.stats()["queued"] == 2
+            jobs = asyncio.run(scenario(queue))
+            assert queue.get(first)["status"] == "succeeded", "Recovered job not executed"
+            queue.close()
+        print("✅ SQLite jobs survive a restart")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Job queue test failed: {e}")
+        return False
+
+def test_batch_runner():
+    """Test batch deduplication, error isolation and checkpoint resume."""
+    print("\n" + "="*60)
+    print("TEST 18: Batch Runner")
+    print("="*60)
+    
+    import json
+    import tempfile
+    from pathlib import Path
+    import batch_runner
+    from models.schemas import FinalAnalysis
+    
+    original_run_request = batch_runner.run_request
+    original_log_dir = os.environ.get("AUDIT_LOG_DIR")
+    state = {"calls": [], "fail": True}
+    
+    async def fake_run_request(responses, data_loader, logger, cache=None):
+        state["calls"].append(responses[0])
+        if responses[0] == "B" and state["fail"]:
+            raise RuntimeError("falha simulada")
+        return FinalAnalysis(
+            final_score=10.0,
+            risk_level="Baixo",
+            consolidated_factors=[],
+            synthesis=f"Síntese {responses[0]}",
+            recommendations=[],
+            specialist_reports=[]
+        )
+    
+    def request_line(first):
+        return json.dumps({"id": first, "responses": [first, "2", "3", "4", "5"]})
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.environ["AUDIT_LOG_DIR"] = str(Path(tmp_dir) / "logs")
+            batch_runner.run_request = fake_run_request
+            input_path = Path(tmp_dir) / "input.jsonl"
+            output_path = Path(tmp_dir) / "output.jsonl"
+            input_path.write_text("\n".join([
+                request_line("A"), request_line("B"), request_line(" a "), "{invalid"
+            ]) + "\n", encoding="utf-8")
+            
+            failures = asyncio.run(batch_runner.run(input_path, output_path, concurrency=2))
+            assert sorted(state["calls"]) == ["A", "B"], f"Duplicates not merged: {state['calls']}"
+            assert failures == 2, f"Unexpected failures: {failures}"
+            print("✅ Identical requests analyzed once, failures isolated")
+            
+            state["calls"].clear()
+            state["fail"] = False
+            failures = asyncio.run(batch_runner.run(input_path, output_path, concurrency=2, retry_failed=True))
+            assert state["calls"] == ["B"], f"Resume redid finished work: {state['calls']}"
+            assert failures == 1, f"Checkpointed invalid line not counted: {failures}"
+            
+            records = {}
+            for raw in output_path.read_text(encoding="utf-8").splitlines():
+                record = json.loads(raw)
+                records[record["line"]] = record["status"]
+            assert records == {1: "ok", 2: "ok", 3: "ok", 4: "invalid"}, records
+            print("✅ Resume skipped finished lines and retried failures")
+            
+            lines_before = len(output_path.read_text(encoding="utf-8").splitlines())
+            failures = asyncio.run(batch_runner.run(input_path, output_path, concurrency=2, retry_failed=True))
+            assert len(output_path.read_text(encoding="utf-8").splitlines()) == lines_before, "Invalid line appended again"
+            assert failures == 1, f"Remaining failure not reported: {failures}"
+            print("✅ Invalid lines never retried; earlier failures keep the exit status")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Batch runner test failed: {e}")
+        return False
+    finally:
+        batch_runner.run_request = original_run_request
+        if original_log_dir is None:
+            os.environ.pop("AUDIT_LOG_DIR", None)
+        else:
+            os.environ["AUDIT_LOG_DIR"] = original_log_dir
+
+def test_specialist_coalescing():
+    """Test that concurrent specialist calls are merged and fanned out."""
+    print("\n" + "="*60)
+    print("TEST 19: Specialist Call Coalescing")
+    print("="*60)
+    
+    import json
+    import tempfile
+    from types import SimpleNamespace
+    from agents import specialist_analysis
+    from models.schemas import SpecialistReport
+    from utils.logger import Logger, log_request_event
+    
+    def report(index, analysis):
+        return {
+            "index": index,
+            "agent_id": "1",
+            "domain": "Emocional",
+            "analysis": analysis,
+            "preliminary_score": 40.0,
+            "justification": "Justificativa"
+        }
+    
+    # Out of order, and relato 3's report is invalid (missing score)
+    invalid = report(3, "C")
+    del invalid["preliminary_score"]
+    reply = json.dumps({"reports": [report(2, "B"), report(1, "A"), invalid]})
+    client = FakeChatClient([reply])
+    direct_calls = []
+    
+    async def fake_direct(agent_id, response, data_loader, stream=False, on_progress=None):
+        direct_calls.append(response)
+        log_request_event("llm_call", {"status": "ok"}, agent_id="fallback")
+        return SpecialistReport(
+            agent_id=str(agent_id), domain="Emocional", analysis="individual",
+            preliminary_score=10.0, justification="Justificativa"
+        )
+    
+    data_loader = SimpleNamespace(get_few_shot_examples=lambda agent_id, num_examples=5, query=None: "Exemplos")
+    originals = (
+        specialist_analysis.create_specialist_agent,
+        specialist_analysis._analyze_direct,
+        os.environ.get("SPECIALIST_COALESCING_ENABLED")
+    )
+    
+    log_dir = tempfile.mkdtemp()
+    
+    async def request(relato):
+        # Each relato comes from its own request, with its own audit log
+        logger = Logger(log_dir=log_dir)
+        logger.start_request_log({"responses": [relato]})
+        result = await specialist_analysis.analyze_single(1, relato, data_loader)
+        return result, [event.agent_id for event in logger.current_log.events if event.event_type == "llm_call"]
+    
+    async def scenario():
+        return await asyncio.gather(*[request(relato) for relato in ("Relato A", "Relato B", "Relato C")])
+    
+    try:
+        os.environ["SPECIALIST_COALESCING_ENABLED"] = "true"
+        specialist_analysis._coalescer = None
+        def fake_specialist(agent_id, examples):
+            agent = make_fake_agent("specialist_1", client, role="specialist")
+            agent.config = {**agent.config, "max_output_tokens": 250}
+            return agent
+        
+        specialist_analysis.create_specialist_agent = fake_specialist
+        specialist_analysis._analyze_direct = fake_direct
+        
+        results = asyncio.run(scenario())
+        reports = [report for report, _ in results]
+        call_logs = [calls for _, calls in results]
+        assert client.calls == 1, f"Expected one merged call, got {client.calls}"
+        assert [r.analysis for r in reports] == ["A", "B", "individual"], [r.analysis for r in reports]
+        assert direct_calls == ["Relato C"], f"Unexpected fallbacks: {direct_calls}"
+        print("✅ 3 calls merged into 1, results matched by index")
+        print("✅ Invalid entry retried individually")
+        
+        assert call_logs == [["specialist_1"], ["specialist_1"], ["specialist_1", "fallback"]], call_logs
+        print("✅ Batch call logged in every request; fallback only in its own")
+        
+        # 3 x 100 tokens would exceed the model's 250-token output limit
+        assert client.requests[0]["max_tokens"] == 250, client.requests[0]["max_tokens"]
+        limits = {"LLM_SPECIALIST_MAX_TOKENS": "4000", "LLM_SPECIALIST_MAX_OUTPUT_TOKENS": "10000"}
+        saved = {name: os.environ.get(name) for name in limits}
+        try:
+            os.environ.update(limits)
+            specialist_analysis._coalescer = None
+            assert specialist_analysis._get_coalescer().max_batch == 2
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+        print("✅ Batch budget and size kept within the model output limit")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Coalescing test failed: {e}")
+        return False
+    finally:
+        specialist_analysis.create_specialist_agent, specialist_analysis._analyze_direct, enabled = originals
+        specialist_analysis._coalescer = None
+        if enabled is None:
+            os.environ.pop("SPECIALIST_COALESCING_ENABLED", None)
+        else:
+            os.environ["SPECIALIST_COALESCING_ENABLED"] = enabled
+
+
+def test_response_parser():
+    """Test shared JSON extraction, repair and failure metrics."""
+    print("\n" + "="*60)
+    print("TEST 20: Response Parser")
+    print("="*60)
+    
+    from models.schemas import ReviewFeedback, SpecialistReport
+    from utils.metrics import metrics
+    from utils.response_parser import ResponseParseError, parse_response
+    
+    try:
+        fenced = 'Segue a avaliação:\n```json\n{"status": "APROVADO", "feedback": "Ok {sem chaves}", "agent_id": "1"}\n```\nObrigado!'
+        feedback = parse_response(fenced, ReviewFeedback, agent="test_parser")
+        assert feedback.status == "APROVADO" and feedback.feedback == "Ok {sem chaves}"
+        print("✅ JSON located inside code fence and prose")
+        
+        repairs = metrics.get("json_repairs", "test_parser")
+        defective = (
+            '{"agent_id": "1", "domain": "Emocional", "analysis": "Linha 1\nLinha 2",'
+            ' "preliminary_score": 40, "risk_factors": [{"factor": "Isolamento", "severity": "Alto", "description": "D",},],'
+            ' "justification": "J",}'
+        )
+        report = parse_response(defective, SpecialistReport, agent="test_parser")
+        assert report.analysis == "Linha 1\nLinha 2" and report.risk_factors[0].severity == "Alto"
+        assert metrics.get("json_repairs", "test_parser") == repairs + 1
+        print("✅ Trailing commas and raw newlines repaired")
+        
+        truncated = '{"agent_id": "1", "status": "REVISAR", "feedback": "Faltou profund'
+        assert parse_response(truncated, ReviewFeedback, agent="test_parser").status == "REVISAR"
+        print("✅ Truncated object closed")
+        
+        failures = metrics.get("parse_failures", "test_parser")
+        for bad in ("sem JSON nenhum", '{"status": "APROVADO"}'):
+            try:
+                parse_response(bad, SpecialistReport, agent="test_parser")
+                raise AssertionError(f"Expected ResponseParseError for {bad!r}")
+            except ResponseParseError:
+                pass
+        assert metrics.get("parse_failures", "test_parser") == failures + 2
+        print("✅ Parse failures raised and counted per agent")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Response parser test failed: {e}")
+        return False
+
+
+def test_structured_outputs():
+    """Test json_schema response_format and the json_object fallback."""
+    print("\n" + "="*60)
+    print("TEST 21: Structured Outputs")
+    print("="*60)
+    
+    from agents import agent_factory
+    from models.schemas import SpecialistReport
+    
+    class SchemaRejected(Exception):
+        status_code = 400
+    
+    reply = '{"status": "APROVADO", "feedback": null, "agent_id": "1"}'
+    
+    try:
+        client = FakeChatClient([reply])
+        agent = make_fake_agent("schema_agent", client, role="specialist")
+        agent.response_model = SpecialistReport
+        asyncio.run(agent.run("Tarefa", use_cache=False))
+        response_format = client.requests[-1]["response_format"]
+        schema = response_format["json_schema"]["schema"]
+        assert response_format["type"] == "json_schema" and response_format["json_schema"]["strict"]
+        assert schema["required"] == list(schema["properties"]) and schema["additionalProperties"] is False
+        assert "minimum" not in schema["properties"]["preliminary_score"]
+        risk_factor = schema["$defs"]["RiskFactor"]
+        assert risk_factor["additionalProperties"] is False
+        print("✅ Strict json_schema sent for the agent's response model")
+        
+        agent.provider = "groq"
+        asyncio.run(agent.run("Tarefa", use_cache=False))
+        assert client.requests[-1]["response_format"] == {"type": "json_object"}
+        print("✅ Providers without structured outputs keep json_object")
+        
+        client = FakeChatClient([SchemaRejected("Invalid response_format: json_schema not supported"), reply])
+        agent = make_fake_agent("schema_agent", client, role="specialist")
+        agent.response_model = SpecialistReport
+        assert asyncio.run(agent.run("Tarefa", use_cache=False)) == reply
+        asyncio.run(agent.run("Tarefa", use_cache=False))
+        formats = [request["response_format"]["type"] for request in client.requests]
+        assert formats == ["json_schema", "json_object", "json_object"], formats
+        print("✅ Rejected schema falls back to json_object and is remembered")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Structured outputs test failed: {e}")
+        return False
+    finally:
+        agent_factory._schema_unsupported.clear()
+
+
+def test_azure_agent_reuse():
+    """Test that Azure Agent Framework agents are reused and bounded."""
+    print("\n" + "="*60)
+    print("TEST 22: Azure Agent Reuse")
+    print("="*60)
+    
+    from agents import agent_factory
+    from models.schemas import ReviewFeedback
+    
+    reply = '{"status": "APROVADO", "feedback": null, "agent_id": "1"}'
+    
+    class FakeAzureAgent:
+        def __init__(self):
+            self.runs = []
+        
+        async def run(self, task, **kwargs):
+            self.runs.append(kwargs)
+            return reply
+    
+    class FakeAzureClient:
+        def __init__(self):
+            self.created = []
+        
+        def create_agent(self, name, instructions):
+            self.created.append(name)
+            return FakeAzureAgent()
+    
+    previous_size = os.environ.get("AZURE_AGENT_CACHE_SIZE")
+    
+    def azure_agent(name, client):
+        agent = make_fake_agent(name, client)
+        agent.provider = "azure_openai"
+        agent.response_model = ReviewFeedback
+        return agent
+    
+    try:
+        agent_factory._azure_agents.clear()
+        client = FakeAzureClient()
+        for _ in range(3):
+            assert asyncio.run(azure_agent("supervisor", client).run("Tarefa", use_cache=False)) == reply
+        assert client.created == ["supervisor"], client.created
+        print("✅ One agent built for 3 calls")
+        
+        runs = agent_factory._azure_agents[next(iter(agent_factory._azure_agents))][1].runs
+        assert all(run.get("response_format") is ReviewFeedback for run in runs)
+        print("✅ Response model passed as response_format")
+        
+        os.environ["AZURE_AGENT_CACHE_SIZE"] = "1"
+        for name in ("synthesizer", "supervisor"):
+            asyncio.run(azure_agent(name, client).run("Tarefa", use_cache=False))
+        assert client.created == ["supervisor", "synthesizer", "supervisor"], client.created
+        assert len(agent_factory._azure_agents) == 1
+        print("✅ Cache bounded by AZURE_AGENT_CACHE_SIZE")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Azure agent reuse test failed: {e}")
+        return False
+    finally:
+        agent_factory._azure_agents.clear()
+        if previous_size is None:
+            os.environ.pop("AZURE_AGENT_CACHE_SIZE", None)
+        else:
+            os.environ["AZURE_AGENT_CACHE_SIZE"] = previous_size
+
+
+def test_report_serialization():
+    """Test compact report serialization within a token budget."""
+    print("\n" + "="*60)
+    print("TEST 23: Report Serialization")
+    print("="*60)
+    
+    import json
+    from models.schemas import RiskFactor, SpecialistReport
+    from utils.report_serializer import count_tokens, fit_reports, shorten
+    
+    def report(agent_id):
+        return SpecialistReport(
+            agent_id=str(agent_id),
+            domain="Emocional",
+            analysis="A parceira relata controle frequente das saídas. " * 40,
+            preliminary_score=55.0,
+            risk_factors=[RiskFactor(factor="Controle", severity="Alto", description="Controla saídas " * 20)],
+            justification="Padrão recorrente de controle. " * 20
+        )
+    
+    try:
+        reports = [report(agent_id) for agent_id in range(1, 6)]
+        compact = fit_reports(reports)
+        assert all("\n" not in text and ": " not in text[:30] for text in compact)
+        assert sum(map(len, compact)) < sum(len(r.model_dump_json(indent=2)) for r in reports)
+        assert json.loads(compact[0])["analysis"] == reports[0].analysis
+        print("✅ Compact JSON smaller than indented JSON, content intact")
+        
+        empty = SpecialistReport(agent_id="2", domain="Social", analysis="A", preliminary_score=5.0, justification="J")
+        assert "risk_factors" not in json.loads(fit_reports([empty])[0])
+        print("✅ Empty fields omitted")
+        
+        fitted = fit_reports(reports, max_tokens=1500)
+        assert count_tokens("".join(fitted)) <= 1500
+        data = json.loads(fitted[0])
+        assert data["analysis"].endswith("…") and data["preliminary_score"] == 55.0
+        print(f"✅ 5 reports shrunk to {count_tokens(''.join(fitted))} tokens (budget 1500)")
+        
+        minimal = json.loads(fit_reports(reports, max_tokens=200)[0])
+        assert "analysis" not in minimal and minimal["risk_factors"] == [{"factor": "Controle", "severity": "Alto"}]
+        print("✅ Tiny budget keeps only scores and factors")
+        
+        assert shorten("Primeira frase. Segunda frase longa", 25) == "Primeira frase.…"
+        print("✅ Text cut at a sentence boundary")
+        
+        # The supervisor reviews the report exactly as the specialist wrote it
+        from config.llm_config import get_report_budget_config
+        saved = {name: os.environ.pop(name, None) for name in ("LLM_SUPERVISOR_REPORT_TOKENS", "LLM_SPECIALIST_REPORT_TOKENS", "LLM_REWORK_REPORT_TOKENS")}
+        try:
+            # A long report, above the old 2000-token review budget
+            long_report = reports[0].model_copy(update={"analysis": reports[0].analysis * 6})
+            for role in ("supervisor", "rework"):
+                reviewed = json.loads(fit_reports([long_report], **get_report_budget_config(role))[0])
+                assert reviewed["analysis"] == long_report.analysis, f"{role} report truncated"
+            assert get_report_budget_config("synthesizer")["max_tokens"] > 0
+        finally:
+            os.environ.update({name: value for name, value in saved.items() if value is not None})
+        print("✅ Reviewed report kept whole; only the synthesizer is budgeted")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Report serialization test failed: {e}")
+        return False
+
+
+def test_prompt_assembly():
+    """Test precompiled specialist prompts and cached Few-Shot blocks."""
+    print("\n" + "="*60)
+    print("TEST 24: Prompt Assembly")
+    print("="*60)
+    
+    from prompts.system_prompts import _compile_specialist_prompt, get_domain_description, get_specialist_prompt
+    from utils.data_loader import EXAMPLES_HEADER
+    
+    try:
+        loader = DataLoader(data_dir="data")
+        examples = loader.get_few_shot_examples(2, num_examples=5)
+        assert loader.get_few_shot_examples(2, num_examples=5) is examples
+        assert examples.startswith(EXAMPLES_HEADER) and examples.count("EXEMPLO ") == 5
+        print("✅ Stable Few-Shot block rendered once and reused")
+        
+        random_loader = DataLoader(data_dir="data", few_shot_mode="random")
+        block = random_loader.get_few_shot_examples(3, num_examples=4)
+        snippets = [part.split(":\n", 1)[1] for part in block[len(EXAMPLES_HEADER):].split("EXEMPLO ")[1:]]
+        assert len(snippets) == 4 and all(snippet in random_loader.snippets[3] for snippet in snippets)
+        print("✅ Random mode joins pre-rendered row snippets")
+        
+        domain = get_domain_description(2)
+        prompt = get_specialist_prompt(2, domain, examples)
+        assert prompt.endswith(examples) and f'"agent_id": "2"' in prompt and domain in prompt
+        hits = _compile_specialist_prompt.cache_info().hits
+        get_specialist_prompt(2, domain, examples)
+        assert _compile_specialist_prompt.cache_info().hits == hits + 1
+        print("✅ Specialist instructions compiled once per agent")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Prompt assembly test failed: {e}")
+        return False
+
+
+def test_example_store():
+    """Test the pandas-free example store behind DataLoader."""
+    print("\n" + "="*60)
+    print("TEST 25: Example Store")
+    print("="*60)
+    
+    import subprocess
+    from utils.data_loader import ExampleRecord
+    
+    try:
+        code = (
+            "import sys; from utils.data_loader import DataLoader; "
+            "DataLoader(data_dir='data').get_few_shot_examples(1); "
+            "print('pandas' in sys.modules)"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+        assert output.stdout.strip() == "False", output.stdout + output.stderr
+        print("✅ Loading and sampling examples does not import pandas")
+        
+        loader = DataLoader(data_dir="data")
+        record = loader.datasets[1][0]
+        assert isinstance(record, ExampleRecord) and not hasattr(record, "__dict__")
+        stats = loader.get_dataset_stats(1)
+        assert stats["total_examples"] == len(loader.datasets[1]) == sum(stats["risk_distribution"].values())
+        print("✅ __slots__ records and stats computed without pandas")
+        
+        df = loader.get_dataset(1)
+        assert list(df.columns) == list(ExampleRecord.FIELDS) and df.iloc[0]["frase"] == record.frase
+        print("✅ get_dataset still returns a DataFrame (lazy pandas)")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Example store test failed: {e}")
+        return False
+
+
+def test_similar_few_shot():
+    """Test BM25 retrieval of Few-Shot examples and index persistence."""
+    print("\n" + "="*60)
+    print("TEST 26: Similar Few-Shot Retrieval")
+    print("="*60)
+    
+    import tempfile
+    from utils.example_index import BM25Index, load_or_build_index
+    
+    try:
+        with tempfile.TemporaryDirectory() as index_dir:
+            loader = DataLoader(data_dir="data", few_shot_mode="similar", index_dir=index_dir)
+            target = loader.datasets[4][7]
+            examples = loader.get_few_shot_examples(4, num_examples=3, query=target.frase)
+            assert examples.split("EXEMPLO 2:")[0].endswith(loader.snippets[4][7])
+            print("✅ Most similar row ranked first")
+            
+            unrelated = loader.get_few_shot_examples(4, num_examples=3, query="xyzzy")
+            assert unrelated == loader.get_few_shot_examples(4, num_examples=3)
+            assert unrelated.count("EXEMPLO ") == 3
+            print("✅ Queries without matches fall back to the stable selection")
+            
+            texts = [record.frase for record in loader.datasets[4]]
+            persisted = BM25Index.load(os.path.join(index_dir, "dataset_4.npz"))
+            assert persisted is not None and persisted.search(target.frase, 3) == loader.indexes[4].search(target.frase, 3)
+            rebuilt = load_or_build_index(texts[:-1], os.path.join(index_dir, "dataset_4.npz"))
+            assert rebuilt.num_docs == len(texts) - 1
+            print("✅ Index persisted, reloaded and rebuilt when the dataset changes")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Similar Few-Shot test failed: {e}")
+        return False
+
+
+def test_shared_client_lifecycle():
+    """Test the shared LLM client registry across calls and event loops."""
+    print("\n" + "="*60)
+    print("TEST 27: Shared Client Lifecycle")
+    print("="*60)
+    
+    from config import llm_config
+    
+    original_key = os.environ.get("OPENAI_API_KEY")
+    os.environ["OPENAI_API_KEY"] = "test-key"
+    
+    async def use_clients():
+        clients = llm_config.init_chat_clients()
+        client = llm_config.get_chat_client("openai")
+        assert clients["openai"] is client
+        assert llm_config.get_chat_client("openai") is client
+        return client, list(llm_config._http_clients)
+    
+    try:
+        first, first_pools = asyncio.run(use_clients())
+        print("✅ One client per provider, reused by every agent")
+        
+        assert first.max_retries == 0, "SDK retries stack on top of _call_with_retry"
+        print("✅ SDK retries disabled (single retry policy)")
+        
+        second, second_pools = asyncio.run(use_clients())
+        assert second is not first
+        assert not set(map(id, first_pools)) & set(map(id, second_pools))
+        print("✅ Clients rebuilt for a new event loop (repeated asyncio.run)")
+        
+        async def close_clients():
+            llm_config.get_chat_client("openai")
+            pools = list(llm_config._http_clients)
+            await llm_config.close_chat_clients()
+            return pools
+        
+        closed_pools = asyncio.run(close_clients())
+        assert closed_pools and all(pool.is_closed for pool in closed_pools)
+        assert not llm_config._chat_clients and not llm_config._http_clients
+        print("✅ close_chat_clients closes the connection pools")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Shared client lifecycle test failed: {e}")
+        return False
+    finally:
+        llm_config._chat_clients.clear()
+        llm_config._http_clients.clear()
+        llm_config._clients_loop = None
+        if original_key is None:
+            os.environ.pop("OPENAI_API_KEY", None)
+        else:
+            os.environ["OPENAI_API_KEY"] = original_key
+
+
+def test_degraded_analysis_not_cached():
+    """Test that analyses built from fallback results are not cached."""
+    print("\n" + "="*60)
+    print("TEST 28: Degraded Analyses Not Cached")
+    print("="*60)
+    
+    import json
+    from agents import agent_factory, router
+    import tempfile
+    from agents.pipeline import run_analysis, run_request
+    from agents.router import ProviderRouter
+    from utils.cache import MemoryCache
+    from utils.logger import Logger
+    
+    class ServerError(Exception):
+        status_code = 503
+    
+    replies = {
+        "SpecialistReport": {
+            "agent_id": "1", "domain": "Emocional", "analysis": "Análise",
+            "preliminary_score": 40.0, "risk_factors": [], "justification": "Justificativa"
+        },
+        "ReviewFeedback": {"status": "APROVADO", "feedback": None, "agent_id": "1"},
+        "SynthesisResult": {
+            "final_score": 40.0, "risk_level": "Médio", "synthesis": "Síntese",
+            "consolidated_factors": [], "recommendations": ["Buscar apoio"]
+        }
+    }
+    
+    class RoleClient(FakeChatClient):
+        """Answers each role with a valid reply for its response schema."""
+        async def _create(self, **kwargs):
+            from types import SimpleNamespace
+            self.calls += 1
+            name = kwargs["response_format"]["json_schema"]["name"]
+            message = SimpleNamespace(content=json.dumps(replies[name]))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+    
+    original_router = router._router
+    original_get_client = agent_factory.get_chat_client
+    original_llm_cache = agent_factory.get_llm_cache
+    original_retries = os.environ.get("LLM_MAX_RETRIES")
+    responses = [f"Relato {index}" for index in range(1, 6)]
+    
+    try:
+        os.environ["LLM_MAX_RETRIES"] = "0"
+        router._router = ProviderRouter(
+            providers=["openai"],
+            routes={role: ("openai", "fake-model") for role in ("specialist", "rework", "supervisor", "synthesizer")},
+            max_consecutive_failures=1000
+        )
+        agent_factory.get_llm_cache = lambda: None
+        loader = DataLoader(data_dir="data")
+        cache = MemoryCache()
+        
+        failing = FakeChatClient([ServerError("503")])
+        agent_factory.get_chat_client = lambda provider=None: failing
+        with tempfile.TemporaryDirectory() as log_dir:
+            # Through run_request, as /analyze, jobs and the batch runner do
+            degraded = asyncio.run(run_request(responses, loader, Logger(log_dir=log_dir), cache=cache))
+            assert failing.calls > 0 and degraded.specialist_reports
+            assert len(cache) == 0, "Degraded analysis was cached"
+            (log_name,) = os.listdir(log_dir)
+            with open(os.path.join(log_dir, log_name), encoding="utf-8") as f:
+                event_types = [event["event_type"] for event in json.load(f)["events"]]
+            assert "cache_skip" in event_types, f"Cache skip not logged: {event_types}"
+        print("✅ Failing provider: fallback analysis returned, logged and not cached")
+        
+        healthy = RoleClient([])
+        agent_factory.get_chat_client = lambda provider=None: healthy
+        asyncio.run(run_analysis(responses, loader, mode="phased", cache=cache))
+        assert len(cache) == 1, "Healthy analysis not cached"
+        print("✅ Fully parsed analysis cached")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Degraded cache test failed: {e}")
+        return False
+    finally:
+        router._router = original_router
+        agent_factory.get_chat_client = original_get_client
+        agent_factory.get_llm_cache = original_llm_cache
+        if original_retries is None:
+            os.environ.pop("LLM_MAX_RETRIES", None)
+        else:
+            os.environ["LLM_MAX_RETRIES"] = original_retries
+
+
 def main():
     """Run all tests."""
     print("""
@@ -119,6 +1643,31 @@ def main():
     # Run tests
     results.append(("DataLoader", test_data_loader()))
     results.append(("API Validation", test_api_request_validation()))
+    results.append(("Review Stage", test_review_stage_order()))
+    results.append(("Pipelined Analysis", test_pipelined_analysis()))
+    results.append(("Concurrent Logs", test_concurrent_request_logs()))
+    results.append(("Audit Log Writer", test_audit_log_writer()))
+    results.append(("Result Cache", test_result_cache()))
+    results.append(("LLM Memoization", test_llm_call_memoization()))
+    results.append(("LLM Scheduler", test_llm_scheduler()))
+    results.append(("LLM Retry", test_llm_retry_backoff()))
+    results.append(("Hedged Requests", test_hedged_requests()))
+    results.append(("Provider Failover", test_provider_failover()))
+    results.append(("Per-Role Model Config", test_role_model_config()))
+    results.append(("Streaming", test_streaming_early_stop()))
+    results.append(("Streaming Endpoint", test_analyze_stream_endpoint()))
+    results.append(("Job Queue", test_job_queue_and_workers()))
+    results.append(("Batch Runner", test_batch_runner()))
+    results.append(("Specialist Coalescing", test_specialist_coalescing()))
+    results.append(("Response Parser", test_response_parser()))
+    results.append(("Structured Outputs", test_structured_outputs()))
+    results.append(("Azure Agent Reuse", test_azure_agent_reuse()))
+    results.append(("Report Serialization", test_report_serialization()))
+    results.append(("Prompt Assembly", test_prompt_assembly()))
+    results.append(("Example Store", test_example_store()))
+    results.append(("Similar Few-Shot", test_similar_few_shot()))
+    results.append(("Shared Client Lifecycle", test_shared_client_lifecycle()))
+    results.append(("Degraded Analysis Cache", test_degraded_analysis_not_cached()))
     # Note: Specialist analysis test requires API key
     print("\n⚠️  Skipping specialist analysis test (requires GROQ_API_KEY)")
     
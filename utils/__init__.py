@@ -1,5 +1,22 @@
 """Initialize utils package."""
 from .data_loader import DataLoader
 from .logger import Logger
+from .log_writer import AuditLogWriter
+from .metrics import metrics
+from .job_queue import MemoryJobQueue, SQLiteJobQueue, JobQueueFull, create_job_queue
+from .job_worker import JobWorkerPool
+from .response_parser import ResponseParseError, parse_response
 
-__all__ = ['DataLoader', 'Logger']
+__all__ = [
+    'DataLoader',
+    'Logger',
+    'AuditLogWriter',
+    'metrics',
+    'MemoryJobQueue',
+    'SQLiteJobQueue',
+    'JobQueueFull',
+    'create_job_queue',
+    'JobWorkerPool',
+    'ResponseParseError',
+    'parse_response'
+]
@@ -0,0 +1,238 @@
+"""
+Key/value caches with TTL and LRU eviction.
+
+Two backends share the same interface:
+- MemoryCache: in-process OrderedDict
+- SQLiteCache: local on-disk cache that survives restarts
+Values are strings (usually JSON); async callers use aget/aset.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+class MemoryCache:
+    """In-memory LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600):
+        """
+        Initialize MemoryCache.
+
+        Args:
+            max_entries: Maximum number of entries (least recently used evicted first)
+            ttl_seconds: Default time-to-live per entry (0 = no expiry)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a value (None if missing or expired)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        """Store a value, evicting least recently used entries if full."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.time() + ttl if ttl else 0.0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Async get (no I/O, runs inline)."""
+        return self.get(key)
+
+    async def aset(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        """Async set (no I/O, runs inline)."""
+        self.set(key, value, ttl_seconds)
+
+
+class SQLiteCache:
+    """On-disk LRU cache with per-entry TTL backed by SQLite."""
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl_seconds: float = 3600):
+        """
+        Initialize SQLiteCache.
+
+        Args:
+            path: SQLite database file (parent directory is created if needed)
+            max_entries: Maximum number of entries (least recently used evicted first)
+            ttl_seconds: Default time-to-live per entry (0 = no expiry)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_access ON cache(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a value (None if missing or expired)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at and expires_at < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        """Store a value, evicting least recently used entries if full."""
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = now + ttl if ttl else 0.0
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Async get (disk I/O runs in a worker thread)."""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        """Async set (disk I/O runs in a worker thread)."""
+        await asyncio.to_thread(self.set, key, value, ttl_seconds)
+
+
+def create_cache(
+    backend: str,
+    max_entries: int = 1000,
+    ttl_seconds: float = 3600,
+    path: Optional[str] = None
+):
+    """
+    Create a cache for the given backend.
+
+    Args:
+        backend: "memory", "sqlite" or "none"
+        max_entries: Maximum number of entries
+        ttl_seconds: Default time-to-live per entry
+        path: SQLite file (required for the sqlite backend)
+
+    Returns:
+        MemoryCache, SQLiteCache or None if caching is disabled
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend in ("", "none"):
+        return None
+    if backend == "memory":
+        return MemoryCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("SQLite cache requires a path")
+        return SQLiteCache(path, max_entries=max_entries, ttl_seconds=ttl_seconds)
+    raise ValueError(f"Invalid cache backend: {backend}. Must be 'none', 'memory' or 'sqlite'.")
+
+
+def hash_text(text: str) -> str:
+    """SHA-256 hex digest of a string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_response(text: str) -> str:
+    """
+    Normalize a user response for cache keys.
+    Unicode NFC, case-folded, with whitespace collapsed.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+def analysis_cache_key(
+    responses: List[str],
+    model_signature: str,
+    prompt_version: str,
+    few_shot_mode: str = "stable",
+    seed: int = 42
+) -> str:
+    """
+    Build the cache key for a whole analysis.
+
+    Args:
+        responses: The 5 user responses
+        model_signature: Provider/model identifier of the pipeline
+        prompt_version: Version of the system prompts
+        few_shot_mode: Few-Shot selection mode (the examples are part of the prompts)
+        seed: Few-Shot selection seed
+
+    Returns:
+        Hex digest identifying equivalent analyses
+    """
+    payload = json.dumps(
+        {
+            "responses": [normalize_response(response) for response in responses],
+            "model": model_signature,
+            "prompt_version": prompt_version,
+            "few_shot": [few_shot_mode, seed],
+        },
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hash_text(payload)
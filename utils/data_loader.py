@@ -1,42 +1,149 @@
 """
 Data loader for Few-Shot Learning examples.
+
+Datasets are small (a few dozen rows), so they are kept as lists of
+__slots__ records read with the csv module; pandas is only imported when a
+caller asks for a DataFrame (get_dataset).
 """
-import pandas as pd
+import csv
 import random
-from typing import List, Dict
+from collections import Counter
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
 from pathlib import Path
 
+if TYPE_CHECKING:
+    from utils.example_index import BM25Index
+
+
+FEW_SHOT_MODES = ("stable", "random", "similar")
+
+
+EXAMPLES_HEADER = "=== EXEMPLOS DE CASOS ANTERIORES ===\n\n"
+
+
+class ExampleRecord:
+    """One dataset row (Few-Shot example)."""
+    
+    FIELDS = ("frase", "risco", "fator", "taxonomia", "metadata")
+    __slots__ = FIELDS
+    
+    def __init__(self, frase: str, risco: str, fator: str, taxonomia: str, metadata: str):
+        self.frase = frase
+        self.risco = risco
+        self.fator = fator
+        self.taxonomia = taxonomia
+        self.metadata = metadata
+    
+    def as_dict(self) -> Dict[str, str]:
+        """Row as a column -> value dict."""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def render_example(example: ExampleRecord) -> str:
+    """Render one dataset row as a Few-Shot snippet (without its "EXEMPLO n:" label)."""
+    return (
+        f"Relato: \"{example.frase}\"\n"
+        f"Risco: {example.risco}\n"
+        f"Fator: {example.fator}\n"
+        f"Taxonomia: {example.taxonomia}\n"
+        f"Metadata: {example.metadata}\n"
+        "\n" + "-" * 50 + "\n\n"
+    )
+
+
+def _stable_rows(num_rows: int, num_examples: int, seed: int) -> List[int]:
+    """
+    Seeded selection of row positions.
+    
+    Same draw as DataFrame.sample(n=num_examples, random_state=seed), so the
+    stable examples (and the cached specialist prompts) are unchanged.
+    """
+    import numpy as np  # only needed once per (agent, num_examples)
+    return np.random.RandomState(seed).permutation(num_rows)[:num_examples].tolist()
+
+
+def _join_examples(snippets: List[str], rows) -> str:
+    """Example block for the given row positions (numbered in order)."""
+    return "".join([EXAMPLES_HEADER] + [
+        f"EXEMPLO {idx}:\n{snippets[row]}"
+        for idx, row in enumerate(rows, 1)
+    ])
+
 
 class DataLoader:
     """Loads and manages Few-Shot learning datasets."""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(
+        self,
+        data_dir: str = "data",
+        few_shot_mode: str = "stable",
+        seed: int = 42,
+        index_dir: Optional[str] = None
+    ):
         """
         Initialize DataLoader.
         
         Args:
             data_dir: Directory containing CSV datasets
+            few_shot_mode: "stable" (same examples on every call, so the
+                specialist system prompt is cacheable), "random" or
+                "similar" (rows most similar to the user's response, BM25)
+            seed: Base seed for stable selection (offset by agent_id)
+            index_dir: Where "similar" mode persists its retrieval indexes
+                (None = build them in memory at startup)
         """
+        if few_shot_mode not in FEW_SHOT_MODES:
+            raise ValueError(f"Invalid few_shot_mode: {few_shot_mode}. Must be one of {', '.join(FEW_SHOT_MODES)}.")
+        
         self.data_dir = Path(data_dir)
-        self.datasets = {}
+        self.few_shot_mode = few_shot_mode
+        self.seed = seed
+        self.index_dir = Path(index_dir) if index_dir else None
+        # BM25 index over each dataset's "frase" column ("similar" mode only)
+        self.indexes: Dict[int, "BM25Index"] = {}
+        self.datasets: Dict[int, List[ExampleRecord]] = {}
+        # Pre-rendered snippet of every row, parallel to each dataset
+        self.snippets: Dict[int, List[str]] = {}
+        # Rendered example blocks of stable mode, by (agent_id, num_examples)
+        self._stable_examples: Dict[Tuple[int, int], str] = {}
         self._load_all_datasets()
     
     def _load_all_datasets(self):
-        """Load all 5 datasets into memory."""
+        """Load all 5 datasets into memory and pre-render their example snippets."""
         for i in range(1, 6):
             dataset_path = self.data_dir / f"dataset_{i}.csv"
             if dataset_path.exists():
-                self.datasets[i] = pd.read_csv(dataset_path)
+                with open(dataset_path, "r", encoding="utf-8", newline="") as f:
+                    self.datasets[i] = [
+                        ExampleRecord(*(row[field] for field in ExampleRecord.FIELDS))
+                        for row in csv.DictReader(f)
+                    ]
+                self.snippets[i] = [render_example(record) for record in self.datasets[i]]
+                if self.few_shot_mode == "similar":
+                    from utils.example_index import load_or_build_index  # NumPy only in this mode
+                    index_path = self.index_dir / f"dataset_{i}.npz" if self.index_dir else None
+                    self.indexes[i] = load_or_build_index(
+                        [record.frase for record in self.datasets[i]],
+                        index_path
+                    )
             else:
                 raise FileNotFoundError(f"Dataset not found: {dataset_path}")
     
-    def get_few_shot_examples(self, agent_id: int, num_examples: int = 5) -> str:
+    def get_few_shot_examples(self, agent_id: int, num_examples: int = 5, query: Optional[str] = None) -> str:
         """
-        Get random Few-Shot examples for a specific agent.
+        Get Few-Shot examples for a specific agent.
+        
+        In stable mode the selection is seeded per agent, so repeated calls
+        return the same examples (rendered once, then served from memory);
+        in random mode a fresh sample is drawn. In similar mode the rows
+        whose "frase" best matches the query come first, topped up with the
+        stable selection when fewer rows match. Either way the block is a
+        join of the pre-rendered row snippets.
         
         Args:
             agent_id: Agent identifier (1-5)
             num_examples: Number of examples to retrieve
+            query: User response to match (similar mode; ignored otherwise)
             
         Returns:
             Formatted string with examples
@@ -44,29 +151,33 @@ class DataLoader:
         if agent_id not in self.datasets:
             raise ValueError(f"Invalid agent_id: {agent_id}. Must be 1-5.")
         
-        df = self.datasets[agent_id]
+        snippets = self.snippets[agent_id]
         
-        # Sample random examples
-        if len(df) < num_examples:
-            examples = df.to_dict('records')
-        else:
-            examples = df.sample(n=num_examples).to_dict('records')
+        if self.few_shot_mode == "similar" and query and len(snippets) > num_examples:
+            rows = self.indexes[agent_id].search(query, num_examples)
+            if len(rows) < num_examples:
+                fill = _stable_rows(len(snippets), num_examples, self.seed + agent_id)
+                rows += [row for row in fill if row not in rows][:num_examples - len(rows)]
+            return _join_examples(snippets, rows)
         
-        # Format examples
-        formatted_examples = "=== EXEMPLOS DE CASOS ANTERIORES ===\n\n"
+        # Sample examples (seeded per agent in stable mode)
+        if len(snippets) < num_examples:
+            rows = range(len(snippets))
+        elif self.few_shot_mode != "random":
+            cached = self._stable_examples.get((agent_id, num_examples))
+            if cached is not None:
+                return cached
+            rows = _stable_rows(len(snippets), num_examples, self.seed + agent_id)
+        else:
+            rows = random.sample(range(len(snippets)), num_examples)
         
-        for idx, example in enumerate(examples, 1):
-            formatted_examples += f"EXEMPLO {idx}:\n"
-            formatted_examples += f"Relato: \"{example['frase']}\"\n"
-            formatted_examples += f"Risco: {example['risco']}\n"
-            formatted_examples += f"Fator: {example['fator']}\n"
-            formatted_examples += f"Taxonomia: {example['taxonomia']}\n"
-            formatted_examples += f"Metadata: {example['metadata']}\n"
-            formatted_examples += "\n" + "-" * 50 + "\n\n"
+        formatted_examples = _join_examples(snippets, rows)
         
+        if self.few_shot_mode != "random":
+            self._stable_examples[(agent_id, num_examples)] = formatted_examples
         return formatted_examples
     
-    def get_dataset(self, agent_id: int) -> pd.DataFrame:
+    def get_dataset(self, agent_id: int):
         """
         Get full dataset for an agent.
         
@@ -74,11 +185,15 @@ class DataLoader:
             agent_id: Agent identifier (1-5)
             
         Returns:
-            DataFrame with dataset
+            DataFrame with dataset (pandas is imported on first use)
         """
         if agent_id not in self.datasets:
             raise ValueError(f"Invalid agent_id: {agent_id}")
-        return self.datasets[agent_id].copy()
+        import pandas as pd
+        return pd.DataFrame(
+            [record.as_dict() for record in self.datasets[agent_id]],
+            columns=list(ExampleRecord.FIELDS)
+        )
     
     def get_dataset_stats(self, agent_id: int) -> Dict:
         """
@@ -90,10 +205,12 @@ class DataLoader:
         Returns:
             Dictionary with statistics
         """
-        df = self.get_dataset(agent_id)
+        if agent_id not in self.datasets:
+            raise ValueError(f"Invalid agent_id: {agent_id}")
+        records = self.datasets[agent_id]
         
         return {
-            "total_examples": len(df),
-            "risk_distribution": df['risco'].value_counts().to_dict(),
-            "unique_factors": df['fator'].nunique()
+            "total_examples": len(records),
+            "risk_distribution": dict(Counter(record.risco for record in records).most_common()),
+            "unique_factors": len({record.fator for record in records})
         }
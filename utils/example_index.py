@@ -0,0 +1,232 @@
+"""
+Local BM25 retrieval index over the Few-Shot "frase" column.
+
+Each dataset gets an inverted index stored as NumPy arrays (CSR layout:
+per-term slices of document ids and precomputed BM25 weights), so a query
+only touches the postings of its own terms. No network or external service
+is involved, and the index can be saved to / loaded from an .npz file.
+"""
+import hashlib
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Short Portuguese function words that carry no similarity signal
+_STOPWORDS = frozenset(
+    "a ao aos as com como da das de do dos e ela ele em entre eu isso lhe mais "
+    "mas me meu minha na nas nem no nos o os ou para pela pelo por que se sem "
+    "seu sua tambem te tem um uma ja so foi ser esta estou era".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase, accent-free word tokens without stopwords.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+    return [
+        token for token in _TOKEN_PATTERN.findall(normalized)
+        if len(token) > 1 and token not in _STOPWORDS
+    ]
+
+
+def corpus_fingerprint(texts: Sequence[str]) -> str:
+    """Hash of the indexed texts (detects a persisted index built from other data)."""
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """Okapi BM25 index with NumPy postings."""
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        weights: np.ndarray,
+        num_docs: int,
+        fingerprint: str = ""
+    ):
+        """
+        Initialize BM25Index (use BM25Index.build or BM25Index.load).
+
+        Args:
+            vocabulary: Term -> term id
+            offsets: Start of each term's postings (length = terms + 1)
+            doc_ids: Document ids of all postings, grouped by term
+            weights: BM25 weight (idf * saturated tf) of each posting
+            num_docs: Number of indexed documents
+            fingerprint: corpus_fingerprint of the indexed texts
+        """
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.num_docs = num_docs
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, texts: Sequence[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """
+        Build the index of a corpus.
+
+        Args:
+            texts: Documents, in row order
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalization
+
+        Returns:
+            BM25Index
+        """
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        posting_docs: List[int] = []
+        term_freqs: List[int] = []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                term_id = vocabulary.setdefault(token, len(vocabulary))
+                counts[term_id] = counts.get(term_id, 0) + 1
+            term_ids.extend(counts.keys())
+            posting_docs.extend([doc_id] * len(counts))
+            term_freqs.extend(counts.values())
+
+        terms = np.asarray(term_ids, dtype=np.int64)
+        docs = np.asarray(posting_docs, dtype=np.int32)
+        tf = np.asarray(term_freqs, dtype=np.float32)
+
+        # Group postings by term (stable sort keeps document order)
+        order = np.argsort(terms, kind="stable")
+        terms, docs, tf = terms[order], docs[order], tf[order]
+        doc_freqs = np.bincount(terms, minlength=len(vocabulary))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=offsets[1:])
+
+        num_docs = len(texts)
+        idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        average_length = float(doc_lengths.mean()) if num_docs and doc_lengths.any() else 1.0
+        norm = k1 * (1 - b + b * doc_lengths[docs] / average_length)
+        weights = idf[terms] * tf * (k1 + 1) / (tf + norm)
+
+        return cls(vocabulary, offsets, docs, weights.astype(np.float32), num_docs, corpus_fingerprint(texts))
+
+    def search(self, query: str, top_k: int = 5) -> List[int]:
+        """
+        Rank documents by BM25 similarity to a query.
+
+        Args:
+            query: Query text (e.g. the user's response)
+            top_k: Maximum number of results
+
+        Returns:
+            Ids of the best-matching documents (score > 0), best first
+        """
+        term_ids = {self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary}
+        if not term_ids or top_k <= 0:
+            return []
+
+        # Sum the postings of the query terms in one pass
+        slices = [slice(self.offsets[term_id], self.offsets[term_id + 1]) for term_id in term_ids]
+        scores = np.bincount(
+            np.concatenate([self.doc_ids[s] for s in slices]),
+            weights=np.concatenate([self.weights[s] for s in slices]),
+            minlength=self.num_docs
+        )
+
+        top = np.argpartition(-scores, top_k - 1)[:top_k] if self.num_docs > top_k else np.arange(self.num_docs)
+        top = top[scores[top] > 0]
+        # Best first; ties keep row order
+        return top[np.lexsort((top, -scores[top]))].tolist()
+
+    def save(self, path: Union[str, Path]):
+        """
+        Persist the index as an .npz file.
+
+        Args:
+            path: Destination file
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        terms = np.empty(len(self.vocabulary), dtype=object)
+        for term, term_id in self.vocabulary.items():
+            terms[term_id] = term
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                terms=terms.astype(str),
+                offsets=self.offsets,
+                doc_ids=self.doc_ids,
+                weights=self.weights,
+                num_docs=np.int64(self.num_docs),
+                fingerprint=np.str_(self.fingerprint)
+            )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> Optional["BM25Index"]:
+        """
+        Load an index saved with save().
+
+        Args:
+            path: .npz file
+
+        Returns:
+            BM25Index, or None if the file is missing or unreadable
+        """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                terms = data["terms"].tolist()
+                return cls(
+                    {term: term_id for term_id, term in enumerate(terms)},
+                    data["offsets"],
+                    data["doc_ids"],
+                    data["weights"],
+                    int(data["num_docs"]),
+                    str(data["fingerprint"])
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def load_or_build_index(texts: Sequence[str], path: Optional[Union[str, Path]] = None) -> BM25Index:
+    """
+    Load a persisted index for a corpus, rebuilding it when missing or stale.
+
+    Args:
+        texts: Documents, in row order
+        path: .npz file to load from and save to (None = in memory only)
+
+    Returns:
+        BM25Index for texts
+    """
+    if path is not None:
+        index = BM25Index.load(path)
+        if index is not None and index.fingerprint == corpus_fingerprint(texts):
+            return index
+
+    index = BM25Index.build(texts)
+    if path is not None:
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"⚠️ Não foi possível salvar o índice Few-Shot em {path}: {e}")
+    return index
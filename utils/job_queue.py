@@ -0,0 +1,361 @@
+"""
+Job queues for asynchronous analysis requests.
+
+Two backends share the same interface:
+- MemoryJobQueue: in-process, lost on restart
+- SQLiteJobQueue: on-disk, so queued jobs (and jobs interrupted mid-run)
+  survive a worker restart
+Jobs move through queued → running → succeeded | failed. Payloads and
+results are JSON-serializable dicts; async callers use the a* methods.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+
+class JobQueueFull(Exception):
+    """Raised when the number of pending jobs reaches max_pending."""
+
+
+class BaseJobQueue:
+    """Async wrappers shared by the job queue backends."""
+
+    async def _call(self, method, *args):
+        """Run a blocking queue method (in a worker thread for disk backends)."""
+        return await asyncio.to_thread(method, *args)
+
+    async def asubmit(self, payload: Dict) -> str:
+        """Async submit."""
+        return await self._call(self.submit, payload)
+
+    async def aclaim(self) -> Optional[Tuple[str, Dict]]:
+        """Async claim."""
+        return await self._call(self.claim)
+
+    async def acomplete(self, job_id: str, result: Dict):
+        """Async complete."""
+        await self._call(self.complete, job_id, result)
+
+    async def afail(self, job_id: str, error: str):
+        """Async fail."""
+        await self._call(self.fail, job_id, error)
+
+    async def aget(self, job_id: str) -> Optional[Dict]:
+        """Async get."""
+        return await self._call(self.get, job_id)
+
+
+class MemoryJobQueue(BaseJobQueue):
+    """In-process FIFO job queue."""
+
+    def __init__(self, max_pending: int = 100, retention_seconds: float = 86400):
+        """
+        Initialize MemoryJobQueue.
+
+        Args:
+            max_pending: Maximum queued + running jobs (0 = unbounded)
+            retention_seconds: How long finished jobs are kept (0 = forever)
+        """
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, Dict] = {}
+        self._queued: deque = deque()
+        self._running = 0
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def _call(self, method, *args):
+        # Everything is in memory: no need for a thread
+        return method(*args)
+
+    def _prune(self, now: float):
+        """Drop finished jobs older than the retention period."""
+        if not self.retention_seconds:
+            return
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > now - self.retention_seconds:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+
+    def submit(self, payload: Dict) -> str:
+        """
+        Add a job to the end of the queue.
+
+        Args:
+            payload: JSON-serializable job input
+
+        Returns:
+            str: Job id
+
+        Raises:
+            JobQueueFull: If max_pending jobs are already queued or running
+        """
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if self.max_pending and len(self._queued) + self._running >= self.max_pending:
+                raise JobQueueFull(f"Job queue is full ({self.max_pending} pending jobs)")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "payload": payload,
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "started_at": None,
+                "finished_at": None,
+            }
+            self._queued.append(job_id)
+            return job_id
+
+    def claim(self) -> Optional[Tuple[str, Dict]]:
+        """
+        Take the oldest queued job and mark it running.
+
+        Returns:
+            (job_id, payload) or None if no job is queued
+        """
+        with self._lock:
+            if not self._queued:
+                return None
+            job_id = self._queued.popleft()
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            self._running += 1
+            return job_id, job["payload"]
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict], error: Optional[str]):
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if job["status"] == "running":
+                self._running -= 1
+            job.update(status=status, result=result, error=error, finished_at=now)
+            self._finished[job_id] = now
+
+    def complete(self, job_id: str, result: Dict):
+        """Mark a job as succeeded with its result."""
+        self._finish(job_id, "succeeded", result, None)
+
+    def fail(self, job_id: str, error: str):
+        """Mark a job as failed with an error message."""
+        self._finish(job_id, "failed", None, error)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Get a job's status and result (None if unknown or expired)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {key: value for key, value in job.items() if key != "payload"}
+
+    def requeue_running(self) -> int:
+        """Nothing to recover: running jobs do not outlive the process."""
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._lock:
+            counts = {status: 0 for status in JOB_STATUSES}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return counts
+
+    def close(self):
+        """Nothing to release."""
+
+
+class SQLiteJobQueue(BaseJobQueue):
+    """Durable FIFO job queue backed by SQLite."""
+
+    def __init__(self, path: str, max_pending: int = 100, retention_seconds: float = 86400):
+        """
+        Initialize SQLiteJobQueue.
+
+        Args:
+            path: SQLite database file (parent directory is created if needed)
+            max_pending: Maximum queued + running jobs (0 = unbounded)
+            retention_seconds: How long finished jobs are kept (0 = forever)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, "
+            "result TEXT, error TEXT, created_at REAL NOT NULL, "
+            "started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at)")
+        self._conn.commit()
+
+    def submit(self, payload: Dict) -> str:
+        """
+        Add a job to the end of the queue.
+
+        Args:
+            payload: JSON-serializable job input
+
+        Returns:
+            str: Job id
+
+        Raises:
+            JobQueueFull: If max_pending jobs are already queued or running
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self.retention_seconds:
+                self._conn.execute(
+                    "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                    (now - self.retention_seconds,)
+                )
+            if self.max_pending:
+                pending = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+                ).fetchone()[0]
+                if pending >= self.max_pending:
+                    self._conn.commit()
+                    raise JobQueueFull(f"Job queue is full ({self.max_pending} pending jobs)")
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, payload, created_at) VALUES (?, 'queued', ?, ?)",
+                (job_id, json.dumps(payload, ensure_ascii=False), now)
+            )
+            self._conn.commit()
+        return job_id
+
+    def claim(self) -> Optional[Tuple[str, Dict]]:
+        """
+        Take the oldest queued job and mark it running.
+
+        Returns:
+            (job_id, payload) or None if no job is queued
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, payload FROM jobs WHERE status = 'queued' "
+                "ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, payload = row
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE job_id = ?",
+                (time.time(), job_id)
+            )
+            self._conn.commit()
+        return job_id, json.loads(payload)
+
+    def _finish(self, job_id: str, status: str, result: Optional[str], error: Optional[str]):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def complete(self, job_id: str, result: Dict):
+        """Mark a job as succeeded with its result."""
+        self._finish(job_id, "succeeded", json.dumps(result, ensure_ascii=False), None)
+
+    def fail(self, job_id: str, error: str):
+        """Mark a job as failed with an error message."""
+        self._finish(job_id, "failed", None, error)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Get a job's status and result (None if unknown or expired)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result, error, created_at, started_at, finished_at "
+                "FROM jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, result, error, created_at, started_at, finished_at = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    def requeue_running(self) -> int:
+        """
+        Put jobs left running by a previous process back in the queue.
+
+        Returns:
+            int: Number of jobs requeued
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def create_job_queue(
+    backend: str,
+    path: Optional[str] = None,
+    max_pending: int = 100,
+    retention_seconds: float = 86400
+):
+    """
+    Create a job queue for the given backend.
+
+    Args:
+        backend: "memory" or "sqlite"
+        path: SQLite file (required for the sqlite backend)
+        max_pending: Maximum queued + running jobs (0 = unbounded)
+        retention_seconds: How long finished jobs are kept (0 = forever)
+
+    Returns:
+        MemoryJobQueue or SQLiteJobQueue
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == "memory":
+        return MemoryJobQueue(max_pending=max_pending, retention_seconds=retention_seconds)
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("SQLite job queue requires a path")
+        return SQLiteJobQueue(path, max_pending=max_pending, retention_seconds=retention_seconds)
+    raise ValueError(f"Invalid job queue backend: {backend}. Must be 'memory' or 'sqlite'.")
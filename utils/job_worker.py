@@ -0,0 +1,100 @@
+"""
+Background worker pool that executes jobs from a job queue.
+
+The pool size is independent of HTTP concurrency: the API only enqueues,
+and a fixed number of workers run jobs, so throughput is tuned with
+JOB_WORKERS without holding client connections open.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+JobHandler = Callable[[Dict], Awaitable[Dict]]
+
+
+class JobWorkerPool:
+    """Fixed-size pool of asyncio workers consuming a job queue."""
+
+    def __init__(self, queue, handler: JobHandler, num_workers: int = 2, poll_seconds: float = 1.0):
+        """
+        Initialize JobWorkerPool.
+
+        Args:
+            queue: MemoryJobQueue or SQLiteJobQueue
+            handler: Coroutine function mapping a job payload to its result
+            num_workers: Number of jobs executed concurrently
+            poll_seconds: Idle re-check interval (picks up jobs queued by other processes)
+        """
+        self.queue = queue
+        self.handler = handler
+        self.num_workers = num_workers
+        self.poll_seconds = poll_seconds
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> int:
+        """
+        Recover interrupted jobs and start the workers.
+
+        Returns:
+            int: Number of jobs requeued from a previous run
+        """
+        self._wakeup = asyncio.Event()
+        requeued = await asyncio.to_thread(self.queue.requeue_running)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{index}")
+            for index in range(self.num_workers)
+        ]
+        return requeued
+
+    def notify(self):
+        """Wake idle workers after a job was submitted."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def submit(self, payload: Dict) -> str:
+        """
+        Enqueue a job and wake the workers.
+
+        Args:
+            payload: JSON-serializable job input
+
+        Returns:
+            str: Job id
+        """
+        job_id = await self.queue.asubmit(payload)
+        self.notify()
+        return job_id
+
+    async def _worker(self):
+        """Claim and run jobs until cancelled."""
+        while True:
+            # Clear before claiming so a submit racing with an empty claim still wakes us
+            self._wakeup.clear()
+            job = await self.queue.aclaim()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, payload = job
+            try:
+                result = await self.handler(payload)
+            except asyncio.CancelledError:
+                # Shutting down: the job stays "running" and is requeued on next start
+                raise
+            except Exception as e:
+                print(f"❌ Job {job_id} falhou: {str(e)}")
+                await self.queue.afail(job_id, str(e) or type(e).__name__)
+            else:
+                await self.queue.acomplete(job_id, result)
+
+    async def stop(self):
+        """Cancel the workers and wait for them to exit."""
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
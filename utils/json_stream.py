@@ -0,0 +1,74 @@
+"""
+Incremental JSON scanning for streamed LLM responses.
+
+Tracks brace depth (ignoring braces inside strings) as chunks arrive, so a
+streamed JSON object can be parsed as soon as its closing brace lands and
+the rest of the stream (trailing whitespace, code fences, chatter) dropped.
+"""
+from typing import Optional
+
+
+class JSONObjectScanner:
+    """Finds the first complete top-level JSON object in a stream of text chunks."""
+
+    def __init__(self):
+        self.text = ""
+        self.depth = 0
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def complete(self) -> bool:
+        """Whether the closing brace of the first object has been seen."""
+        return self.end is not None
+
+    @property
+    def result(self) -> Optional[str]:
+        """Text of the first complete object (None until complete)."""
+        if self.end is None:
+            return None
+        return self.text[self.start:self.end]
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Add a chunk of streamed text.
+
+        Args:
+            chunk: Next piece of the response
+
+        Returns:
+            The complete object text once its closing brace arrives, else None
+        """
+        if self.end is not None:
+            return self.result
+
+        offset = len(self.text)
+        self.text += chunk
+
+        for index, char in enumerate(chunk, start=offset):
+            if self.start is None:
+                if char == "{":
+                    self.start = index
+                    self.depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = index + 1
+                    return self.result
+
+        return None
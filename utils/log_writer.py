@@ -0,0 +1,161 @@
+"""
+Background writer for audit logs.
+
+Finished request logs are queued and written by a dedicated thread as
+compact JSON Lines, so the event loop never blocks on file I/O.
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from models.schemas import RequestLog
+
+
+class AuditLogWriter:
+    """Batches finished RequestLogs and appends them to rotating JSONL files."""
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        log_dir: str = "logs",
+        max_bytes: int = 50 * 1024 * 1024,
+        rotate_seconds: float = 86400,
+        fsync_interval: float = 5.0,
+        batch_size: int = 100,
+        flush_interval: float = 0.5
+    ):
+        """
+        Initialize AuditLogWriter.
+
+        Args:
+            log_dir: Directory to store audit files
+            max_bytes: Rotate the current file once it reaches this size
+            rotate_seconds: Rotate the current file once it is this old
+            fsync_interval: Minimum seconds between fsync calls
+            batch_size: Maximum logs written per batch
+            flush_interval: Seconds to wait for more logs before writing a batch
+        """
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(exist_ok=True)
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._file_opened_at = 0.0
+        self._last_fsync = 0.0
+        self._dirty = False
+        self.current_path: Optional[Path] = None
+
+    def start(self):
+        """Start the writer thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, request_log: RequestLog) -> Optional[Path]:
+        """
+        Queue a finished request log for writing (non-blocking).
+
+        Args:
+            request_log: Finalized request log
+
+        Returns:
+            Path of the file currently being written
+        """
+        self.start()
+        self._queue.put(request_log)
+        return self.current_path
+
+    def flush(self):
+        """Block until every queued log has been written to the current file."""
+        self._queue.join()
+
+    def close(self):
+        """Flush pending logs, stop the thread and close the current file."""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        """Writer thread loop: collect a batch, write it, repeat."""
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._sync()
+                continue
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(entry is self._STOP for entry in batch)
+            logs = [entry for entry in batch if entry is not self._STOP]
+
+            try:
+                if logs:
+                    self._write_batch(logs)
+            except Exception as e:
+                print(f"⚠️ Error writing audit logs: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stop:
+                self._close_file()
+                return
+
+    def _write_batch(self, logs):
+        """Write a batch of logs as JSON Lines, rotating first if needed."""
+        self._rotate_if_needed()
+        lines = "".join(log.model_dump_json() + "\n" for log in logs)
+        self._file.write(lines)
+        self._file.flush()
+        self._dirty = True
+        self._sync()
+
+    def _rotate_if_needed(self):
+        """Open a new file if none is open or the current one is too big/old."""
+        if self._file is not None:
+            too_big = self._file.tell() >= self.max_bytes
+            too_old = time.monotonic() - self._file_opened_at >= self.rotate_seconds
+            if not (too_big or too_old):
+                return
+            self._close_file()
+
+        filename = f"audit_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl"
+        self.current_path = self.log_dir / filename
+        self._file = open(self.current_path, "a", encoding="utf-8")
+        self._file_opened_at = time.monotonic()
+
+    def _sync(self, force: bool = False):
+        """fsync the current file at most once per fsync_interval (unless forced)."""
+        if self._file is None or not self._dirty:
+            return
+        now = time.monotonic()
+        if force or now - self._last_fsync >= self.fsync_interval:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+            self._dirty = False
+
+    def _close_file(self):
+        """Sync and close the current file."""
+        if self._file is not None:
+            self._sync(force=True)
+            self._file.close()
+            self._file = None
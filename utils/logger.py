@@ -3,25 +3,108 @@ Logging system for audit trail.
 """
 import json
 import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from models.schemas import RequestLog, LogEvent
+from utils.log_writer import AuditLogWriter
+
+
+# Request-scoped log: each request (asyncio task) sees only its own log,
+# and tasks spawned while handling it inherit the same log.
+_current_log: ContextVar[Optional[RequestLog]] = ContextVar("current_request_log", default=None)
+
+
+def log_request_event(
+    event_type: str,
+    data: Dict[str, Any],
+    agent_id: Optional[str] = None,
+    attempt: Optional[int] = None
+):
+    """
+    Append an event to the active request log, if there is one.
+    
+    Lets lower layers (e.g. AgentWrapper) record events without holding a
+    Logger reference; outside a request this is a no-op.
+    
+    Args:
+        event_type: Type of event
+        data: Event data
+        agent_id: Agent identifier (optional)
+        attempt: Attempt number (optional)
+    """
+    current_log = _current_log.get()
+    if current_log is None:
+        return
+    
+    current_log.events.append(LogEvent(
+        timestamp=datetime.now(),
+        event_type=event_type,
+        agent_id=agent_id,
+        attempt=attempt,
+        data=data
+    ))
+
+
+@contextmanager
+def capture_request_events() -> Iterator[List[LogEvent]]:
+    """
+    Collect the events logged inside the block instead of the active request log.
+    
+    Used for work shared by several requests (e.g. a coalesced LLM call):
+    the captured events are then copied into each request's log with
+    append_request_events.
+    
+    Yields:
+        List receiving the captured events
+    """
+    capture = RequestLog(request_id="capture", request_payload={}, events=[])
+    token = _current_log.set(capture)
+    try:
+        yield capture.events
+    finally:
+        _current_log.reset(token)
+
+
+def append_request_events(events: List[LogEvent]):
+    """
+    Copy captured events into the active request log, if there is one.
+    
+    Args:
+        events: Events collected by capture_request_events
+    """
+    current_log = _current_log.get()
+    if current_log is not None:
+        current_log.events.extend(events)
 
 
 class Logger:
-    """Handles audit logging for the system."""
+    """
+    Handles audit logging for the system.
+    
+    The active request log is stored in a context variable, so a single
+    Logger can serve many concurrent requests on the same event loop.
+    """
     
-    def __init__(self, log_dir: str = "logs"):
+    def __init__(self, log_dir: str = "logs", writer: Optional[AuditLogWriter] = None):
         """
         Initialize Logger.
         
         Args:
             log_dir: Directory to store log files
+            writer: Background JSONL writer (optional). Without it, each log
+                is written synchronously to its own JSON file.
         """
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
-        self.current_log: Optional[RequestLog] = None
+        self.writer = writer
+    
+    @property
+    def current_log(self) -> Optional[RequestLog]:
+        """Active request log for the current context (None if no request)."""
+        return _current_log.get()
     
     def start_request_log(self, request_payload: Dict) -> str:
         """
@@ -35,12 +118,12 @@ class Logger:
         """
         request_id = str(uuid.uuid4())
         
-        self.current_log = RequestLog(
+        _current_log.set(RequestLog(
             request_id=request_id,
             timestamp=datetime.now(),
             request_payload=request_payload,
             events=[]
-        )
+        ))
         
         return request_id
     
@@ -60,7 +143,8 @@ class Logger:
             agent_id: Agent identifier (optional)
             attempt: Attempt number (optional)
         """
-        if not self.current_log:
+        current_log = _current_log.get()
+        if not current_log:
             raise RuntimeError("No active request log. Call start_request_log first.")
         
         event = LogEvent(
@@ -71,7 +155,7 @@ class Logger:
             data=data
         )
         
-        self.current_log.events.append(event)
+        current_log.events.append(event)
     
     def finalize_log(self, response: Optional[Dict] = None, duration: Optional[float] = None):
         """
@@ -81,18 +165,26 @@ class Logger:
             response: Final response data
             duration: Request duration in seconds
         """
-        if not self.current_log:
+        current_log = _current_log.get()
+        if not current_log:
             raise RuntimeError("No active request log.")
         
-        self.current_log.response = response
-        self.current_log.duration_seconds = duration
+        current_log.response = response
+        current_log.duration_seconds = duration
+        
+        # Clear current log
+        _current_log.set(None)
+        
+        # Hand off to the background writer (no file I/O on the event loop)
+        if self.writer:
+            return self.writer.submit(current_log)
         
         # Save to file
-        log_filename = f"request_{self.current_log.request_id}_{self.current_log.timestamp.strftime('%Y%m%d_%H%M%S')}.json"
+        log_filename = f"request_{current_log.request_id}_{current_log.timestamp.strftime('%Y%m%d_%H%M%S')}.json"
         log_path = self.log_dir / log_filename
         
         # Convert to dict and save
-        log_dict = self.current_log.model_dump(mode='json')
+        log_dict = current_log.model_dump(mode='json')
         
         # Convert datetime objects to strings
         log_dict['timestamp'] = log_dict['timestamp'].isoformat() if isinstance(log_dict['timestamp'], datetime) else log_dict['timestamp']
@@ -103,11 +195,18 @@ class Logger:
         with open(log_path, 'w', encoding='utf-8') as f:
             json.dump(log_dict, f, indent=2, ensure_ascii=False)
         
-        # Clear current log
-        self.current_log = None
-        
         return log_path
     
+    def flush(self):
+        """Block until all finalized logs have been written."""
+        if self.writer:
+            self.writer.flush()
+    
+    def close(self):
+        """Flush pending logs and stop the background writer."""
+        if self.writer:
+            self.writer.close()
+    
     def get_current_log(self) -> Optional[RequestLog]:
-        """Get the current active log."""
-        return self.current_log
+        """Get the active log for the current request context."""
+        return _current_log.get()
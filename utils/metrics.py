@@ -0,0 +1,68 @@
+"""
+In-process metrics for the agent pipeline.
+Counters are grouped by metric name and key (usually the agent name).
+"""
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """Thread-safe counters, e.g. metrics.increment("llm_calls", "supervisor")."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def increment(self, name: str, key: str = "total", value: float = 1.0):
+        """
+        Add a value to a counter.
+
+        Args:
+            name: Metric name
+            key: Counter key within the metric (e.g. agent name)
+            value: Amount to add
+        """
+        with self._lock:
+            self._counters[name][key] += value
+
+    def get(self, name: str, key: str = "total") -> float:
+        """Get the current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(name, {}).get(key, 0.0)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Get a copy of all counters."""
+        with self._lock:
+            return {name: dict(values) for name, values in self._counters.items()}
+
+    def reset(self):
+        """Clear all counters."""
+        with self._lock:
+            self._counters.clear()
+
+
+# Global registry shared by all agents
+metrics = Metrics()
+
+
+def get_prompt_cache_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Get provider-side prompt cache statistics per agent.
+
+    Returns:
+        Dict mapping agent name to prompt tokens, cached tokens and hit rate
+    """
+    snapshot = metrics.snapshot()
+    prompt_tokens = snapshot.get("prompt_tokens", {})
+    cached_tokens = snapshot.get("cached_prompt_tokens", {})
+
+    stats = {}
+    for agent, total in prompt_tokens.items():
+        cached = cached_tokens.get(agent, 0.0)
+        stats[agent] = {
+            "prompt_tokens": total,
+            "cached_tokens": cached,
+            "hit_rate": round(cached / total, 4) if total else 0.0,
+        }
+    return stats
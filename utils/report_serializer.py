@@ -0,0 +1,164 @@
+"""
+Compact, token-budgeted serialization of specialist reports for prompts.
+
+Supervisor, rework and synthesizer prompts embed specialist reports. They are
+serialized as compact JSON (no indentation, empty fields dropped), the long
+text fields can be shortened, and the reports of one prompt are shrunk
+together until they fit the role's token budget instead of overrunning the
+context window.
+
+Tokens are counted with the provider's tokenizer when one is available
+locally (tiktoken for OpenAI / Azure OpenAI models) and estimated at ~4
+characters per token otherwise.
+"""
+import json
+from functools import lru_cache
+from typing import List, Optional
+from models.schemas import SpecialistReport
+from utils.metrics import metrics
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+
+# Text fields shortened (in this order of preference) to meet a budget
+_TEXT_FIELDS = ("analysis", "justification")
+
+# Below this many characters text fields are dropped instead of shortened
+_MIN_TEXT_CHARS = 80
+
+_ELLIPSIS = "…"
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(provider: Optional[str], model: Optional[str]):
+    """tiktoken encoding for a provider/model, or None when no local tokenizer applies."""
+    if tiktoken is None or provider not in ("openai", "azure_openai"):
+        return None
+    try:
+        return tiktoken.encoding_for_model(model or "")
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, provider: Optional[str] = None, model: Optional[str] = None) -> int:
+    """
+    Count the tokens of a text for a provider/model.
+
+    Args:
+        text: Text to count
+        provider: Provider name (azure_openai, openai or groq) (optional)
+        model: Model name (optional)
+
+    Returns:
+        int: Exact count with the model's tokenizer, or a ~4 chars/token estimate
+    """
+    encoding = _get_encoding(provider, model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def shorten(text: str, max_chars: int) -> str:
+    """
+    Cut a text to at most max_chars, preferring a sentence or word boundary.
+
+    Args:
+        text: Text to shorten
+        max_chars: Maximum length including the ellipsis (0 = unlimited)
+
+    Returns:
+        str: The text itself if short enough, otherwise its cut prefix + "…"
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    cut = text[:max_chars - len(_ELLIPSIS)]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary < len(cut) // 2:
+        boundary = cut.rfind(" ")
+    if boundary > 0:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + _ELLIPSIS
+
+
+def serialize_report(report: SpecialistReport, text_chars: int = 0, minimal: bool = False) -> str:
+    """
+    Serialize a report as compact JSON for a prompt.
+
+    Args:
+        report: Specialist report
+        text_chars: Maximum characters of each text field (0 = keep whole)
+        minimal: Keep only the score and factor names/severities
+
+    Returns:
+        str: Compact JSON (no indentation, empty fields omitted)
+    """
+    data = report.model_dump(mode="json", exclude_defaults=True)
+    if minimal:
+        for field in _TEXT_FIELDS:
+            data.pop(field, None)
+        data["risk_factors"] = [
+            {"factor": factor["factor"], "severity": factor["severity"]}
+            for factor in data.get("risk_factors", [])
+        ]
+    elif text_chars:
+        for field in _TEXT_FIELDS:
+            if field in data:
+                data[field] = shorten(data[field], text_chars)
+        for factor in data.get("risk_factors", []):
+            factor["description"] = shorten(factor["description"], text_chars)
+    if not data.get("risk_factors"):
+        data.pop("risk_factors", None)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def fit_reports(
+    reports: List[SpecialistReport],
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    max_tokens: int = 0,
+    analysis_chars: int = 0
+) -> List[str]:
+    """
+    Serialize the reports of one prompt within a token budget.
+
+    Text fields are first capped at analysis_chars; while the reports still
+    exceed max_tokens, the cap is halved for all of them. If even short
+    texts do not fit, only scores and factor names are kept.
+
+    Args:
+        reports: Reports embedded in the same prompt
+        provider: Provider of the agent receiving the prompt (for token counting)
+        model: Model of the agent receiving the prompt (for token counting)
+        max_tokens: Token budget for all reports together (0 = unlimited)
+        analysis_chars: Initial cap on text field length (0 = keep whole)
+
+    Returns:
+        One compact JSON string per report, in order
+    """
+    serialized = [serialize_report(report, analysis_chars) for report in reports]
+    if max_tokens <= 0:
+        return serialized
+
+    def fits(texts: List[str]) -> bool:
+        return count_tokens("".join(texts), provider, model) <= max_tokens
+
+    if fits(serialized):
+        return serialized
+
+    metrics.increment("report_truncations", provider or "unknown")
+    longest = max(
+        len(value)
+        for report in reports
+        for value in [report.analysis, report.justification] + [f.description for f in report.risk_factors]
+    )
+    text_chars = min(analysis_chars or longest, longest) // 2
+    while text_chars >= _MIN_TEXT_CHARS:
+        serialized = [serialize_report(report, text_chars) for report in reports]
+        if fits(serialized):
+            return serialized
+        text_chars //= 2
+
+    return [serialize_report(report, minimal=True) for report in reports]
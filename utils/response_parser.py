@@ -0,0 +1,259 @@
+"""
+Shared parsing of LLM JSON responses into Pydantic models.
+
+One pass locates the JSON object (ignoring code fences and surrounding
+chatter), Pydantic's native JSON parser validates it directly, and only if
+that fails is the text repaired (trailing commas, raw newlines inside
+strings) and loaded with orjson (or json when orjson is not installed).
+Failures and repairs are counted per agent in utils.metrics, and failures
+are also recorded for the request being served (track_parse_failures), so
+results built from fallbacks are not cached.
+
+It also builds the strict JSON Schema sent as response_format, so providers
+with structured outputs only ever generate valid objects.
+"""
+import copy
+import json
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+from utils.json_stream import JSONObjectScanner
+from utils.metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+# Validation keywords that strict structured outputs reject; Pydantic still
+# enforces them when the response is parsed
+_UNSUPPORTED_SCHEMA_KEYS = {
+    "default", "examples", "format", "pattern",
+    "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum",
+    "minLength", "maxLength", "minItems", "maxItems"
+}
+
+
+# Agents whose response failed to parse in the current request (None outside one)
+_request_parse_failures: ContextVar[Optional[List[str]]] = ContextVar("request_parse_failures", default=None)
+
+
+class ResponseParseError(ValueError):
+    """Raised when an LLM response cannot be parsed into the expected model."""
+
+
+def track_parse_failures() -> List[str]:
+    """
+    Start recording parse failures for the current request context.
+
+    Tasks spawned afterwards share the returned list, so one check at the
+    end of a request covers every agent that fell back to a default result.
+
+    Returns:
+        Live list of the agents whose response failed to parse
+    """
+    failures: List[str] = []
+    _request_parse_failures.set(failures)
+    return failures
+
+
+def _record_failure(agent: str):
+    """Count a parse failure for the agent and the current request."""
+    metrics.increment("parse_failures", agent)
+    failures = _request_parse_failures.get()
+    if failures is not None:
+        failures.append(agent)
+
+
+def _make_strict(node: Any):
+    """Close every object of a schema in place: all properties required, no extras."""
+    if isinstance(node, list):
+        for item in node:
+            _make_strict(item)
+        return
+    if not isinstance(node, dict):
+        return
+
+    for key in _UNSUPPORTED_SCHEMA_KEYS & node.keys():
+        del node[key]
+    if "properties" in node:
+        node["required"] = list(node["properties"])
+        node["additionalProperties"] = False
+        for child in node["properties"].values():
+            _make_strict(child)
+    for key in ("items", "anyOf", "$defs"):
+        if key in node:
+            _make_strict(list(node[key].values()) if key == "$defs" else node[key])
+
+
+@lru_cache(maxsize=None)
+def _strict_schema(model: Type[BaseModel]) -> str:
+    """Serialized strict schema of a model (built once per model)."""
+    schema = copy.deepcopy(model.model_json_schema())
+    _make_strict(schema)
+    return json.dumps(schema)
+
+
+def json_schema_response_format(model: Type[BaseModel], strict: bool = True) -> Dict[str, Any]:
+    """
+    Build a json_schema response_format for a Pydantic model.
+
+    Every property becomes required and objects are closed
+    (additionalProperties: false), as strict mode demands; optional fields
+    stay nullable. Range and length constraints are left to Pydantic.
+
+    Args:
+        model: Pydantic model the response must follow
+        strict: Whether the provider must follow the schema exactly
+
+    Returns:
+        dict: chat.completions response_format argument
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": json.loads(_strict_schema(model)),
+            "strict": strict
+        }
+    }
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """
+    Locate the first top-level JSON object in a response.
+
+    Args:
+        text: Raw LLM response (may include code fences or prose)
+
+    Returns:
+        The object text, everything from the first "{" if it never closes,
+        or None if there is no "{" at all
+    """
+    if not text:
+        return None
+    scanner = JSONObjectScanner()
+    result = scanner.feed(text)
+    if result is not None:
+        return result
+    if scanner.start is None:
+        return None
+    return text[scanner.start:]
+
+
+def repair_json(text: str) -> str:
+    """
+    Fix common LLM JSON defects in one pass.
+
+    - Trailing commas before "}" or "]"
+    - Raw newlines, carriage returns and tabs inside strings
+    - Unclosed braces/brackets at the end of a truncated response
+
+    Args:
+        text: JSON-like text
+
+    Returns:
+        str: Repaired text (unchanged if nothing needed fixing)
+    """
+    escapes = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+    out = []
+    closers = []
+    in_string = False
+    escape = False
+
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char in escapes:
+                out.append(escapes[char])
+                continue
+            out.append(char)
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            # Drop a trailing comma (and the whitespace after it)
+            index = len(out) - 1
+            while index >= 0 and out[index].isspace():
+                index -= 1
+            if index >= 0 and out[index] == ",":
+                del out[index:]
+            if closers:
+                closers.pop()
+        out.append(char)
+
+    if in_string:
+        out.append('"')
+    out.extend(reversed(closers))
+    return "".join(out)
+
+
+def loads_json(text: str) -> Any:
+    """Parse JSON with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def parse_response(
+    response_text: str,
+    model: Type[ModelT],
+    agent: str = "unknown",
+    overrides: Optional[Dict[str, Any]] = None
+) -> ModelT:
+    """
+    Parse an LLM response into a Pydantic model.
+
+    Args:
+        response_text: Raw LLM response
+        model: Pydantic model class to validate against
+        agent: Agent name for the parse_failures / json_repairs metrics
+        overrides: Fields set (or replaced) before validation (optional)
+
+    Returns:
+        Validated model instance
+
+    Raises:
+        ResponseParseError: If no valid object can be recovered
+    """
+    json_text = extract_json_object(response_text)
+    if json_text is None:
+        _record_failure(agent)
+        raise ResponseParseError(f"No JSON object in response from {agent}")
+
+    # Fast path: validate the raw JSON directly
+    if overrides is None:
+        try:
+            return model.model_validate_json(json_text)
+        except ValidationError:
+            pass
+
+    try:
+        try:
+            data = loads_json(json_text)
+        except ValueError:
+            data = loads_json(repair_json(json_text))
+            metrics.increment("json_repairs", agent)
+        if not isinstance(data, dict):
+            raise ResponseParseError(f"Expected a JSON object from {agent}, got {type(data).__name__}")
+        if overrides:
+            data.update(overrides)
+        return model.model_validate(data)
+    except (ValueError, ValidationError) as e:
+        _record_failure(agent)
+        if isinstance(e, ResponseParseError):
+            raise
+        raise ResponseParseError(f"Invalid response from {agent}: {e}") from e